@@ -1,4 +1,8 @@
-"""Root of the deepmd package, exposes all public classes and submodules."""
+"""Root of the deepmd package, exposes all public classes and submodules.
+
+The submodules and classes are imported on first access, so that importing
+the package does not import TensorFlow.
+"""
 
 try:
     from importlib import (
@@ -7,25 +11,11 @@ try:
 except ImportError:  # for Python<3.8
     import importlib_metadata as metadata
 
-import deepmd.utils.network as network
-
-from . import (
-    cluster,
-    descriptor,
-    fit,
-    loss,
-    nvnmd,
-    utils,
-)
 from .env import (
     set_mkl,
 )
-from .infer import (
-    DeepEval,
-    DeepPotential,
-)
-from .infer.data_modifier import (
-    DipoleChargeModifier,
+from .utils.lazy import (
+    lazy_attributes,
 )
 
 set_mkl()
@@ -37,6 +27,22 @@ except ImportError:
         __version__,
     )
 
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "cluster": (".cluster", None),
+        "descriptor": (".descriptor", None),
+        "fit": (".fit", None),
+        "loss": (".loss", None),
+        "nvnmd": (".nvnmd", None),
+        "utils": (".utils", None),
+        "network": (".utils.network", None),
+        "DeepEval": (".infer", "DeepEval"),
+        "DeepPotential": (".infer", "DeepPotential"),
+        "DipoleChargeModifier": (".infer.data_modifier", "DipoleChargeModifier"),
+    },
+)
+
 # load third-party plugins
 try:
     eps = metadata.entry_points(group="deepmd")
@@ -1,5 +1,6 @@
 """ASE calculator interface module."""
 
+import time
 from pathlib import (
     Path,
 )
@@ -11,6 +12,7 @@ from typing import (
     Union,
 )
 
+import numpy as np
 from ase.calculators.calculator import (
     Calculator,
     PropertyNotImplementedError,
@@ -44,6 +46,22 @@ class DP(Calculator):
         mapping of element types and their numbers, best left None and the calculator
         will infer this information from model, by default None
 
+    Notes
+    -----
+    The calculator is optimized for long molecular dynamics and geometry
+    optimization runs. The atom types are not mapped again unless the atomic
+    numbers are changed, and the stress of a periodic system is computed together with
+    the energy and the forces, so each step evaluates the model once. The model
+    reuses the inputs prepared for the same atom types and writes the results
+    into buffers reused across the steps, so the arrays in `results` are
+    overwritten by the next calculation; the getters of ASE, e.g.
+    `atoms.get_forces()`, return copies of them.
+
+    The accumulated wall time (s) of each phase of the calculations is given
+    by `timing`: `prepare` for the conversion of the inputs, `eval` for the
+    evaluation of the model and `post` for the conversion of the results.
+    `ncalls` is the number of calculations. It can be reset by `reset_timing`.
+
     Examples
     --------
     Compute potential energy
@@ -85,6 +103,10 @@ class DP(Calculator):
             self.type_dict = dict(
                 zip(self.dp.get_type_map(), range(self.dp.get_ntypes()))
             )
+        self.atype = None
+        self.numbers = None
+        self.out = None
+        self.reset_timing()
 
     def calculate(
         self,
@@ -104,17 +126,29 @@ class DP(Calculator):
         system_changes : List[str], optional
             unused, only for function signature compatibility, by default all_changes
         """
+        t0 = time.perf_counter()
         if atoms is not None:
             self.atoms = atoms.copy()
-
-        coord = self.atoms.get_positions().reshape([1, -1])
-        if sum(self.atoms.get_pbc()) > 0:
-            cell = self.atoms.get_cell().reshape([1, -1])
+        if self.atype is None or not np.array_equal(self.numbers, self.atoms.numbers):
+            # the types are mapped again only when the atomic numbers are changed
+            self.numbers = self.atoms.numbers.copy()
+            symbols = self.atoms.get_chemical_symbols()
+            self.atype = np.array([self.type_dict[k] for k in symbols], dtype=int)
+        natoms = len(self.atype)
+        if self.out is None or self.out[1].shape[1] != natoms:
+            self.out = (np.empty((1, 1)), np.empty((1, natoms, 3)), np.empty((1, 9)))
+
+        coord = self.atoms.positions.reshape([1, -1])
+        pbc = bool(self.atoms.pbc.any())
+        if pbc:
+            cell = self.atoms.cell.array.reshape([1, -1])
         else:
             cell = None
-        symbols = self.atoms.get_chemical_symbols()
-        atype = [self.type_dict[k] for k in symbols]
-        e, f, v = self.dp.eval(coords=coord, cells=cell, atom_types=atype)
+        t1 = time.perf_counter()
+        e, f, v = self.dp.eval(
+            coords=coord, cells=cell, atom_types=self.atype, out=self.out
+        )
+        t2 = time.perf_counter()
         self.results["energy"] = e[0][0]
         # see https://gitlab.com/ase/ase/-/merge_requests/2485
         self.results["free_energy"] = e[0][0]
@@ -122,12 +156,25 @@ class DP(Calculator):
         self.results["virial"] = v[0].reshape(3, 3)
 
         # convert virial into stress for lattice relaxation
-        if "stress" in properties:
-            if sum(atoms.get_pbc()) > 0:
-                # the usual convention (tensile stress is positive)
-                # stress = -virial / volume
-                stress = -0.5 * (v[0].copy() + v[0].copy().T) / atoms.get_volume()
-                # Voigt notation
-                self.results["stress"] = stress.flat[[0, 4, 8, 5, 2, 1]]
-            else:
-                raise PropertyNotImplementedError
+        # the stress is always computed for periodic systems, so that it is given
+        # by the same calculation as the energy and the forces
+        if pbc:
+            # the usual convention (tensile stress is positive)
+            # stress = -virial / volume
+            # in Voigt notation: xx, yy, zz, yz, xz, xy
+            self.results["stress"] = (
+                -0.5
+                * (v[0, [0, 4, 8, 5, 2, 1]] + v[0, [0, 4, 8, 7, 6, 3]])
+                / self.atoms.get_volume()
+            )
+        elif "stress" in properties:
+            raise PropertyNotImplementedError
+        t3 = time.perf_counter()
+        self.timing["prepare"] += t1 - t0
+        self.timing["eval"] += t2 - t1
+        self.timing["post"] += t3 - t2
+        self.timing["ncalls"] += 1
+
+    def reset_timing(self) -> None:
+        """Reset the accumulated timing of the calculations."""
+        self.timing = {"prepare": 0.0, "eval": 0.0, "post": 0.0, "ncalls": 0}
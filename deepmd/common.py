@@ -20,23 +20,21 @@ from typing import (
 )
 
 import numpy as np
-import tensorflow
 import yaml
-from tensorflow.python.framework import (
-    tensor_util,
-)
 
+from deepmd import (
+    env,
+)
 from deepmd.env import (
     GLOBAL_NP_FLOAT_PRECISION,
-    GLOBAL_TF_FLOAT_PRECISION,
-    op_module,
-    tf,
 )
 from deepmd.utils.path import (
     DPPath,
 )
 
 if TYPE_CHECKING:
+    import tensorflow.compat.v1 as tf
+
     _DICT_VAL = TypeVar("_DICT_VAL")
     _OBJ = TypeVar("_OBJ")
     try:
@@ -49,16 +47,34 @@ if TYPE_CHECKING:
     _PRECISION = Literal["default", "float16", "float32", "float64"]
 
 # define constants
-PRECISION_DICT = {
-    "default": GLOBAL_TF_FLOAT_PRECISION,
-    "float16": tf.float16,
-    "float32": tf.float32,
-    "float64": tf.float64,
-    "bfloat16": tf.bfloat16,
-}
+# the names are available without importing TensorFlow, while
+# `PRECISION_DICT` and `ACTIVATION_FN_DICT` import it on first use
+VALID_PRECISION = ("default", "float16", "float32", "float64", "bfloat16")
+VALID_ACTIVATION = (
+    "relu",
+    "relu6",
+    "softplus",
+    "sigmoid",
+    "tanh",
+    "gelu",
+    "gelu_tf",
+    "None",
+    "none",
+)
 
 
-def gelu(x: tf.Tensor) -> tf.Tensor:
+def _make_precision_dict() -> Dict[str, "tf.DType"]:
+    tf = env.tf
+    return {
+        "default": env.GLOBAL_TF_FLOAT_PRECISION,
+        "float16": tf.float16,
+        "float32": tf.float32,
+        "float64": tf.float64,
+        "bfloat16": tf.bfloat16,
+    }
+
+
+def gelu(x: "tf.Tensor") -> "tf.Tensor":
     """Gaussian Error Linear Unit.
 
     This is a smoother version of the RELU, implemented by custom operator.
@@ -78,10 +94,10 @@ def gelu(x: tf.Tensor) -> tf.Tensor:
     Original paper
     https://arxiv.org/abs/1606.08415
     """
-    return op_module.gelu_custom(x)
+    return env.op_module.gelu_custom(x)
 
 
-def gelu_tf(x: tf.Tensor) -> tf.Tensor:
+def gelu_tf(x: "tf.Tensor") -> "tf.Tensor":
     """Gaussian Error Linear Unit.
 
     This is a smoother version of the RELU, implemented by TF.
@@ -103,13 +119,15 @@ def gelu_tf(x: tf.Tensor) -> tf.Tensor:
     """
 
     def gelu_wrapper(x):
+        import tensorflow
+
         try:
             return tensorflow.nn.gelu(x, approximate=True)
         except AttributeError:
             warnings.warn(
                 "TensorFlow does not provide an implementation of gelu, please upgrade your TensorFlow version. Fallback to the custom gelu operator."
             )
-            return op_module.gelu_custom(x)
+            return env.op_module.gelu_custom(x)
 
     return (lambda x: gelu_wrapper(x))(x)
 
@@ -118,19 +136,36 @@ def gelu_tf(x: tf.Tensor) -> tf.Tensor:
 # TODO anyone can write and there is no good way to keep track of the changes
 data_requirement = {}
 
-ACTIVATION_FN_DICT = {
-    "relu": tf.nn.relu,
-    "relu6": tf.nn.relu6,
-    "softplus": tf.nn.softplus,
-    "sigmoid": tf.sigmoid,
-    "tanh": tf.nn.tanh,
-    "gelu": gelu,
-    "gelu_tf": gelu_tf,
-    "None": None,
-    "none": None,
+
+def _make_activation_fn_dict() -> Dict[str, Optional[Callable]]:
+    tf = env.tf
+    return {
+        "relu": tf.nn.relu,
+        "relu6": tf.nn.relu6,
+        "softplus": tf.nn.softplus,
+        "sigmoid": tf.sigmoid,
+        "tanh": tf.nn.tanh,
+        "gelu": gelu,
+        "gelu_tf": gelu_tf,
+        "None": None,
+        "none": None,
+    }
+
+
+_LAZY_CONSTANTS = {
+    "PRECISION_DICT": _make_precision_dict,
+    "ACTIVATION_FN_DICT": _make_activation_fn_dict,
 }
 
 
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_CONSTANTS:
+        if name not in globals():
+            globals()[name] = _LAZY_CONSTANTS[name]()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def add_data_requirement(
     key: str,
     ndof: int,
@@ -290,7 +325,7 @@ def j_loader(filename: Union[str, Path]) -> Dict[str, Any]:
 
 def get_activation_func(
     activation_fn: Union["_ACTIVATION", None],
-) -> Union[Callable[[tf.Tensor], tf.Tensor], None]:
+) -> Union[Callable[["tf.Tensor"], "tf.Tensor"], None]:
     """Get activation function callable based on string name.
 
     Parameters
@@ -310,9 +345,9 @@ def get_activation_func(
     """
     if activation_fn is None:
         return None
-    if activation_fn not in ACTIVATION_FN_DICT:
+    if activation_fn not in VALID_ACTIVATION:
         raise RuntimeError(f"{activation_fn} is not a valid activation function")
-    return ACTIVATION_FN_DICT[activation_fn]
+    return __getattr__("ACTIVATION_FN_DICT")[activation_fn]
 
 
 def get_precision(precision: "_PRECISION") -> Any:
@@ -333,9 +368,9 @@ def get_precision(precision: "_PRECISION") -> Any:
     RuntimeError
         if supplied precision string does not have acorresponding TF constant
     """
-    if precision not in PRECISION_DICT:
+    if precision not in VALID_PRECISION:
         raise RuntimeError(f"{precision} is not a valid precision")
-    return PRECISION_DICT[precision]
+    return __getattr__("PRECISION_DICT")[precision]
 
 
 # TODO port completely to pathlib when all callers are ported
@@ -390,8 +425,8 @@ def get_np_precision(precision: "_PRECISION") -> np.dtype:
 
 
 def safe_cast_tensor(
-    input: tf.Tensor, from_precision: tf.DType, to_precision: tf.DType
-) -> tf.Tensor:
+    input: "tf.Tensor", from_precision: "tf.DType", to_precision: "tf.DType"
+) -> "tf.Tensor":
     """Convert a Tensor from a precision to another precision.
 
     If input is not a Tensor or without the specific precision, the method will not
@@ -411,8 +446,12 @@ def safe_cast_tensor(
     tf.Tensor
         casted Tensor
     """
+    from tensorflow.python.framework import (
+        tensor_util,
+    )
+
     if tensor_util.is_tensor(input) and input.dtype == from_precision:
-        return tf.cast(input, to_precision)
+        return env.tf.cast(input, to_precision)
     return input
 
 
@@ -453,33 +492,31 @@ def cast_precision(func: Callable) -> Callable:
 
     @wraps(func)
     def wrapper(self, *args, **kwargs):
+        global_precision = env.GLOBAL_TF_FLOAT_PRECISION
         # only convert tensors
         returned_tensor = func(
             self,
-            *[
-                safe_cast_tensor(vv, GLOBAL_TF_FLOAT_PRECISION, self.precision)
-                for vv in args
-            ],
+            *[safe_cast_tensor(vv, global_precision, self.precision) for vv in args],
             **{
-                kk: safe_cast_tensor(vv, GLOBAL_TF_FLOAT_PRECISION, self.precision)
+                kk: safe_cast_tensor(vv, global_precision, self.precision)
                 for kk, vv in kwargs.items()
             },
         )
         if isinstance(returned_tensor, tuple):
             return tuple(
-                safe_cast_tensor(vv, self.precision, GLOBAL_TF_FLOAT_PRECISION)
+                safe_cast_tensor(vv, self.precision, global_precision)
                 for vv in returned_tensor
             )
         else:
-            return safe_cast_tensor(
-                returned_tensor, self.precision, GLOBAL_TF_FLOAT_PRECISION
-            )
+            return safe_cast_tensor(returned_tensor, self.precision, global_precision)
 
     return wrapper
 
 
 def clear_session():
     """Reset all state generated by DeePMD-kit."""
-    tf.reset_default_graph()
+    # nothing to reset if TensorFlow has not been used
+    if env.is_tf_loaded():
+        env.tf.reset_default_graph()
     # TODO: remove this line when data_requirement is not a global variable
     data_requirement.clear()
@@ -1,32 +1,29 @@
-"""Submodule that contains all the DeePMD-Kit entry point scripts."""
+"""Submodule that contains all the DeePMD-Kit entry point scripts.
 
-from ..infer.model_devi import (
-    make_model_devi,
-)
-from .compress import (
-    compress,
-)
-from .convert import (
-    convert,
-)
-from .doc import (
-    doc_train_input,
-)
-from .freeze import (
-    freeze,
-)
-from .neighbor_stat import (
-    neighbor_stat,
-)
-from .test import (
-    test,
+The entry points are imported on first access, so that the commands that do
+not need TensorFlow do not import it.
+"""
+
+from deepmd.utils.lazy import (
+    lazy_attributes,
 )
 
-# import `train` as `train_dp` to avoid the conflict of the
-# module name `train` and the function name `train`
-from .train import train as train_dp
-from .transfer import (
-    transfer,
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "make_model_devi": ("..infer.model_devi", "make_model_devi"),
+        "compress": (".compress", "compress"),
+        "convert": (".convert", "convert"),
+        "doc_train_input": (".doc", "doc_train_input"),
+        "freeze": (".freeze", "freeze"),
+        "neighbor_stat": (".neighbor_stat", "neighbor_stat"),
+        "serve": (".serve", "serve"),
+        "test": (".test", "test"),
+        # import `train` as `train_dp` to avoid the conflict of the
+        # module name `train` and the function name `train`
+        "train_dp": (".train", "train"),
+        "transfer": (".transfer", "transfer"),
+    },
 )
 
 __all__ = [
@@ -40,4 +37,5 @@ __all__ = [
     "make_model_devi",
     "convert",
     "neighbor_stat",
+    "serve",
 ]
@@ -13,27 +13,14 @@ from typing import (
 
 from deepmd import (
     __version__,
+    entrypoints,
 )
 from deepmd.common import (
     clear_session,
 )
-from deepmd.entrypoints import (
-    compress,
-    convert,
-    doc_train_input,
-    freeze,
-    make_model_devi,
-    neighbor_stat,
-    test,
-    train_dp,
-    transfer,
-)
 from deepmd.loggers import (
     set_log_handles,
 )
-from deepmd.nvnmd.entrypoints.train import (
-    train_nvnmd,
-)
 
 __all__ = ["main", "parse_args", "get_ll", "main_parser"]
 
@@ -201,6 +188,12 @@ def main_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Skip calculating neighbor statistics. Sel checking, automatic sel, and model compression will be disabled.",
     )
+    parser_train.add_argument(
+        "--neighbor-stat-nproc",
+        type=int,
+        default=1,
+        help="The number of processes to calculate neighbor statistics of the systems in parallel.",
+    )
 
     # * freeze script ******************************************************************
     parser_frz = subparsers.add_parser(
@@ -312,6 +305,21 @@ def main_parser() -> argparse.ArgumentParser:
         default=False,
         help="Test the accuracy of atomic label, i.e. energy / tensor (dipole, polar)",
     )
+    parser_tst.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Evaluate the test frames of energy models in chunks of this size. "
+        "The errors are accumulated and the detail files are written chunk by chunk, "
+        "so the memory usage does not grow with the number of test frames",
+    )
+    parser_tst.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="The number of threads testing the systems in parallel",
+    )
 
     # * compress model *****************************************************************
     # Compress a model, which including tabulating the embedding-net.
@@ -454,6 +462,18 @@ def main_parser() -> argparse.ArgumentParser:
         type=int,
         help="The trajectory frequency of the system",
     )
+    parser_model_devi.add_argument(
+        "--chunk-size",
+        default=1024,
+        type=int,
+        help="The number of frames read and evaluated at a time",
+    )
+    parser_model_devi.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Continue an interrupted run by skipping the frames already written to the output file",
+    )
 
     # * convert models
     parser_transform = subparsers.add_parser(
@@ -534,6 +554,65 @@ def main_parser() -> argparse.ArgumentParser:
         default=False,
         help="treat all types as a single type. Used with se_atten descriptor.",
     )
+    parser_neighbor_stat.add_argument(
+        "--nproc",
+        type=int,
+        default=1,
+        help="The number of processes to scan the systems in parallel.",
+    )
+
+    # * serve model ******************************************************************
+    parser_serve = subparsers.add_parser(
+        "serve",
+        parents=[parser_log],
+        help="serve a frozen model to local clients with dynamic batching",
+        formatter_class=RawTextArgumentDefaultsHelpFormatter,
+        epilog=textwrap.dedent(
+            """\
+        examples:
+            dp serve -m graph.pb --port 8000
+            dp serve -m graph.pb --socket /tmp/dp.sock
+        """
+        ),
+    )
+    parser_serve.add_argument(
+        "-m",
+        "--model",
+        default="frozen_model.pb",
+        type=str,
+        help="Frozen model file to serve",
+    )
+    parser_serve.add_argument(
+        "--host",
+        default="127.0.0.1",
+        type=str,
+        help="The host of the HTTP server",
+    )
+    parser_serve.add_argument(
+        "-p",
+        "--port",
+        default=8000,
+        type=int,
+        help="The port of the HTTP server",
+    )
+    parser_serve.add_argument(
+        "--socket",
+        default=None,
+        type=str,
+        help="Listen on this Unix socket instead of HTTP over TCP",
+    )
+    parser_serve.add_argument(
+        "--max-delay",
+        default=2.0,
+        type=float,
+        help="The maximum time (ms) to wait for more requests before evaluating a batch",
+    )
+    parser_serve.add_argument(
+        "--max-frames",
+        default=1024,
+        type=int,
+        help="The maximum number of frames in a batch",
+    )
 
     # --version
     parser.add_argument(
@@ -619,25 +698,32 @@ def main(args: Optional[List[str]] = None):
 
     dict_args = vars(args)
 
+    # the entry points, and TensorFlow if they need it, are imported on demand
     if args.command == "train":
-        train_dp(**dict_args)
+        entrypoints.train_dp(**dict_args)
     elif args.command == "freeze":
-        freeze(**dict_args)
+        entrypoints.freeze(**dict_args)
     elif args.command == "test":
-        test(**dict_args)
+        entrypoints.test(**dict_args)
     elif args.command == "transfer":
-        transfer(**dict_args)
+        entrypoints.transfer(**dict_args)
     elif args.command == "compress":
-        compress(**dict_args)
+        entrypoints.compress(**dict_args)
     elif args.command == "doc-train-input":
-        doc_train_input(**dict_args)
+        entrypoints.doc_train_input(**dict_args)
     elif args.command == "model-devi":
-        make_model_devi(**dict_args)
+        entrypoints.make_model_devi(**dict_args)
     elif args.command == "convert-from":
-        convert(**dict_args)
+        entrypoints.convert(**dict_args)
     elif args.command == "neighbor-stat":
-        neighbor_stat(**dict_args)
+        entrypoints.neighbor_stat(**dict_args)
+    elif args.command == "serve":
+        entrypoints.serve(**dict_args)
     elif args.command == "train-nvnmd":  # nvnmd
+        from deepmd.nvnmd.entrypoints.train import (
+            train_nvnmd,
+        )
+
         train_nvnmd(**dict_args)
     elif args.command is None:
         pass
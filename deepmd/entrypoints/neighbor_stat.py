@@ -22,6 +22,7 @@ def neighbor_stat(
     rcut: float,
     type_map: List[str],
     one_type: bool = False,
+    nproc: int = 1,
     **kwargs,
 ):
     """Calculate neighbor statistics.
@@ -36,6 +37,8 @@ def neighbor_stat(
         type map
     one_type : bool, optional, default=False
         treat all types as a single type
+    nproc : int, optional, default=1
+        the number of processes to scan the systems in parallel
     **kwargs
         additional arguments
 
@@ -56,7 +59,7 @@ def neighbor_stat(
         type_map=type_map,
     )
     data.get_batch()
-    nei = NeighborStat(data.get_ntypes(), rcut, one_type=one_type)
+    nei = NeighborStat(data.get_ntypes(), rcut, one_type=one_type, nproc=nproc)
     min_nbor_dist, max_nbor_size = nei.get_stat(data)
     log.info("min_nbor_dist: %f" % min_nbor_dist)
     log.info("max_nbor_size: %s" % str(max_nbor_size))
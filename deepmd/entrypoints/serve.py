@@ -0,0 +1,70 @@
+"""Serve a frozen model to local clients."""
+
+import logging
+from typing import (
+    Optional,
+)
+
+from deepmd.infer.deep_pot import (
+    DeepPot,
+)
+from deepmd.infer.deep_pot_server import (
+    make_server,
+)
+
+log = logging.getLogger(__name__)
+
+
+def serve(
+    *,
+    model: str,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    socket: Optional[str] = None,
+    max_delay: float = 2.0,
+    max_frames: int = 1024,
+    **kwargs,
+):
+    """Serve a frozen energy model with dynamic batching.
+
+    Parameters
+    ----------
+    model : str
+        frozen model file
+    host : str, default="127.0.0.1"
+        host of the HTTP server
+    port : int, default=8000
+        port of the HTTP server
+    socket : str, optional
+        path of the Unix socket to listen on instead of HTTP over TCP
+    max_delay : float, default=2.0
+        maximum time (ms) to wait for more requests before evaluating a batch
+    max_frames : int, default=1024
+        maximum number of frames in a batch
+    **kwargs
+        additional arguments
+    """
+    dp = DeepPot(model)
+    server = make_server(
+        dp,
+        host=host,
+        port=port,
+        socket_path=socket,
+        max_delay=max_delay * 1e-3,
+        max_frames=max_frames,
+    )
+    if socket is not None:
+        log.info(f"serving {model} on unix://{socket}")
+    else:
+        log.info(f"serving {model} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+        log.info(
+            f"{server.batcher.nrequests} requests evaluated "
+            f"in {server.batcher.nbatches} batches"
+        )
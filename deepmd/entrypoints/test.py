@@ -1,11 +1,23 @@
 """Test trained DeePMD model."""
 import logging
+import tempfile
+import threading
+from collections import (
+    deque,
+)
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
+from contextlib import (
+    contextmanager,
+)
 from pathlib import (
     Path,
 )
 from typing import (
     TYPE_CHECKING,
     Dict,
+    Iterator,
     List,
     Optional,
     Tuple,
@@ -35,6 +47,9 @@ if TYPE_CHECKING:
         DeepPot,
         DeepWFC,
     )
+    from deepmd.infer.deep_eval import (
+        DeepEval,
+    )
     from deepmd.infer.deep_tensor import (
         DeepTensor,
     )
@@ -55,6 +70,8 @@ def test(
     shuffle_test: bool,
     detail_file: str,
     atomic: bool,
+    chunk_size: Optional[int] = None,
+    jobs: int = 1,
     **kwargs,
 ):
     """Test model predictions.
@@ -79,6 +96,12 @@ def test(
         file where test details will be output
     atomic : bool
         whether per atom quantities should be computed
+    chunk_size : Optional[int]
+        if given, energy models are tested in chunks of this number of frames
+        with memory-mapped data, so the memory usage does not grow with the
+        number of test frames
+    jobs : int
+        number of threads testing the systems in parallel
     **kwargs
         additional arguments
 
@@ -105,27 +128,29 @@ def test(
 
     # init model
     dp = DeepPotential(model)
-
-    for cc, system in enumerate(all_sys):
-        log.info("# ---------------output of dp test--------------- ")
-        log.info(f"# testing system : {system}")
-
-        # create data class
-        tmap = dp.get_type_map() if dp.model_type == "ener" else None
-        data = DeepmdData(system, set_prefix, shuffle_test=shuffle_test, type_map=tmap)
-
-        if dp.model_type == "ener":
-            err = test_ener(
-                dp,
-                data,
-                system,
-                numb_test,
-                detail_file,
-                atomic,
-                append_detail=(cc != 0),
-            )
-        elif dp.model_type == "dos":
-            err = test_dos(
+    if chunk_size is not None and dp.model_type != "ener":
+        log.warning(
+            f"Testing in chunks is not supported by {dp.model_type} models, "
+            "all the test frames are evaluated at once"
+        )
+        chunk_size = None
+
+    if jobs > 1:
+        err_coll = test_systems_parallel(
+            dp,
+            all_sys,
+            jobs,
+            set_prefix=set_prefix,
+            numb_test=numb_test,
+            shuffle_test=shuffle_test,
+            detail_file=detail_file,
+            atomic=atomic,
+            chunk_size=chunk_size,
+        )
+    else:
+        for cc, system in enumerate(all_sys):
+            data = make_test_data(dp, system, set_prefix, shuffle_test, chunk_size)
+            err = test_system(
                 dp,
                 data,
                 system,
@@ -133,20 +158,9 @@ def test(
                 detail_file,
                 atomic,
                 append_detail=(cc != 0),
+                chunk_size=chunk_size,
             )
-        elif dp.model_type == "dipole":
-            err = test_dipole(dp, data, numb_test, detail_file, atomic)
-        elif dp.model_type == "polar":
-            err = test_polar(dp, data, numb_test, detail_file, atomic=atomic)
-        elif dp.model_type == "global_polar":  # should not appear in this new version
-            log.warning(
-                "Global polar model is not currently supported. Please directly use the polar mode and change loss parameters."
-            )
-            err = test_polar(
-                dp, data, numb_test, detail_file, atomic=False
-            )  # YWolfeee: downward compatibility
-        log.info("# ----------------------------------------------- ")
-        err_coll.append(err)
+            err_coll.append(err)
 
     avg_err = weighted_average(err_coll)
 
@@ -171,6 +185,270 @@ def test(
         log.info("# ----------------------------------------------- ")
 
 
+def make_test_data(
+    dp: "DeepEval",
+    system: str,
+    set_prefix: str,
+    shuffle_test: bool,
+    chunk_size: Optional[int] = None,
+) -> DeepmdData:
+    """Create the data class of a tested system.
+
+    Parameters
+    ----------
+    dp : DeepEval
+        instance of deep potential
+    system : str
+        system directory
+    set_prefix : str
+        string prefix of set
+    shuffle_test : bool
+        whether to shuffle tests
+    chunk_size : Optional[int], optional
+        if given, the sets are memory-mapped, by default None
+
+    Returns
+    -------
+    DeepmdData
+        data container object
+    """
+    tmap = dp.get_type_map() if dp.model_type == "ener" else None
+    return DeepmdData(
+        system,
+        set_prefix,
+        shuffle_test=shuffle_test,
+        type_map=tmap,
+        memmap=chunk_size is not None,
+    )
+
+
+def add_test_data(dp: "DeepEval", data: DeepmdData, atomic: bool):
+    """Add the data items required to test the model to the data class.
+
+    Parameters
+    ----------
+    dp : DeepEval
+        instance of deep potential
+    data : DeepmdData
+        data container object
+    atomic : bool
+        whether per atom quantities should be computed
+    """
+    if dp.model_type == "ener":
+        add_ener_data(dp, data, atomic)
+    elif dp.model_type == "dos":
+        add_dos_data(dp, data, atomic)
+    elif dp.model_type == "dipole":
+        add_dipole_data(dp, data, atomic)
+    elif dp.model_type == "polar":
+        add_polar_data(dp, data, atomic)
+    elif dp.model_type == "global_polar":
+        add_polar_data(dp, data, False)
+
+
+def test_system(
+    dp: "DeepEval",
+    data: DeepmdData,
+    system: str,
+    numb_test: int,
+    detail_file: Optional[str],
+    atomic: bool,
+    append_detail: bool = False,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, Tuple[float, float]]:
+    """Test the model on a single system.
+
+    Parameters
+    ----------
+    dp : DeepEval
+        instance of deep potential
+    data : DeepmdData
+        data container object
+    system : str
+        system directory
+    numb_test : int
+        munber of tests to do
+    detail_file : Optional[str]
+        file where test details will be output
+    atomic : bool
+        whether per atom quantities should be computed
+    append_detail : bool, optional
+        if true append output detail file, by default False
+    chunk_size : Optional[int], optional
+        if given, energy models are tested in chunks of this size, by default None
+
+    Returns
+    -------
+    Dict[str, Tuple[float, float]]
+        the errors and their weights
+    """
+    log.info("# ---------------output of dp test--------------- ")
+    log.info(f"# testing system : {system}")
+    if dp.model_type == "ener":
+        err = test_ener(
+            dp,
+            data,
+            system,
+            numb_test,
+            detail_file,
+            atomic,
+            append_detail=append_detail,
+            chunk_size=chunk_size,
+        )
+    elif dp.model_type == "dos":
+        err = test_dos(
+            dp,
+            data,
+            system,
+            numb_test,
+            detail_file,
+            atomic,
+            append_detail=append_detail,
+        )
+    elif dp.model_type == "dipole":
+        err = test_dipole(dp, data, numb_test, detail_file, atomic)
+    elif dp.model_type == "polar":
+        err = test_polar(dp, data, numb_test, detail_file, atomic=atomic)
+    elif dp.model_type == "global_polar":  # should not appear in this new version
+        log.warning(
+            "Global polar model is not currently supported. Please directly use the polar mode and change loss parameters."
+        )
+        err = test_polar(
+            dp, data, numb_test, detail_file, atomic=False
+        )  # YWolfeee: downward compatibility
+    log.info("# ----------------------------------------------- ")
+    return err
+
+
+class LogBuffer(logging.Filter):
+    """Hold back the records logged by some threads.
+
+    Attached to a logger, the records logged by a thread inside `capture` are
+    collected instead of being emitted, so that they can be replayed later in a
+    deterministic order.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.buffers = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        buffer = self.buffers.get(threading.get_ident())
+        if buffer is None:
+            return True
+        buffer.append(record)
+        return False
+
+    @contextmanager
+    def capture(self) -> Iterator[List[logging.LogRecord]]:
+        """Collect the records logged by the current thread."""
+        records = []
+        self.buffers[threading.get_ident()] = records
+        try:
+            yield records
+        finally:
+            del self.buffers[threading.get_ident()]
+
+
+def test_systems_parallel(
+    dp: "DeepEval",
+    all_sys: List[str],
+    jobs: int,
+    *,
+    set_prefix: str,
+    numb_test: int,
+    shuffle_test: bool,
+    detail_file: Optional[str],
+    atomic: bool,
+    chunk_size: Optional[int] = None,
+) -> List[Dict[str, Tuple[float, float]]]:
+    """Test the model on many systems with a pool of threads.
+
+    The model is shared by all the threads. The test sets are loaded (and
+    shuffled) by the calling thread in the order of the systems while the
+    workers evaluate the previously loaded systems. The log messages and the
+    detail files of each system are emitted in the order of the systems, so
+    the output is the same as testing the systems one after another.
+
+    Parameters
+    ----------
+    dp : DeepEval
+        instance of deep potential
+    all_sys : List[str]
+        system directories
+    jobs : int
+        number of worker threads
+    set_prefix : str
+        string prefix of set
+    numb_test : int
+        munber of tests to do
+    shuffle_test : bool
+        whether to shuffle tests
+    detail_file : Optional[str]
+        file where test details will be output
+    atomic : bool
+        whether per atom quantities should be computed
+    chunk_size : Optional[int], optional
+        if given, energy models are tested in chunks of this size, by default None
+
+    Returns
+    -------
+    List[Dict[str, Tuple[float, float]]]
+        the errors of each system
+    """
+    err_coll = []
+    log_buffer = LogBuffer()
+    # the detail files of ener and dos models collect all systems
+    append_detail = dp.model_type in ("ener", "dos")
+    # at most two systems per worker are loaded at the same time
+    pending = deque()
+
+    def run(cc: int, system: str, data: DeepmdData, tmp_dir: str):
+        sys_detail_file = str(Path(tmp_dir) / str(cc)) if detail_file else None
+        with log_buffer.capture() as records:
+            err = test_system(
+                dp,
+                data,
+                system,
+                numb_test,
+                sys_detail_file,
+                atomic,
+                chunk_size=chunk_size,
+            )
+        return err, records
+
+    def collect(tmp_dir: str):
+        cc, future = pending.popleft()
+        err, records = future.result()
+        for record in records:
+            log.handle(record)
+        if detail_file is not None:
+            for src in sorted(Path(tmp_dir).glob(f"{cc}.*")):
+                dst = Path(detail_file).with_suffix(src.name[len(str(cc)) :])
+                with dst.open("ab" if append_detail and cc != 0 else "wb") as fp:
+                    fp.write(src.read_bytes())
+                src.unlink()
+        err_coll.append(err)
+
+    log.addFilter(log_buffer)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir, ThreadPoolExecutor(
+            max_workers=jobs
+        ) as executor:
+            for cc, system in enumerate(all_sys):
+                data = make_test_data(dp, system, set_prefix, shuffle_test, chunk_size)
+                add_test_data(dp, data, atomic)
+                data.load_test()
+                pending.append((cc, executor.submit(run, cc, system, data, tmp_dir)))
+                if len(pending) >= 2 * jobs:
+                    collect(tmp_dir)
+            while pending:
+                collect(tmp_dir)
+    finally:
+        log.removeFilter(log_buffer)
+    return err_coll
+
+
 def mae(diff: np.ndarray) -> float:
     """Calcalte mean absulote error.
 
@@ -224,6 +502,70 @@ def save_txt_file(
         np.savetxt(fp, data, header=header)
 
 
+class ErrorAccumulator:
+    """Running mean absolute error and root mean square error.
+
+    The differences are fed chunk by chunk, so the errors of a data set can be
+    computed without holding all the differences in memory.
+    """
+
+    def __init__(self):
+        self.sum_abs = 0.0
+        self.sum_sq = 0.0
+        self.size = 0
+
+    def add(self, diff: np.ndarray):
+        """Accumulate the differences of a chunk.
+
+        Parameters
+        ----------
+        diff : np.ndarray
+            difference
+        """
+        self.sum_abs += np.sum(np.abs(diff))
+        self.sum_sq += np.sum(diff * diff)
+        self.size += diff.size
+
+    def mae(self) -> float:
+        """Mean absolute error of the accumulated differences, NaN if there is none."""
+        if self.size == 0:
+            return np.nan
+        return self.sum_abs / self.size
+
+    def rmse(self) -> float:
+        """Root mean square error of the accumulated differences, NaN if there is none."""
+        if self.size == 0:
+            return np.nan
+        return np.sqrt(self.sum_sq / self.size)
+
+
+def add_ener_data(dp: "DeepPot", data: DeepmdData, has_atom_ener: bool):
+    """Add the data items required to test ener type model.
+
+    Parameters
+    ----------
+    dp : DeepPot
+        instance of deep potential
+    data : DeepmdData
+        data container object
+    has_atom_ener : bool
+        whether per atom quantities should be computed
+    """
+    data.add("energy", 1, atomic=False, must=False, high_prec=True)
+    data.add("force", 3, atomic=True, must=False, high_prec=False)
+    data.add("virial", 9, atomic=False, must=False, high_prec=False)
+    if dp.has_efield:
+        data.add("efield", 3, atomic=True, must=True, high_prec=False)
+    if has_atom_ener:
+        data.add("atom_ener", 1, atomic=True, must=True, high_prec=False)
+    if dp.get_dim_fparam() > 0:
+        data.add(
+            "fparam", dp.get_dim_fparam(), atomic=False, must=True, high_prec=False
+        )
+    if dp.get_dim_aparam() > 0:
+        data.add("aparam", dp.get_dim_aparam(), atomic=True, must=True, high_prec=False)
+
+
 def test_ener(
     dp: "DeepPot",
     data: DeepmdData,
@@ -232,6 +574,7 @@ def test_ener(
     detail_file: Optional[str],
     has_atom_ener: bool,
     append_detail: bool = False,
+    chunk_size: Optional[int] = None,
 ) -> Tuple[List[np.ndarray], List[int]]:
     """Test energy type model.
 
@@ -251,131 +594,229 @@ def test_ener(
         whether per atom quantities should be computed
     append_detail : bool, optional
         if true append output detail file, by default False
+    chunk_size : Optional[int], optional
+        if given, the frames are evaluated in chunks of this size, the errors
+        are accumulated on the fly and the detail files are appended chunk by
+        chunk, and the force errors of each atom type are also given, by
+        default None
 
     Returns
     -------
     Tuple[List[np.ndarray], List[int]]
         arrays with results and their shapes
     """
-    data.add("energy", 1, atomic=False, must=False, high_prec=True)
-    data.add("force", 3, atomic=True, must=False, high_prec=False)
-    data.add("virial", 9, atomic=False, must=False, high_prec=False)
-    if dp.has_efield:
-        data.add("efield", 3, atomic=True, must=True, high_prec=False)
-    if has_atom_ener:
-        data.add("atom_ener", 1, atomic=True, must=True, high_prec=False)
-    if dp.get_dim_fparam() > 0:
-        data.add(
-            "fparam", dp.get_dim_fparam(), atomic=False, must=True, high_prec=False
-        )
-    if dp.get_dim_aparam() > 0:
-        data.add("aparam", dp.get_dim_aparam(), atomic=True, must=True, high_prec=False)
+    add_ener_data(dp, data, has_atom_ener)
 
-    test_data = data.get_test()
     mixed_type = data.mixed_type
-    natoms = len(test_data["type"][0])
-    nframes = test_data["box"].shape[0]
-    numb_test = min(nframes, numb_test)
-
-    coord = test_data["coord"][:numb_test].reshape([numb_test, -1])
-    box = test_data["box"][:numb_test]
-    if dp.has_efield:
-        efield = test_data["efield"][:numb_test].reshape([numb_test, -1])
-    else:
-        efield = None
-    if not data.pbc:
-        box = None
-    if mixed_type:
-        atype = test_data["type"][:numb_test].reshape([numb_test, -1])
-    else:
-        atype = test_data["type"][0]
-    if dp.get_dim_fparam() > 0:
-        fparam = test_data["fparam"][:numb_test]
-    else:
-        fparam = None
-    if dp.get_dim_aparam() > 0:
-        aparam = test_data["aparam"][:numb_test]
-    else:
-        aparam = None
+    has_spin = dp.get_ntypes_spin() != 0
+    type_map = dp.get_type_map()
+    err_e = ErrorAccumulator()
+    err_f = ErrorAccumulator()
+    err_v = ErrorAccumulator()
+    err_ae = ErrorAccumulator()
+    err_fr = ErrorAccumulator()
+    err_fm = ErrorAccumulator()
+    # the force errors of each atom type are only given with chunk_size
+    err_ft = [ErrorAccumulator() for _ in type_map] if chunk_size is not None else []
+    detail_path = Path(detail_file) if detail_file is not None else None
+    natoms = data.get_natoms()
+    ntested = 0
+
+    for ichunk, test_data in enumerate(data.iter_test(chunk_size, ntests=numb_test)):
+        nframes = test_data["box"].shape[0]
+        ntested += nframes
+
+        coord = test_data["coord"].reshape([nframes, -1])
+        box = test_data["box"]
+        if dp.has_efield:
+            efield = test_data["efield"].reshape([nframes, -1])
+        else:
+            efield = None
+        if not data.pbc:
+            box = None
+        if mixed_type:
+            atype = test_data["type"].reshape([nframes, -1])
+        else:
+            atype = test_data["type"][0]
+        if dp.get_dim_fparam() > 0:
+            fparam = test_data["fparam"]
+        else:
+            fparam = None
+        if dp.get_dim_aparam() > 0:
+            aparam = test_data["aparam"]
+        else:
+            aparam = None
+
+        ret = dp.eval(
+            coord,
+            box,
+            atype,
+            fparam=fparam,
+            aparam=aparam,
+            atomic=has_atom_ener,
+            efield=efield,
+            mixed_type=mixed_type,
+        )
+        energy = ret[0].reshape([nframes, 1])
+        force = ret[1].reshape([nframes, -1])
+        virial = ret[2].reshape([nframes, 9])
+        if has_atom_ener:
+            ae = ret[3].reshape([nframes, -1])
+        if has_spin:
+            ntypes_real = dp.get_ntypes() - dp.get_ntypes_spin()
+            nloc = natoms
+            nloc_real = sum(
+                [np.count_nonzero(atype == ii) for ii in range(ntypes_real)]
+            )
+            force_r, force_m = np.split(
+                force, indices_or_sections=[nloc_real * 3, nloc * 3], axis=1
+            )[:2]
+            test_force_r, test_force_m = np.split(
+                test_data["force"],
+                indices_or_sections=[nloc_real * 3, nloc * 3],
+                axis=1,
+            )[:2]
+
+        diff_e = energy - test_data["energy"].reshape([-1, 1])
+        err_e.add(diff_e)
+        diff_f = force - test_data["force"]
+        err_f.add(diff_f)
+        err_v.add(virial - test_data["virial"])
+        if has_atom_ener:
+            err_ae.add(test_data["atom_ener"].reshape([-1]) - ae.reshape([-1]))
+        if has_spin:
+            err_fr.add(force_r - test_force_r)
+            err_fm.add(force_m - test_force_m)
+        elif err_ft:
+            # force errors of each atom type
+            diff_f = diff_f.reshape([nframes, natoms, 3])
+            chunk_type = np.reshape(test_data["type"], [nframes, natoms])
+            for ii, err_ft_ii in enumerate(err_ft):
+                err_ft_ii.add(diff_f[chunk_type == ii])
+
+        if detail_path is not None:
+            # the headers are written only before the first chunk of the system
+            first = ichunk == 0
+            append = append_detail or not first
+            header_e = f"{system}: data_e pred_e" if first else ""
+            header_f = (
+                f"{system}: data_fx data_fy data_fz pred_fx pred_fy pred_fz"
+                if first
+                else ""
+            )
+            header_v = (
+                f"{system}: data_vxx data_vxy data_vxz data_vyx data_vyy "
+                "data_vyz data_vzx data_vzy data_vzz pred_vxx pred_vxy pred_vxz pred_vyx "
+                "pred_vyy pred_vyz pred_vzx pred_vzy pred_vzz"
+                if first
+                else ""
+            )
+            pe = np.concatenate(
+                (
+                    np.reshape(test_data["energy"], [-1, 1]),
+                    np.reshape(energy, [-1, 1]),
+                ),
+                axis=1,
+            )
+            save_txt_file(
+                detail_path.with_suffix(".e.out"),
+                pe,
+                header=header_e,
+                append=append,
+            )
+            pe_atom = pe / natoms
+            save_txt_file(
+                detail_path.with_suffix(".e_peratom.out"),
+                pe_atom,
+                header=header_e,
+                append=append,
+            )
+            if not has_spin:
+                pf = np.concatenate(
+                    (
+                        np.reshape(test_data["force"], [-1, 3]),
+                        np.reshape(force, [-1, 3]),
+                    ),
+                    axis=1,
+                )
+                save_txt_file(
+                    detail_path.with_suffix(".f.out"),
+                    pf,
+                    header=header_f,
+                    append=append,
+                )
+            else:
+                pf_real = np.concatenate(
+                    (np.reshape(test_force_r, [-1, 3]), np.reshape(force_r, [-1, 3])),
+                    axis=1,
+                )
+                pf_mag = np.concatenate(
+                    (np.reshape(test_force_m, [-1, 3]), np.reshape(force_m, [-1, 3])),
+                    axis=1,
+                )
+                save_txt_file(
+                    detail_path.with_suffix(".fr.out"),
+                    pf_real,
+                    header=header_f,
+                    append=append,
+                )
+                save_txt_file(
+                    detail_path.with_suffix(".fm.out"),
+                    pf_mag,
+                    header=f"{system}: data_fmx data_fmy data_fmz pred_fmx pred_fmy pred_fmz"
+                    if first
+                    else "",
+                    append=append,
+                )
+            pv = np.concatenate(
+                (
+                    np.reshape(test_data["virial"], [-1, 9]),
+                    np.reshape(virial, [-1, 9]),
+                ),
+                axis=1,
+            )
+            save_txt_file(
+                detail_path.with_suffix(".v.out"),
+                pv,
+                header=header_v,
+                append=append,
+            )
+            pv_atom = pv / natoms
+            save_txt_file(
+                detail_path.with_suffix(".v_peratom.out"),
+                pv_atom,
+                header=header_v,
+                append=append,
+            )
 
-    ret = dp.eval(
-        coord,
-        box,
-        atype,
-        fparam=fparam,
-        aparam=aparam,
-        atomic=has_atom_ener,
-        efield=efield,
-        mixed_type=mixed_type,
-    )
-    energy = ret[0]
-    force = ret[1]
-    virial = ret[2]
-    energy = energy.reshape([numb_test, 1])
-    force = force.reshape([numb_test, -1])
-    virial = virial.reshape([numb_test, 9])
-    if has_atom_ener:
-        ae = ret[3]
-        av = ret[4]
-        ae = ae.reshape([numb_test, -1])
-        av = av.reshape([numb_test, -1])
-    if dp.get_ntypes_spin() != 0:
-        ntypes_real = dp.get_ntypes() - dp.get_ntypes_spin()
-        nloc = natoms
-        nloc_real = sum([np.count_nonzero(atype == ii) for ii in range(ntypes_real)])
-        force_r = np.split(
-            force, indices_or_sections=[nloc_real * 3, nloc * 3], axis=1
-        )[0]
-        force_m = np.split(
-            force, indices_or_sections=[nloc_real * 3, nloc * 3], axis=1
-        )[1]
-        test_force_r = np.split(
-            test_data["force"][:numb_test],
-            indices_or_sections=[nloc_real * 3, nloc * 3],
-            axis=1,
-        )[0]
-        test_force_m = np.split(
-            test_data["force"][:numb_test],
-            indices_or_sections=[nloc_real * 3, nloc * 3],
-            axis=1,
-        )[1]
-
-    diff_e = energy - test_data["energy"][:numb_test].reshape([-1, 1])
-    mae_e = mae(diff_e)
-    rmse_e = rmse(diff_e)
-    diff_f = force - test_data["force"][:numb_test]
-    mae_f = mae(diff_f)
-    rmse_f = rmse(diff_f)
-    diff_v = virial - test_data["virial"][:numb_test]
-    mae_v = mae(diff_v)
-    rmse_v = rmse(diff_v)
+    mae_e = err_e.mae()
+    rmse_e = err_e.rmse()
+    mae_f = err_f.mae()
+    rmse_f = err_f.rmse()
+    mae_v = err_v.mae()
+    rmse_v = err_v.rmse()
     mae_ea = mae_e / natoms
     rmse_ea = rmse_e / natoms
     mae_va = mae_v / natoms
     rmse_va = rmse_v / natoms
-    if has_atom_ener:
-        diff_ae = test_data["atom_ener"][:numb_test].reshape([-1]) - ae.reshape([-1])
-        mae_ae = mae(diff_ae)
-        rmse_ae = rmse(diff_ae)
-    if dp.get_ntypes_spin() != 0:
-        mae_fr = mae(force_r - test_force_r)
-        mae_fm = mae(force_m - test_force_m)
-        rmse_fr = rmse(force_r - test_force_r)
-        rmse_fm = rmse(force_m - test_force_m)
 
-    log.info(f"# number of test data : {numb_test:d} ")
+    log.info(f"# number of test data : {ntested:d} ")
     log.info(f"Energy MAE         : {mae_e:e} eV")
     log.info(f"Energy RMSE        : {rmse_e:e} eV")
     log.info(f"Energy MAE/Natoms  : {mae_ea:e} eV")
     log.info(f"Energy RMSE/Natoms : {rmse_ea:e} eV")
-    if dp.get_ntypes_spin() == 0:
+    if not has_spin:
         log.info(f"Force  MAE         : {mae_f:e} eV/A")
         log.info(f"Force  RMSE        : {rmse_f:e} eV/A")
+        for tname, err_ft_ii in zip(type_map, err_ft):
+            if err_ft_ii.size > 0:
+                log.info(f"Force  MAE  of {tname:4s}: {err_ft_ii.mae():e} eV/A")
+                log.info(f"Force  RMSE of {tname:4s}: {err_ft_ii.rmse():e} eV/A")
     else:
-        log.info(f"Force atom MAE      : {mae_fr:e} eV/A")
-        log.info(f"Force spin MAE      : {mae_fm:e} eV/uB")
-        log.info(f"Force atom RMSE     : {rmse_fr:e} eV/A")
-        log.info(f"Force spin RMSE     : {rmse_fm:e} eV/uB")
+        log.info(f"Force atom MAE      : {err_fr.mae():e} eV/A")
+        log.info(f"Force spin MAE      : {err_fm.mae():e} eV/uB")
+        log.info(f"Force atom RMSE     : {err_fr.rmse():e} eV/A")
+        log.info(f"Force spin RMSE     : {err_fm.rmse():e} eV/uB")
 
     if data.pbc:
         log.info(f"Virial MAE         : {mae_v:e} eV")
@@ -383,120 +824,32 @@ def test_ener(
         log.info(f"Virial MAE/Natoms  : {mae_va:e} eV")
         log.info(f"Virial RMSE/Natoms : {rmse_va:e} eV")
     if has_atom_ener:
-        log.info(f"Atomic ener MAE    : {mae_ae:e} eV")
-        log.info(f"Atomic ener RMSE   : {rmse_ae:e} eV")
-
-    if detail_file is not None:
-        detail_path = Path(detail_file)
-
-        pe = np.concatenate(
-            (
-                np.reshape(test_data["energy"][:numb_test], [-1, 1]),
-                np.reshape(energy, [-1, 1]),
-            ),
-            axis=1,
-        )
-        save_txt_file(
-            detail_path.with_suffix(".e.out"),
-            pe,
-            header="%s: data_e pred_e" % system,
-            append=append_detail,
-        )
-        pe_atom = pe / natoms
-        save_txt_file(
-            detail_path.with_suffix(".e_peratom.out"),
-            pe_atom,
-            header="%s: data_e pred_e" % system,
-            append=append_detail,
-        )
-        if dp.get_ntypes_spin() == 0:
-            pf = np.concatenate(
-                (
-                    np.reshape(test_data["force"][:numb_test], [-1, 3]),
-                    np.reshape(force, [-1, 3]),
-                ),
-                axis=1,
-            )
-            save_txt_file(
-                detail_path.with_suffix(".f.out"),
-                pf,
-                header="%s: data_fx data_fy data_fz pred_fx pred_fy pred_fz" % system,
-                append=append_detail,
-            )
-        else:
-            pf_real = np.concatenate(
-                (np.reshape(test_force_r, [-1, 3]), np.reshape(force_r, [-1, 3])),
-                axis=1,
-            )
-            pf_mag = np.concatenate(
-                (np.reshape(test_force_m, [-1, 3]), np.reshape(force_m, [-1, 3])),
-                axis=1,
-            )
-            save_txt_file(
-                detail_path.with_suffix(".fr.out"),
-                pf_real,
-                header="%s: data_fx data_fy data_fz pred_fx pred_fy pred_fz" % system,
-                append=append_detail,
-            )
-            save_txt_file(
-                detail_path.with_suffix(".fm.out"),
-                pf_mag,
-                header="%s: data_fmx data_fmy data_fmz pred_fmx pred_fmy pred_fmz"
-                % system,
-                append=append_detail,
-            )
-        pv = np.concatenate(
-            (
-                np.reshape(test_data["virial"][:numb_test], [-1, 9]),
-                np.reshape(virial, [-1, 9]),
-            ),
-            axis=1,
-        )
-        save_txt_file(
-            detail_path.with_suffix(".v.out"),
-            pv,
-            header=f"{system}: data_vxx data_vxy data_vxz data_vyx data_vyy "
-            "data_vyz data_vzx data_vzy data_vzz pred_vxx pred_vxy pred_vxz pred_vyx "
-            "pred_vyy pred_vyz pred_vzx pred_vzy pred_vzz",
-            append=append_detail,
-        )
-        pv_atom = pv / natoms
-        save_txt_file(
-            detail_path.with_suffix(".v_peratom.out"),
-            pv_atom,
-            header=f"{system}: data_vxx data_vxy data_vxz data_vyx data_vyy "
-            "data_vyz data_vzx data_vzy data_vzz pred_vxx pred_vxy pred_vxz pred_vyx "
-            "pred_vyy pred_vyz pred_vzx pred_vzy pred_vzz",
-            append=append_detail,
-        )
-    if dp.get_ntypes_spin() == 0:
-        return {
-            "mae_e": (mae_e, energy.size),
-            "mae_ea": (mae_ea, energy.size),
-            "mae_f": (mae_f, force.size),
-            "mae_v": (mae_v, virial.size),
-            "mae_va": (mae_va, virial.size),
-            "rmse_e": (rmse_e, energy.size),
-            "rmse_ea": (rmse_ea, energy.size),
-            "rmse_f": (rmse_f, force.size),
-            "rmse_v": (rmse_v, virial.size),
-            "rmse_va": (rmse_va, virial.size),
-        }
+        log.info(f"Atomic ener MAE    : {err_ae.mae():e} eV")
+        log.info(f"Atomic ener RMSE   : {err_ae.rmse():e} eV")
+
+    err = {
+        "mae_e": (mae_e, err_e.size),
+        "mae_ea": (mae_ea, err_e.size),
+        "mae_v": (mae_v, err_v.size),
+        "mae_va": (mae_va, err_v.size),
+        "rmse_e": (rmse_e, err_e.size),
+        "rmse_ea": (rmse_ea, err_e.size),
+        "rmse_v": (rmse_v, err_v.size),
+        "rmse_va": (rmse_va, err_v.size),
+    }
+    if not has_spin:
+        err["mae_f"] = (mae_f, err_f.size)
+        err["rmse_f"] = (rmse_f, err_f.size)
+        for tname, err_ft_ii in zip(type_map, err_ft):
+            if err_ft_ii.size > 0:
+                err[f"mae_f_{tname}"] = (err_ft_ii.mae(), err_ft_ii.size)
+                err[f"rmse_f_{tname}"] = (err_ft_ii.rmse(), err_ft_ii.size)
     else:
-        return {
-            "mae_e": (mae_e, energy.size),
-            "mae_ea": (mae_ea, energy.size),
-            "mae_fr": (mae_fr, force_r.size),
-            "mae_fm": (mae_fm, force_m.size),
-            "mae_v": (mae_v, virial.size),
-            "mae_va": (mae_va, virial.size),
-            "rmse_e": (rmse_e, energy.size),
-            "rmse_ea": (rmse_ea, energy.size),
-            "rmse_fr": (rmse_fr, force_r.size),
-            "rmse_fm": (rmse_fm, force_m.size),
-            "rmse_v": (rmse_v, virial.size),
-            "rmse_va": (rmse_va, virial.size),
-        }
+        err["mae_fr"] = (err_fr.mae(), err_fr.size)
+        err["mae_fm"] = (err_fm.mae(), err_fm.size)
+        err["rmse_fr"] = (err_fr.rmse(), err_fr.size)
+        err["rmse_fm"] = (err_fm.rmse(), err_fm.size)
+    return err
 
 
 def print_ener_sys_avg(avg: Dict[str, float]):
@@ -514,6 +867,11 @@ def print_ener_sys_avg(avg: Dict[str, float]):
     if "rmse_f" in avg.keys():
         log.info(f"Force  MAE         : {avg['mae_f']:e} eV/A")
         log.info(f"Force  RMSE        : {avg['rmse_f']:e} eV/A")
+        for kk in avg.keys():
+            if kk.startswith("mae_f_"):
+                tname = kk[len("mae_f_") :]
+                log.info(f"Force  MAE  of {tname:4s}: {avg[kk]:e} eV/A")
+                log.info(f"Force  RMSE of {tname:4s}: {avg['rmse_f_' + tname]:e} eV/A")
     else:
         log.info(f"Force atom MAE      : {avg['mae_fr']:e} eV/A")
         log.info(f"Force spin MAE      : {avg['mae_fm']:e} eV/uB")
@@ -525,6 +883,30 @@ def print_ener_sys_avg(avg: Dict[str, float]):
     log.info(f"Virial RMSE/Natoms : {avg['rmse_va']:e} eV")
 
 
+def add_dos_data(dp: "DeepDOS", data: DeepmdData, has_atom_dos: bool):
+    """Add the data items required to test dos type model.
+
+    Parameters
+    ----------
+    dp : DeepDOS
+        instance of deep potential
+    data : DeepmdData
+        data container object
+    has_atom_dos : bool
+        whether per atom quantities should be computed
+    """
+    data.add("dos", dp.numb_dos, atomic=False, must=True, high_prec=True)
+    if has_atom_dos:
+        data.add("atom_dos", dp.numb_dos, atomic=True, must=False, high_prec=True)
+
+    if dp.get_dim_fparam() > 0:
+        data.add(
+            "fparam", dp.get_dim_fparam(), atomic=False, must=True, high_prec=False
+        )
+    if dp.get_dim_aparam() > 0:
+        data.add("aparam", dp.get_dim_aparam(), atomic=True, must=True, high_prec=False)
+
+
 def test_dos(
     dp: "DeepDOS",
     data: DeepmdData,
@@ -558,16 +940,7 @@ def test_dos(
     Tuple[List[np.ndarray], List[int]]
         arrays with results and their shapes
     """
-    data.add("dos", dp.numb_dos, atomic=False, must=True, high_prec=True)
-    if has_atom_dos:
-        data.add("atom_dos", dp.numb_dos, atomic=True, must=False, high_prec=True)
-
-    if dp.get_dim_fparam() > 0:
-        data.add(
-            "fparam", dp.get_dim_fparam(), atomic=False, must=True, high_prec=False
-        )
-    if dp.get_dim_aparam() > 0:
-        data.add("aparam", dp.get_dim_aparam(), atomic=True, must=True, high_prec=False)
+    add_dos_data(dp, data, has_atom_dos)
 
     test_data = data.get_test()
     mixed_type = data.mixed_type
@@ -780,6 +1153,28 @@ def print_wfc_sys_avg(avg):
     log.info(f"WFC  RMSE : {avg['rmse']:e} eV/A")
 
 
+def add_polar_data(dp: "DeepPolar", data: DeepmdData, atomic: bool):
+    """Add the data items required to test polar type model.
+
+    Parameters
+    ----------
+    dp : DeepPolar
+        instance of deep potential
+    data : DeepmdData
+        data container object
+    atomic : bool
+        whether atomic polarizability is provided
+    """
+    data.add(
+        "polarizability" if not atomic else "atomic_polarizability",
+        9,
+        atomic=atomic,
+        must=True,
+        high_prec=False,
+        type_sel=dp.get_sel_type(),
+    )
+
+
 def test_polar(
     dp: "DeepPolar",
     data: DeepmdData,
@@ -808,14 +1203,7 @@ def test_polar(
     Tuple[List[np.ndarray], List[int]]
         arrays with results and their shapes
     """
-    data.add(
-        "polarizability" if not atomic else "atomic_polarizability",
-        9,
-        atomic=atomic,
-        must=True,
-        high_prec=False,
-        type_sel=dp.get_sel_type(),
-    )
+    add_polar_data(dp, data, atomic)
 
     test_data = data.get_test()
     polar, numb_test, atype = run_test(dp, test_data, numb_test, data)
@@ -872,6 +1260,28 @@ def print_polar_sys_avg(avg):
     log.info(f"Polarizability  RMSE : {avg['rmse']:e} eV/A")
 
 
+def add_dipole_data(dp: "DeepDipole", data: DeepmdData, atomic: bool):
+    """Add the data items required to test dipole type model.
+
+    Parameters
+    ----------
+    dp : DeepDipole
+        instance of deep potential
+    data : DeepmdData
+        data container object
+    atomic : bool
+        whether atomic dipole is provided
+    """
+    data.add(
+        "dipole" if not atomic else "atomic_dipole",
+        3,
+        atomic=atomic,
+        must=True,
+        high_prec=False,
+        type_sel=dp.get_sel_type(),
+    )
+
+
 def test_dipole(
     dp: "DeepDipole",
     data: DeepmdData,
@@ -899,14 +1309,7 @@ def test_dipole(
     Tuple[List[np.ndarray], List[int]]
         arrays with results and their shapes
     """
-    data.add(
-        "dipole" if not atomic else "atomic_dipole",
-        3,
-        atomic=atomic,
-        must=True,
-        high_prec=False,
-        type_sel=dp.get_sel_type(),
-    )
+    add_dipole_data(dp, data, atomic)
     test_data = data.get_test()
     dipole, numb_test, atype = run_test(dp, test_data, numb_test, data)
 
@@ -10,6 +10,7 @@ from typing import (
     Any,
     Dict,
     Optional,
+    Tuple,
 )
 
 from deepmd.common import (
@@ -76,6 +77,7 @@ def train(
     is_compress: bool = False,
     skip_neighbor_stat: bool = False,
     finetune: Optional[str] = None,
+    neighbor_stat_nproc: int = 1,
     **kwargs,
 ):
     """Run DeePMD model training.
@@ -104,6 +106,8 @@ def train(
         skip checking neighbor statistics
     finetune : Optional[str]
         path to pretrained model or None
+    neighbor_stat_nproc : int, default=1
+        the number of processes to calculate neighbor statistics
     **kwargs
         additional arguments
 
@@ -142,7 +146,7 @@ def train(
     jdata = normalize(jdata)
 
     if not is_compress and not skip_neighbor_stat:
-        jdata = update_sel(jdata)
+        jdata = update_sel(jdata, nproc=neighbor_stat_nproc)
 
     with open(output, "w") as fp:
         json.dump(jdata, fp, indent=4)
@@ -214,7 +218,11 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
         # init data
         if not multi_task_mode:
             train_data = get_data(
-                jdata["training"]["training_data"], rcut, ipt_type_map, modifier
+                jdata["training"]["training_data"],
+                rcut,
+                ipt_type_map,
+                modifier,
+                shard=_get_shard(jdata["training"]["training_data"], run_opt),
             )
             train_data.print_summary("training")
             if jdata["training"].get("validation_data", None) is not None:
@@ -238,6 +246,12 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
                         ipt_type_map,
                         modifier,
                         multi_task_mode,
+                        shard=_get_shard(
+                            jdata["training"]["data_dict"][data_systems][
+                                "training_data"
+                            ],
+                            run_opt,
+                        ),
                     )
                     train_data[data_systems].print_summary(
                         f"training in {data_systems}"
@@ -284,7 +298,14 @@ def _do_work(jdata: Dict[str, Any], run_opt: RunOptions, is_compress: bool = Fal
         log.info("finished compressing")
 
 
-def get_data(jdata: Dict[str, Any], rcut, type_map, modifier, multi_task_mode=False):
+def get_data(
+    jdata: Dict[str, Any],
+    rcut,
+    type_map,
+    modifier,
+    multi_task_mode=False,
+    shard: Optional[Tuple[int, int]] = None,
+):
     systems = j_must_have(jdata, "systems")
     if isinstance(systems, str):
         systems = expand_sys_str(systems)
@@ -311,6 +332,7 @@ def get_data(jdata: Dict[str, Any], rcut, type_map, modifier, multi_task_mode=Fa
     batch_size = j_must_have(jdata, "batch_size")
     sys_probs = jdata.get("sys_probs", None)
     auto_prob = jdata.get("auto_prob", "prob_sys_size")
+    memmap = jdata.get("memmap", False)
     optional_type_map = not multi_task_mode
 
     data = DeepmdDataSystem(
@@ -325,12 +347,21 @@ def get_data(jdata: Dict[str, Any], rcut, type_map, modifier, multi_task_mode=Fa
         trn_all_set=True,  # sample from all sets
         sys_probs=sys_probs,
         auto_prob_style=auto_prob,
+        memmap=memmap,
+        shard=shard,
     )
     data.add_dict(data_requirement)
 
     return data
 
 
+def _get_shard(jdata: Dict[str, Any], run_opt: RunOptions) -> Optional[Tuple[int, int]]:
+    """Get the shard of the training data of this rank, if the data are sharded."""
+    if jdata.get("shard", False) and run_opt.is_distrib:
+        return run_opt.my_rank, run_opt.nproc
+    return None
+
+
 def get_modifier(modi_data=None):
     modifier: Optional[DipoleChargeModifier]
     if modi_data is not None:
@@ -341,6 +372,10 @@ def get_modifier(modi_data=None):
                 modi_data["sys_charge_map"],
                 modi_data["ewald_h"],
                 modi_data["ewald_beta"],
+                correction_cache=modi_data.get("correction_cache"),
+                ewald_method=modi_data.get("ewald_method", "direct"),
+                pme_order=modi_data.get("pme_order", 8),
+                pme_oversampling=modi_data.get("pme_oversampling", 2.0),
             )
         else:
             raise RuntimeError("unknown modifier type " + str(modi_data["type"]))
@@ -364,7 +399,7 @@ def get_type_map(jdata):
     return jdata["model"].get("type_map", None)
 
 
-def get_nbor_stat(jdata, rcut, one_type: bool = False):
+def get_nbor_stat(jdata, rcut, one_type: bool = False, nproc: int = 1):
     max_rcut = get_rcut(jdata)
     type_map = get_type_map(jdata)
 
@@ -399,6 +434,7 @@ def get_nbor_stat(jdata, rcut, one_type: bool = False):
             else:
                 train_data.system_dirs += tmp_data.system_dirs
                 train_data.data_systems += tmp_data.data_systems
+                train_data.sys_locks += tmp_data.sys_locks
                 train_data.natoms += tmp_data.natoms
                 train_data.natoms_vec += tmp_data.natoms_vec
                 train_data.default_mesh += tmp_data.default_mesh
@@ -409,7 +445,7 @@ def get_nbor_stat(jdata, rcut, one_type: bool = False):
         map_ntypes = data_ntypes
     ntypes = max([map_ntypes, data_ntypes])
 
-    neistat = NeighborStat(ntypes, rcut, one_type=one_type)
+    neistat = NeighborStat(ntypes, rcut, one_type=one_type, nproc=nproc)
 
     min_nbor_dist, max_nbor_size = neistat.get_stat(train_data)
 
@@ -425,8 +461,8 @@ def get_nbor_stat(jdata, rcut, one_type: bool = False):
     return min_nbor_dist, max_nbor_size
 
 
-def get_sel(jdata, rcut, one_type: bool = False):
-    _, max_nbor_size = get_nbor_stat(jdata, rcut, one_type=one_type)
+def get_sel(jdata, rcut, one_type: bool = False, nproc: int = 1):
+    _, max_nbor_size = get_nbor_stat(jdata, rcut, one_type=one_type, nproc=nproc)
     return max_nbor_size
 
 
@@ -463,11 +499,13 @@ def wrap_up_4(xx):
     return 4 * ((int(xx) + 3) // 4)
 
 
-def update_one_sel(jdata, descriptor):
+def update_one_sel(jdata, descriptor, nproc: int = 1):
     if descriptor["type"] == "loc_frame":
         return descriptor
     rcut = descriptor["rcut"]
-    tmp_sel = get_sel(jdata, rcut, one_type=descriptor["type"] in ("se_atten",))
+    tmp_sel = get_sel(
+        jdata, rcut, one_type=descriptor["type"] in ("se_atten",), nproc=nproc
+    )
     sel = descriptor["sel"]
     if isinstance(sel, int):
         # convert to list and finnally convert back to int
@@ -491,15 +529,17 @@ def update_one_sel(jdata, descriptor):
     return descriptor
 
 
-def update_sel(jdata):
+def update_sel(jdata, nproc: int = 1):
     log.info(
         "Calculate neighbor statistics... (add --skip-neighbor-stat to skip this step)"
     )
     descrpt_data = jdata["model"]["descriptor"]
     if descrpt_data["type"] == "hybrid":
         for ii in range(len(descrpt_data["list"])):
-            descrpt_data["list"][ii] = update_one_sel(jdata, descrpt_data["list"][ii])
+            descrpt_data["list"][ii] = update_one_sel(
+                jdata, descrpt_data["list"][ii], nproc=nproc
+            )
     else:
-        descrpt_data = update_one_sel(jdata, descrpt_data)
+        descrpt_data = update_one_sel(jdata, descrpt_data, nproc=nproc)
     jdata["model"]["descriptor"] = descrpt_data
     return jdata
@@ -4,6 +4,7 @@ import ctypes
 import logging
 import os
 import platform
+import threading
 from configparser import (
     ConfigParser,
 )
@@ -31,6 +32,15 @@ if TYPE_CHECKING:
         ModuleType,
     )
 
+    import tensorflow.compat.v1 as tf
+
+    # loaded lazily by the module-level __getattr__
+    tf_py_version: str
+    default_tf_session_config: tf.ConfigProto
+    op_module: ModuleType
+    op_grads_module: ModuleType
+    GLOBAL_TF_FLOAT_PRECISION: tf.DType
+
 
 def dlopen_library(module: str, filename: str):
     """Dlopen a library from a module.
@@ -53,30 +63,6 @@ def dlopen_library(module: str, filename: str):
             ctypes.CDLL(str(libs[0].absolute()))
 
 
-# dlopen pip cuda library before tensorflow
-if platform.system() == "Linux":
-    dlopen_library("nvidia.cuda_runtime.lib", "libcudart.so*")
-    dlopen_library("nvidia.cublas.lib", "libcublasLt.so*")
-    dlopen_library("nvidia.cublas.lib", "libcublas.so*")
-    dlopen_library("nvidia.cufft.lib", "libcufft.so*")
-    dlopen_library("nvidia.curand.lib", "libcurand.so*")
-    dlopen_library("nvidia.cusolver.lib", "libcusolver.so*")
-    dlopen_library("nvidia.cusparse.lib", "libcusparse.so*")
-    dlopen_library("nvidia.cudnn.lib", "libcudnn.so*")
-
-
-# import tensorflow v1 compatability
-try:
-    import tensorflow.compat.v1 as tf
-
-    tf.disable_v2_behavior()
-except ImportError:
-    import tensorflow as tf
-try:
-    import tensorflow.compat.v2 as tfv2
-except ImportError:
-    tfv2 = None
-
 __all__ = [
     "GLOBAL_CONFIG",
     "GLOBAL_TF_FLOAT_PRECISION",
@@ -102,12 +88,6 @@ __all__ = [
 
 SHARED_LIB_MODULE = "op"
 
-# Python library version
-try:
-    tf_py_version = tf.version.VERSION
-except AttributeError:
-    tf_py_version = tf.__version__
-
 EMBEDDING_NET_PATTERN = str(
     r"filter_type_\d+/matrix_\d+_\d+|"
     r"filter_type_\d+/bias_\d+_\d+|"
@@ -292,6 +272,7 @@ def get_tf_session_config() -> Any:
     Any
         session configure object
     """
+    tf = _get_lazy("tf")
     set_tf_default_nthreads()
     intra, inter = get_tf_default_nthreads()
     if int(os.environ.get("DP_JIT", 0)):
@@ -312,16 +293,13 @@ def get_tf_session_config() -> Any:
         intra_op_parallelism_threads=intra,
         inter_op_parallelism_threads=inter,
     )
-    if Version(tf_py_version) >= Version("1.15") and int(
+    if Version(_get_lazy("tf_py_version")) >= Version("1.15") and int(
         os.environ.get("DP_AUTO_PARALLELIZATION", 0)
     ):
         config.graph_options.rewrite_options.custom_optimizers.add().name = "dpparallel"
     return config
 
 
-default_tf_session_config = get_tf_session_config()
-
-
 def reset_default_tf_session_config(cpu_only: bool):
     """Limit tensorflow session to CPU or not.
 
@@ -330,7 +308,7 @@ def reset_default_tf_session_config(cpu_only: bool):
     cpu_only : bool
         If enabled, no GPU device is visible to the TensorFlow Session.
     """
-    global default_tf_session_config
+    default_tf_session_config = _get_lazy("default_tf_session_config")
     if cpu_only:
         default_tf_session_config.device_count["GPU"] = 0
     else:
@@ -369,6 +347,8 @@ def get_module(module_name: str) -> "ModuleType":
     if not module_file.is_file():
         raise FileNotFoundError(f"module {module_name} does not exist")
     else:
+        tf = _get_lazy("tf")
+        tf_py_version = _get_lazy("tf_py_version")
         try:
             module = tf.load_op_library(str(module_file))
         except tf.errors.NotFoundError as e:
@@ -456,19 +436,14 @@ MODEL_VERSION = GLOBAL_CONFIG["model_version"]
 TF_VERSION = GLOBAL_CONFIG["tf_version"]
 TF_CXX11_ABI_FLAG = int(GLOBAL_CONFIG["tf_cxx11_abi_flag"])
 
-op_module = get_module("deepmd_op")
-op_grads_module = get_module("op_grads")
-
 # FLOAT_PREC
 dp_float_prec = os.environ.get("DP_INTERFACE_PREC", "high").lower()
 if dp_float_prec in ("high", ""):
     # default is high
-    GLOBAL_TF_FLOAT_PRECISION = tf.float64
     GLOBAL_NP_FLOAT_PRECISION = np.float64
     GLOBAL_ENER_FLOAT_PRECISION = np.float64
     global_float_prec = "double"
 elif dp_float_prec == "low":
-    GLOBAL_TF_FLOAT_PRECISION = tf.float32
     GLOBAL_NP_FLOAT_PRECISION = np.float32
     GLOBAL_ENER_FLOAT_PRECISION = np.float64
     global_float_prec = "float"
@@ -480,7 +455,7 @@ else:
     )
 
 
-def global_cvt_2_tf_float(xx: tf.Tensor) -> tf.Tensor:
+def global_cvt_2_tf_float(xx: "tf.Tensor") -> "tf.Tensor":
     """Cast tensor to globally set TF precision.
 
     Parameters
@@ -493,10 +468,11 @@ def global_cvt_2_tf_float(xx: tf.Tensor) -> tf.Tensor:
     tf.Tensor
         output tensor cast to `GLOBAL_TF_FLOAT_PRECISION`
     """
-    return tf.cast(xx, GLOBAL_TF_FLOAT_PRECISION)
+    tf = _get_lazy("tf")
+    return tf.cast(xx, _get_lazy("GLOBAL_TF_FLOAT_PRECISION"))
 
 
-def global_cvt_2_ener_float(xx: tf.Tensor) -> tf.Tensor:
+def global_cvt_2_ener_float(xx: "tf.Tensor") -> "tf.Tensor":
     """Cast tensor to globally set energy precision.
 
     Parameters
@@ -509,4 +485,104 @@ def global_cvt_2_ener_float(xx: tf.Tensor) -> tf.Tensor:
     tf.Tensor
         output tensor cast to `GLOBAL_ENER_FLOAT_PRECISION`
     """
+    tf = _get_lazy("tf")
     return tf.cast(xx, GLOBAL_ENER_FLOAT_PRECISION)
+
+
+# TensorFlow, the session configuration and the custom op libraries are
+# loaded on the first access of the following attributes, so that the
+# commands and the modules that do not need them start quickly.
+
+
+def _import_tf() -> "ModuleType":
+    # dlopen pip cuda library before tensorflow
+    if platform.system() == "Linux":
+        dlopen_library("nvidia.cuda_runtime.lib", "libcudart.so*")
+        dlopen_library("nvidia.cublas.lib", "libcublasLt.so*")
+        dlopen_library("nvidia.cublas.lib", "libcublas.so*")
+        dlopen_library("nvidia.cufft.lib", "libcufft.so*")
+        dlopen_library("nvidia.curand.lib", "libcurand.so*")
+        dlopen_library("nvidia.cusolver.lib", "libcusolver.so*")
+        dlopen_library("nvidia.cusparse.lib", "libcusparse.so*")
+        dlopen_library("nvidia.cudnn.lib", "libcudnn.so*")
+
+    # import tensorflow v1 compatability
+    try:
+        import tensorflow.compat.v1 as tf
+
+        tf.disable_v2_behavior()
+    except ImportError:
+        import tensorflow as tf
+    globals()["tf"] = tf
+    # the custom operators should be registered before importing a graph,
+    # so they are loaded together with TensorFlow
+    _get_lazy("op_module")
+    _get_lazy("op_grads_module")
+    _get_lazy("default_tf_session_config")
+    return tf
+
+
+def _import_tfv2() -> "ModuleType":
+    _get_lazy("tf")
+    try:
+        import tensorflow.compat.v2 as tfv2
+    except ImportError:
+        tfv2 = None
+    return tfv2
+
+
+def _get_tf_py_version() -> str:
+    # Python library version
+    tf = _get_lazy("tf")
+    try:
+        return tf.version.VERSION
+    except AttributeError:
+        return tf.__version__
+
+
+def _get_tf_float_precision() -> "tf.DType":
+    tf = _get_lazy("tf")
+    if global_float_prec == "float":
+        return tf.float32
+    return tf.float64
+
+
+_LAZY_ATTRIBUTES = {
+    "tf": _import_tf,
+    "tfv2": _import_tfv2,
+    "tf_py_version": _get_tf_py_version,
+    "default_tf_session_config": get_tf_session_config,
+    "op_module": lambda: get_module("deepmd_op"),
+    "op_grads_module": lambda: get_module("op_grads"),
+    "GLOBAL_TF_FLOAT_PRECISION": _get_tf_float_precision,
+}
+_lazy_lock = threading.RLock()
+
+
+def _get_lazy(name: str) -> Any:
+    """Get an attribute that is loaded on first use."""
+    try:
+        return globals()[name]
+    except KeyError:
+        pass
+    with _lazy_lock:
+        if name not in globals():
+            globals()[name] = _LAZY_ATTRIBUTES[name]()
+    return globals()[name]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return _get_lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def is_tf_loaded() -> bool:
+    """Check whether TensorFlow has been imported by this module.
+
+    Returns
+    -------
+    bool
+        True if TensorFlow has been imported
+    """
+    return "tf" in globals()
@@ -26,6 +26,12 @@ from .deep_polar import (
 from .deep_pot import (
     DeepPot,
 )
+from .deep_pot_pool import (
+    DeepPotPool,
+)
+from .deep_pot_server import (
+    DeepPotClient,
+)
 from .deep_wfc import (
     DeepWFC,
 )
@@ -43,6 +49,8 @@ __all__ = [
     "DeepGlobalPolar",
     "DeepPolar",
     "DeepPot",
+    "DeepPotPool",
+    "DeepPotClient",
     "DeepDOS",
     "DeepWFC",
     "DipoleChargeModifier",
@@ -1,7 +1,13 @@
+import hashlib
+import json
+import logging
 import os
 from typing import (
+    Dict,
     List,
+    Optional,
     Tuple,
+    Union,
 )
 
 import numpy as np
@@ -20,14 +26,23 @@ from deepmd.infer.deep_dipole import (
 )
 from deepmd.infer.ewald_recp import (
     EwaldRecp,
+    EwaldRecpPME,
+)
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
 )
 from deepmd.utils.data import (
     DeepmdData,
 )
+from deepmd.utils.path import (
+    DPPath,
+)
 from deepmd.utils.sess import (
     run_sess,
 )
 
+log = logging.getLogger(__name__)
+
 
 class DipoleChargeModifier(DeepDipole):
     """Parameters
@@ -42,8 +57,29 @@ class DipoleChargeModifier(DeepDipole):
             Grid spacing of the reciprocal part of Ewald sum. Unit: A
     ewald_beta
             Splitting parameter of the Ewald sum. Unit: A^{-1}
+    auto_batch_size
+            If True, automatic batch size will be used. If int, it will be used
+            as the initial batch size. The same AutoBatchSize is used by the
+            dipole model, the Ewald summation and the correction of force
+    correction_cache
+            The directory to cache the corrections of energy, force and virial
+            of each training set. The corrections of a set are computed once
+            and reused as long as the dipole model, the charge maps, the Ewald
+            parameters and the coordinates, cells and types of the set are
+            unchanged. If None, the corrections are computed on every load
+    ewald_method
+            The method of the reciprocal part of Ewald sum. "direct": the
+            direct sum over the reciprocal vectors; "pme": the smooth
+            particle-mesh Ewald method
+    pme_order
+            The order of the B-spline interpolation of the PME method
+    pme_oversampling
+            The ratio of the number of mesh points of the PME method to the
+            number of the reciprocal vectors along each direction
     """
 
+    correction_cache_version = 1
+
     def __init__(
         self,
         model_name: str,
@@ -51,13 +87,22 @@ class DipoleChargeModifier(DeepDipole):
         sys_charge_map: List[float],
         ewald_h: float = 1,
         ewald_beta: float = 1,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
+        correction_cache: Optional[str] = None,
+        ewald_method: str = "direct",
+        pme_order: int = 8,
+        pme_oversampling: float = 2.0,
     ) -> None:
         """Constructor."""
         # the dipole model is loaded with prefix 'dipole_charge'
         self.modifier_prefix = "dipole_charge"
         # init dipole model
         DeepDipole.__init__(
-            self, model_name, load_prefix=self.modifier_prefix, default_tf_graph=True
+            self,
+            model_name,
+            load_prefix=self.modifier_prefix,
+            default_tf_graph=True,
+            auto_batch_size=auto_batch_size,
         )
         self.model_name = model_name
         self.model_charge_map = model_charge_map
@@ -66,7 +111,20 @@ class DipoleChargeModifier(DeepDipole):
         # init ewald recp
         self.ewald_h = ewald_h
         self.ewald_beta = ewald_beta
-        self.er = EwaldRecp(self.ewald_h, self.ewald_beta)
+        self.ewald_method = ewald_method
+        self.pme_order = pme_order
+        self.pme_oversampling = pme_oversampling
+        if self.ewald_method == "direct":
+            self.er = EwaldRecp(self.ewald_h, self.ewald_beta)
+        elif self.ewald_method == "pme":
+            self.er = EwaldRecpPME(
+                self.ewald_h,
+                self.ewald_beta,
+                order=self.pme_order,
+                oversampling=self.pme_oversampling,
+            )
+        else:
+            raise RuntimeError("unknown Ewald method " + str(self.ewald_method))
         # dimension of dipole
         self.ext_dim = 3
         self.t_ndesc = self.graph.get_tensor_by_name(
@@ -85,6 +143,14 @@ class DipoleChargeModifier(DeepDipole):
         assert self.ndescrpt == self.ndescrpt_a + self.ndescrpt_r
         self.force = None
         self.ntypes = len(self.sel_a)
+        # on-disk cache of the corrections of each set
+        self.correction_cache = correction_cache
+        if self.correction_cache is not None:
+            os.makedirs(self.correction_cache, exist_ok=True)
+            self._model_key = self._get_model_key()
+        # corrections of the recently used sets, indexed by the set path
+        self._set_corrections = {}
+        self._set_corrections_size = 2
 
     def build_fv_graph(self) -> tf.Tensor:
         """Build the computational graph for the force and virial inference."""
@@ -261,22 +327,9 @@ class DipoleChargeModifier(DeepDipole):
         all_coord, all_charge, dipole = self._extend_system(coord, box, atype, charge)
 
         # print('compute er')
-        batch_size = 5
-        tot_e = []
-        all_f = []
-        all_v = []
-        for ii in range(0, nframes, batch_size):
-            e, f, v = self.er.eval(
-                all_coord[ii : ii + batch_size],
-                all_charge[ii : ii + batch_size],
-                box[ii : ii + batch_size],
-            )
-            tot_e.append(e)
-            all_f.append(f)
-            all_v.append(v)
-        tot_e = np.concatenate(tot_e, axis=0)
-        all_f = np.concatenate(all_f, axis=0)
-        all_v = np.concatenate(all_v, axis=0)
+        tot_e, all_f, all_v = self._eval_func(
+            self.er.eval, nframes, all_charge.shape[1]
+        )(all_coord, all_charge, box)
         # print('finish  er')
         # reshape
         tot_e.reshape([nframes, 1])
@@ -288,22 +341,9 @@ class DipoleChargeModifier(DeepDipole):
         if eval_fv:
             # compute f
             ext_f = all_f[:, natoms * 3 :]
-            corr_f = []
-            corr_v = []
-            corr_av = []
-            for ii in range(0, nframes, batch_size):
-                f, v, av = self._eval_fv(
-                    coord[ii : ii + batch_size],
-                    box[ii : ii + batch_size],
-                    atype,
-                    ext_f[ii : ii + batch_size],
-                )
-                corr_f.append(f)
-                corr_v.append(v)
-                corr_av.append(av)
-            corr_f = np.concatenate(corr_f, axis=0)
-            corr_v = np.concatenate(corr_v, axis=0)
-            corr_av = np.concatenate(corr_av, axis=0)
+            corr_f, corr_v, corr_av = self._eval_func(self._eval_fv, nframes, natoms)(
+                coord, box, atype, ext_f
+            )
             tot_f = all_f[:, : natoms * 3] + corr_f
             for ii in range(nsel):
                 orig_idx = sel_idx_map[ii]
@@ -373,14 +413,8 @@ class DipoleChargeModifier(DeepDipole):
         ref_coord = coord3[:, sel_idx_map, :]
         ref_coord = np.reshape(ref_coord, [nframes, nsel * 3])
 
-        batch_size = 8
-        all_dipole = []
-        for ii in range(0, nframes, batch_size):
-            dipole = DeepDipole.eval(
-                self, coord[ii : ii + batch_size], box[ii : ii + batch_size], atype
-            )
-            all_dipole.append(dipole)
-        dipole = np.concatenate(all_dipole, axis=0)
+        # evaluated in batches of the automatic batch size
+        dipole = DeepDipole.eval(self, coord, box, atype)
         assert dipole.shape[0] == nframes
         dipole = np.reshape(dipole, [nframes, nsel * 3])
 
@@ -400,7 +434,13 @@ class DipoleChargeModifier(DeepDipole):
 
         return all_coord, all_charge, dipole
 
-    def modify_data(self, data: dict, data_sys: DeepmdData) -> None:
+    def modify_data(
+        self,
+        data: dict,
+        data_sys: DeepmdData,
+        set_name: Optional[DPPath] = None,
+        frame_idx: Optional[np.ndarray] = None,
+    ) -> None:
         """Modify data.
 
         Parameters
@@ -419,6 +459,15 @@ class DipoleChargeModifier(DeepDipole):
             - virial        virial
         data_sys : DeepmdData
             The data system.
+        set_name : DPPath, optional
+            The set that the data is loaded from. If it is given and
+            `correction_cache` is set, the corrections of the whole set are
+            taken from the cache.
+        frame_idx : np.ndarray, optional
+            The indexes in the set of the frames in `data`. If None, `data`
+            contains all the frames of the set in order. If it is given with
+            `set_name`, e.g. for the batches of memory-mapped sets, the
+            corrections of the whole set are computed once and kept in memory.
         """
         if (
             "find_energy" not in data
@@ -427,18 +476,16 @@ class DipoleChargeModifier(DeepDipole):
         ):
             return
 
-        get_nframes = None
-        coord = data["coord"][:get_nframes, :]
         if not data_sys.pbc:
             raise RuntimeError("Open systems (nopbc) are not supported")
-        box = data["box"][:get_nframes, :]
-        atype = data["type"][:get_nframes, :]
-        atype = atype[0]
-        nframes = coord.shape[0]
-
-        tot_e, tot_f, tot_v = self.eval(coord, box, atype)
-
-        # print(tot_f[:,0])
+        if set_name is not None and (
+            self.correction_cache is not None or frame_idx is not None
+        ):
+            tot_e, tot_f, tot_v = self._get_set_correction(
+                data, data_sys, set_name, frame_idx
+            )
+        else:
+            tot_e, tot_f, tot_v = self._eval_correction(data)
 
         if "find_energy" in data and data["find_energy"] == 1.0:
             data["energy"] -= tot_e.reshape(data["energy"].shape)
@@ -446,3 +493,105 @@ class DipoleChargeModifier(DeepDipole):
             data["force"] -= tot_f.reshape(data["force"].shape)
         if "find_virial" in data and data["find_virial"] == 1.0:
             data["virial"] -= tot_v.reshape(data["virial"].shape)
+
+    def _eval_correction(self, data: dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Evaluate the corrections of the frames in data."""
+        coord = np.asarray(data["coord"])
+        box = np.asarray(data["box"])
+        atype = np.asarray(data["type"])[0]
+        tot_e, tot_f, tot_v = self.eval(coord, box, atype)
+        nframes = coord.shape[0]
+        return (
+            np.reshape(tot_e, [nframes, 1]),
+            np.reshape(tot_f, [nframes, -1]),
+            np.reshape(tot_v, [nframes, 9]),
+        )
+
+    def _get_set_correction(
+        self,
+        data: dict,
+        data_sys: DeepmdData,
+        set_name: DPPath,
+        frame_idx: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the corrections of the frames in data from the cache of the set."""
+        set_key = str(set_name)
+        if frame_idx is None or set_key not in self._set_corrections:
+            if frame_idx is None:
+                set_data = data
+            else:
+                # only the frames of a batch are given, read the whole set
+                raw_data = data_sys._load_set(set_name)
+                set_data = {kk: raw_data[kk] for kk in ("coord", "box", "type")}
+            correction = self._load_set_correction(set_data, set_name)
+            self._set_corrections.pop(set_key, None)
+            if len(self._set_corrections) >= self._set_corrections_size:
+                self._set_corrections.pop(next(iter(self._set_corrections)))
+            self._set_corrections[set_key] = correction
+        correction = self._set_corrections[set_key]
+        if frame_idx is None:
+            return correction
+        return tuple(cc[frame_idx] for cc in correction)
+
+    def _get_model_key(self) -> Dict[str, Union[str, float, List[float]]]:
+        """Get the settings of the modifier that affect the corrections."""
+        sha = hashlib.sha256()
+        with open(self.model_name, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        return {
+            "model": sha.hexdigest(),
+            "model_charge_map": [float(ii) for ii in self.model_charge_map],
+            "sys_charge_map": [float(ii) for ii in self.sys_charge_map],
+            "ewald_h": float(self.ewald_h),
+            "ewald_beta": float(self.ewald_beta),
+            "ewald_method": self.ewald_method,
+            "pme_order": int(self.pme_order),
+            "pme_oversampling": float(self.pme_oversampling),
+        }
+
+    def _load_set_correction(
+        self, set_data: dict, set_name: DPPath
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Load the corrections of all frames of a set, or compute and cache them."""
+        coord = np.asarray(set_data["coord"])
+        box = np.asarray(set_data["box"])
+        atype = np.asarray(set_data["type"])
+        if self.correction_cache is None:
+            return self._eval_correction({"coord": coord, "box": box, "type": atype})
+        sha = hashlib.sha256()
+        for dd in (coord, box, atype):
+            sha.update(str(dd.dtype).encode())
+            sha.update(np.ascontiguousarray(dd).tobytes())
+        fingerprint = {
+            "version": self.correction_cache_version,
+            "modifier": self._model_key,
+            "set": os.path.abspath(str(set_name)),
+            "data": sha.hexdigest(),
+        }
+        key = hashlib.sha256(
+            json.dumps(fingerprint, sort_keys=True).encode()
+        ).hexdigest()
+        cache_path = os.path.join(self.correction_cache, key + ".npz")
+        try:
+            with np.load(cache_path) as f:
+                return f["energy"], f["force"], f["virial"]
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(cache_path):
+                log.warning(f"cannot read the correction cache {cache_path}: {e}")
+        correction = self._eval_correction({"coord": coord, "box": box, "type": atype})
+        # write to a temporary file and rename it, so that concurrent
+        # trainings never read a partially written file
+        tmp_path = f"{cache_path}.{os.getpid()}"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    energy=correction[0],
+                    force=correction[1],
+                    virial=correction[2],
+                )
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            log.warning(f"cannot write the correction cache {cache_path}: {e}")
+        return correction
@@ -1,7 +1,6 @@
 import logging
 from typing import (
     TYPE_CHECKING,
-    Callable,
     List,
     Optional,
     Tuple,
@@ -180,34 +179,6 @@ class DeepDOS(DeepEval):
         """Get the number (dimension) of atomic parameters of this DP."""
         return self.daparam
 
-    def _eval_func(self, inner_func: Callable, numb_test: int, natoms: int) -> Callable:
-        """Wrapper method with auto batch size.
-
-        Parameters
-        ----------
-        inner_func : Callable
-            the method to be wrapped
-        numb_test : int
-            number of tests
-        natoms : int
-            number of atoms
-
-        Returns
-        -------
-        Callable
-            the wrapper
-        """
-        if self.auto_batch_size is not None:
-
-            def eval_func(*args, **kwargs):
-                return self.auto_batch_size.execute_all(
-                    inner_func, numb_test, natoms, *args, **kwargs
-                )
-
-        else:
-            eval_func = inner_func
-        return eval_func
-
     def _get_natoms_and_nframes(
         self,
         coords: np.ndarray,
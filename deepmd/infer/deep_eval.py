@@ -3,6 +3,7 @@ from functools import (
 )
 from typing import (
     TYPE_CHECKING,
+    Callable,
     List,
     Optional,
     Union,
@@ -17,6 +18,8 @@ from deepmd.env import (
 )
 from deepmd.utils.batch_size import (
     AutoBatchSize,
+    get_profile_key,
+    get_profile_path,
 )
 from deepmd.utils.sess import (
     run_sess,
@@ -41,7 +44,8 @@ class DeepEval:
         If uses the default tf graph, otherwise build a new tf graph for evaluation
     auto_batch_size : bool or int or AutomaticBatchSize, default: False
         If True, automatic batch size will be used. If int, it will be used
-        as the initial batch size.
+        as the initial batch size. The batch size learned for the model on the
+        same device is loaded from and saved to the profile of AutoBatchSize.
     """
 
     load_prefix: str  # set by subclass
@@ -78,6 +82,9 @@ class DeepEval:
             self.auto_batch_size = auto_batch_size
         else:
             raise TypeError("auto_batch_size should be bool, int, or AutoBatchSize")
+        if self.auto_batch_size is not None and get_profile_path():
+            # start with the batch size learned in previous runs
+            self.auto_batch_size.load_profile(get_profile_key(model_file))
 
     @property
     @lru_cache(maxsize=None)
@@ -116,6 +123,34 @@ class DeepEval:
         # start a tf session associated to the graph
         return tf.Session(graph=self.graph, config=default_tf_session_config)
 
+    def _eval_func(self, inner_func: Callable, numb_test: int, natoms: int) -> Callable:
+        """Wrapper method with auto batch size.
+
+        Parameters
+        ----------
+        inner_func : Callable
+            the method to be wrapped
+        numb_test : int
+            number of tests
+        natoms : int
+            number of atoms
+
+        Returns
+        -------
+        Callable
+            the wrapper
+        """
+        if self.auto_batch_size is not None:
+
+            def eval_func(*args, **kwargs):
+                return self.auto_batch_size.execute_all(
+                    inner_func, numb_test, natoms, *args, **kwargs
+                )
+
+        else:
+            eval_func = inner_func
+        return eval_func
+
     def _graph_compatable(self) -> bool:
         """Check the model compatability.
 
@@ -264,7 +299,9 @@ class DeepEval:
             return coord, atom_type, idx_map
 
     @staticmethod
-    def reverse_map(vec: np.ndarray, imap: List[int]) -> np.ndarray:
+    def reverse_map(
+        vec: np.ndarray, imap: List[int], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """Reverse mapping of a vector according to the index map.
 
         Parameters
@@ -273,13 +310,21 @@ class DeepEval:
             Input vector. Be of shape [nframes, natoms, -1]
         imap
             Index map. Be of shape [natoms]
+        out
+            If given, the reverse mapped vector is written into this array,
+            which should be of the same shape as `vec`, instead of a new array.
 
         Returns
         -------
         vec_out
             Reverse mapped vector.
         """
-        ret = np.zeros(vec.shape)
+        if out is None:
+            ret = np.zeros(vec.shape)
+        else:
+            ret = np.reshape(out, vec.shape)
+            if not np.may_share_memory(ret, out):
+                raise ValueError("out cannot be reshaped without copying the data")
         # for idx,ii in enumerate(imap) :
         #     ret[:,ii,:] = vec[:,idx,:]
         ret[:, imap, :] = vec
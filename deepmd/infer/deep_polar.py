@@ -2,6 +2,7 @@ from typing import (
     TYPE_CHECKING,
     List,
     Optional,
+    Union,
 )
 
 import numpy as np
@@ -9,6 +10,9 @@ import numpy as np
 from deepmd.infer.deep_tensor import (
     DeepTensor,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 
 if TYPE_CHECKING:
     from pathlib import (
@@ -27,6 +31,9 @@ class DeepPolar(DeepTensor):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
 
     Warnings
     --------
@@ -40,6 +47,7 @@ class DeepPolar(DeepTensor):
         model_file: "Path",
         load_prefix: str = "load",
         default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
     ) -> None:
         # use this in favor of dict update to move attribute from class to
         # instance namespace
@@ -56,6 +64,7 @@ class DeepPolar(DeepTensor):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
         )
 
     def get_dim_fparam(self) -> int:
@@ -78,10 +87,17 @@ class DeepGlobalPolar(DeepTensor):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
     """
 
     def __init__(
-        self, model_file: str, load_prefix: str = "load", default_tf_graph: bool = False
+        self,
+        model_file: str,
+        load_prefix: str = "load",
+        default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
     ) -> None:
         self.tensors.update(
             {
@@ -96,6 +112,7 @@ class DeepGlobalPolar(DeepTensor):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
         )
 
     def eval(
@@ -1,7 +1,7 @@
 import logging
+import threading
 from typing import (
     TYPE_CHECKING,
-    Callable,
     List,
     Optional,
     Tuple,
@@ -13,6 +13,9 @@ import numpy as np
 from deepmd.common import (
     make_default_mesh,
 )
+from deepmd.env import (
+    tf,
+)
 from deepmd.infer.data_modifier import (
     DipoleChargeModifier,
 )
@@ -49,6 +52,14 @@ class DeepPot(DeepEval):
         If True, automatic batch size will be used. If int, it will be used
         as the initial batch size.
 
+    Notes
+    -----
+    The index map of the sorted atoms, the natoms vector and the default mesh
+    only depend on the atom types and the cell, so they are cached and reused
+    when the same system is evaluated again, e.g. in a molecular dynamics loop.
+    The results can be written into preallocated arrays by the `out` argument
+    of `eval`.
+
     Examples
     --------
     >>> from deepmd.infer import DeepPot
@@ -110,6 +121,12 @@ class DeepPot(DeepEval):
             default_tf_graph=default_tf_graph,
             auto_batch_size=auto_batch_size,
         )
+        # inputs prepared from the atom types and the cells of recent calls,
+        # which are shared by the threads calling the model
+        self._cache_lock = threading.Lock()
+        self._types_cache = {}
+        self._types_cache_size = 16
+        self._mesh_cache = (None, None)
 
         # load optional tensors
         operations = [op.name for op in self.graph.get_operations()]
@@ -199,6 +216,10 @@ class DeepPot(DeepEval):
                 sys_charge_map,
                 ewald_h=ewald_h,
                 ewald_beta=ewald_beta,
+                # share the batch size with the model
+                auto_batch_size=(
+                    self.auto_batch_size if self.auto_batch_size is not None else False
+                ),
             )
 
     def _run_default_sess(self):
@@ -265,33 +286,15 @@ class DeepPot(DeepEval):
         """Get the number (dimension) of atomic parameters of this DP."""
         return self.daparam
 
-    def _eval_func(self, inner_func: Callable, numb_test: int, natoms: int) -> Callable:
-        """Wrapper method with auto batch size.
-
-        Parameters
-        ----------
-        inner_func : Callable
-            the method to be wrapped
-        numb_test : int
-            number of tests
-        natoms : int
-            number of atoms
+    def _get_run_options(self) -> Optional[tf.RunOptions]:
+        """Get the options of the session run of the current evaluation.
 
         Returns
         -------
-        Callable
-            the wrapper
+        tf.RunOptions or None
+            None, i.e. the default options, by default
         """
-        if self.auto_batch_size is not None:
-
-            def eval_func(*args, **kwargs):
-                return self.auto_batch_size.execute_all(
-                    inner_func, numb_test, natoms, *args, **kwargs
-                )
-
-        else:
-            eval_func = inner_func
-        return eval_func
+        return None
 
     def _get_natoms_and_nframes(
         self,
@@ -317,6 +320,7 @@ class DeepPot(DeepEval):
         aparam: Optional[np.ndarray] = None,
         efield: Optional[np.ndarray] = None,
         mixed_type: bool = False,
+        out: Optional[Tuple[np.ndarray, ...]] = None,
     ) -> Tuple[np.ndarray, ...]:
         """Evaluate the energy, force and virial by using this DP.
 
@@ -352,6 +356,11 @@ class DeepPot(DeepEval):
             Whether to perform the mixed_type mode.
             If True, the input data has the mixed_type format (see doc/model/train_se_atten.md),
             in which frames in a system may have different natoms_vec(s), with the same nloc.
+        out
+            The preallocated arrays of energy, force and virial, followed by atomic
+            energy and atomic virial if atomic == True, which should be of the same
+            shapes as the returns. If given, the results are written into and
+            returned as these arrays instead of new arrays.
 
         Returns
         -------
@@ -370,16 +379,38 @@ class DeepPot(DeepEval):
         natoms, numb_test = self._get_natoms_and_nframes(
             coords, atom_types, mixed_type=mixed_type
         )
-        output = self._eval_func(self._eval_inner, numb_test, natoms)(
-            coords,
-            cells,
-            atom_types,
-            fparam=fparam,
-            aparam=aparam,
-            atomic=atomic,
-            efield=efield,
-            mixed_type=mixed_type,
-        )
+        if out is None:
+            output = self._eval_func(self._eval_inner, numb_test, natoms)(
+                coords,
+                cells,
+                atom_types,
+                fparam=fparam,
+                aparam=aparam,
+                atomic=atomic,
+                efield=efield,
+                mixed_type=mixed_type,
+            )
+        else:
+            output = tuple(out)
+            if len(output) != (5 if atomic else 3):
+                raise ValueError("out should contain %d arrays" % (5 if atomic else 3))
+
+            def eval_inner(coords, cells, atom_types, *out_batch, **kwargs):
+                # out_batch are the views of the batch in the output arrays
+                self._eval_inner(coords, cells, atom_types, out=out_batch, **kwargs)
+                return ()
+
+            self._eval_func(eval_inner, numb_test, natoms)(
+                coords,
+                cells,
+                atom_types,
+                *output,
+                fparam=fparam,
+                aparam=aparam,
+                atomic=atomic,
+                efield=efield,
+                mixed_type=mixed_type,
+            )
 
         if self.modifier_type is not None:
             if atomic:
@@ -393,6 +424,148 @@ class DeepPot(DeepEval):
             output = tuple(output)
         return output
 
+    def eval_many(
+        self,
+        coords: List[np.ndarray],
+        cells: Optional[List[Optional[np.ndarray]]],
+        atom_types: List[List[int]],
+        atomic: bool = False,
+        fparam: Optional[List[np.ndarray]] = None,
+        aparam: Optional[List[np.ndarray]] = None,
+        mixed_type: bool = False,
+    ) -> List[Tuple[np.ndarray, ...]]:
+        """Evaluate the energy, force and virial of many structures of different sizes.
+
+        The structures with the same atom types and periodicity are stacked and
+        evaluated together by `eval`, so the automatic batch size applies to all
+        frames of them. In the mixed_type mode, which is only supported by models
+        with type embedding, e.g. `se_atten`, structures of similar numbers of
+        atoms are padded with virtual atoms of type -1 and evaluated together
+        regardless of their atom types.
+
+        Parameters
+        ----------
+        coords
+            The coordinates of atoms of each structure.
+            Each array should be of size nframes x natoms x 3
+        cells
+            The cell of each structure, None for a non-PBC structure.
+            Each array should be of size nframes x 9.
+            If None then non-PBC is assumed for all structures.
+        atom_types
+            The atom types of each structure.
+            Each list should contain natoms ints
+        atomic
+            Calculate the atomic energy and virial
+        fparam
+            The frame parameter of each structure, see `eval`
+        aparam
+            The atomic parameter of each structure, see `eval`
+        mixed_type
+            Whether to pad the structures of different atom types and numbers
+            of atoms into the same batches.
+
+        Returns
+        -------
+        list of tuple
+            The results of `eval` of each structure, in the order of the inputs
+        """
+        nsys = len(coords)
+        if cells is None:
+            cells = [None] * nsys
+        if not (len(cells) == len(atom_types) == nsys):
+            raise ValueError("coords, cells and atom_types should have the same length")
+        if self.has_fparam and (fparam is None or len(fparam) != nsys):
+            raise ValueError("fparam of each structure should be provided")
+        if self.has_aparam and (aparam is None or len(aparam) != nsys):
+            raise ValueError("aparam of each structure should be provided")
+
+        # standardize the inputs of each structure
+        sys_atype = [np.array(tt, dtype=int).reshape([-1]) for tt in atom_types]
+        sys_natoms = [tt.size for tt in sys_atype]
+        sys_coord = [np.reshape(cc, [-1, nn * 3]) for cc, nn in zip(coords, sys_natoms)]
+        sys_nframes = [cc.shape[0] for cc in sys_coord]
+        sys_cell = [
+            None if cc is None else np.reshape(cc, [nf, 9])
+            for cc, nf in zip(cells, sys_nframes)
+        ]
+        if self.has_fparam:
+            fdim = self.get_dim_fparam()
+            # broadcast when assigned to the frames of each structure
+            sys_fparam = [np.reshape(ff, [-1, fdim]) for ff in fparam]
+        if self.has_aparam:
+            adim = self.get_dim_aparam()
+            sys_aparam = [
+                np.reshape(aa, [nf, nn, adim])
+                if np.size(aa) == nf * nn * adim
+                else np.reshape(aa, [-1, adim])
+                for aa, nf, nn in zip(aparam, sys_nframes, sys_natoms)
+            ]
+
+        # group the structures
+        groups = {}
+        if mixed_type:
+            # pad each structure to at most 1.25 times of its number of atoms
+            order = sorted(range(nsys), key=lambda ii: sys_natoms[ii])
+            bucket = {}
+            for ii in order:
+                pbc = sys_cell[ii] is not None
+                if pbc not in bucket or sys_natoms[ii] > 1.25 * bucket[pbc][1]:
+                    bucket[pbc] = (len(groups), sys_natoms[ii])
+                groups.setdefault((pbc, bucket[pbc][0]), []).append(ii)
+        else:
+            for ii in range(nsys):
+                key = (sys_cell[ii] is not None, sys_atype[ii].tobytes())
+                groups.setdefault(key, []).append(ii)
+
+        results = [None] * nsys
+        for (pbc, _), members in groups.items():
+            max_natoms = max(sys_natoms[ii] for ii in members)
+            nframes = sum(sys_nframes[ii] for ii in members)
+            if mixed_type:
+                g_coord = np.zeros([nframes, max_natoms * 3])
+                g_atype = np.full([nframes, max_natoms], -1, dtype=int)
+            else:
+                g_coord = np.empty([nframes, max_natoms * 3])
+                g_atype = sys_atype[members[0]]
+            g_cell = np.empty([nframes, 9]) if pbc else None
+            if self.has_fparam:
+                g_fparam = np.empty([nframes, fdim])
+            if self.has_aparam:
+                g_aparam = np.zeros([nframes, max_natoms, adim])
+            rows = []
+            start = 0
+            for ii in members:
+                nf, nn = sys_nframes[ii], sys_natoms[ii]
+                row = slice(start, start + nf)
+                rows.append(row)
+                start += nf
+                g_coord[row, : nn * 3] = sys_coord[ii]
+                if mixed_type:
+                    g_atype[row, :nn] = sys_atype[ii]
+                if pbc:
+                    g_cell[row] = sys_cell[ii]
+                if self.has_fparam:
+                    g_fparam[row] = sys_fparam[ii]
+                if self.has_aparam:
+                    g_aparam[row, :nn] = sys_aparam[ii]
+            output = self.eval(
+                g_coord,
+                g_cell,
+                g_atype,
+                atomic=atomic,
+                fparam=g_fparam if self.has_fparam else None,
+                aparam=g_aparam if self.has_aparam else None,
+                mixed_type=mixed_type,
+            )
+            for ii, row in zip(members, rows):
+                nn = sys_natoms[ii]
+                # remove the padded atoms from the atomic outputs
+                results[ii] = tuple(
+                    oo[row] if oo.ndim == 2 else oo[row, :nn] for oo in output
+                )
+        return results
+
     def _prepare_feed_dict(
         self,
         coords,
@@ -459,28 +632,26 @@ class DeepPot(DeepEval):
                     % (nframes, natoms, fdim, natoms, fdim, fdim)
                 )
 
-        # sort inputs
-        coords, atom_types, imap = self.sort_input(
-            coords, atom_types, mixed_type=mixed_type
-        )
+        # sort inputs and make natoms_vec
+        if mixed_type:
+            coords, atom_types, imap = self.sort_input(
+                coords, atom_types, mixed_type=mixed_type
+            )
+            natoms_vec = self.make_natoms_vec(atom_types, mixed_type=mixed_type)
+            t_type = atom_types.reshape([-1])
+        else:
+            imap, natoms_vec, t_type = self._prepare_atom_types(atom_types, nframes)
+            coords = np.reshape(coords, [nframes, natoms, 3])[:, imap, :]
         if self.has_efield:
             efield = np.reshape(efield, [nframes, natoms, 3])
             efield = efield[:, imap, :]
             efield = np.reshape(efield, [nframes, natoms * 3])
-
-        # make natoms_vec and default_mesh
-        natoms_vec = self.make_natoms_vec(atom_types, mixed_type=mixed_type)
         assert natoms_vec[0] == natoms
 
         # evaluate
         feed_dict_test = {}
         feed_dict_test[self.t_natoms] = natoms_vec
-        if mixed_type:
-            feed_dict_test[self.t_type] = atom_types.reshape([-1])
-        else:
-            feed_dict_test[self.t_type] = np.tile(atom_types, [nframes, 1]).reshape(
-                [-1]
-            )
+        feed_dict_test[self.t_type] = t_type
         feed_dict_test[self.t_coord] = np.reshape(coords, [-1])
 
         if len(self.t_box.shape) == 1:
@@ -492,7 +663,7 @@ class DeepPot(DeepEval):
         if self.has_efield:
             feed_dict_test[self.t_efield] = np.reshape(efield, [-1])
         if pbc:
-            feed_dict_test[self.t_mesh] = make_default_mesh(cells)
+            feed_dict_test[self.t_mesh] = self._make_default_mesh(cells)
         else:
             feed_dict_test[self.t_mesh] = np.array([], dtype=np.int32)
         if self.has_fparam:
@@ -501,6 +672,65 @@ class DeepPot(DeepEval):
             feed_dict_test[self.t_aparam] = np.reshape(aparam, [-1])
         return feed_dict_test, imap, natoms_vec
 
+    def _prepare_atom_types(
+        self, atom_types: np.ndarray, nframes: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Prepare the inputs that only depend on the atom types.
+
+        The results are cached for the recent atom types, so a system evaluated
+        repeatedly is sorted only once. The cache is shared by the threads
+        calling the model, and the returned arrays are read-only.
+
+        Parameters
+        ----------
+        atom_types
+            The atom types of shape [natoms]
+        nframes
+            The number of frames
+
+        Returns
+        -------
+        imap
+            The index map from the input atoms to the sorted atoms
+        natoms_vec
+            The natoms vector of the system
+        t_type
+            The sorted atom types tiled for nframes, of shape [nframes * natoms]
+        """
+        key = atom_types.tobytes()
+        with self._cache_lock:
+            cached = self._types_cache.get(key)
+            if cached is None:
+                imap = np.lexsort((np.arange(atom_types.size), atom_types))
+                sorted_types = atom_types[imap]
+                natoms_vec = self.make_natoms_vec(sorted_types)
+                imap.setflags(write=False)
+                natoms_vec.setflags(write=False)
+                cached = (imap, sorted_types, natoms_vec, {})
+                if len(self._types_cache) >= self._types_cache_size:
+                    self._types_cache.clear()
+                self._types_cache[key] = cached
+            imap, sorted_types, natoms_vec, tiled_types = cached
+            t_type = tiled_types.get(nframes)
+            if t_type is None:
+                t_type = np.tile(sorted_types, nframes)
+                t_type.setflags(write=False)
+                if len(tiled_types) >= self._types_cache_size:
+                    tiled_types.clear()
+                tiled_types[nframes] = t_type
+        return imap, natoms_vec, t_type
+
+    def _make_default_mesh(self, cells: np.ndarray) -> np.ndarray:
+        """Make the default mesh, reusing the one of the last call for the same cells."""
+        key = cells.tobytes()
+        with self._cache_lock:
+            last_key, mesh = self._mesh_cache
+            if key != last_key:
+                mesh = make_default_mesh(cells)
+                mesh.setflags(write=False)
+                self._mesh_cache = (key, mesh)
+        return mesh
+
     def _eval_inner(
         self,
         coords,
@@ -511,6 +741,7 @@ class DeepPot(DeepEval):
         atomic=False,
         efield=None,
         mixed_type=False,
+        out=None,
     ):
         natoms, nframes = self._get_natoms_and_nframes(
             coords, atom_types, mixed_type=mixed_type
@@ -523,7 +754,9 @@ class DeepPot(DeepEval):
         if atomic:
             t_out += [self.t_ae, self.t_av]
 
-        v_out = run_sess(self.sess, t_out, feed_dict=feed_dict_test)
+        v_out = run_sess(
+            self.sess, t_out, feed_dict=feed_dict_test, options=self._get_run_options()
+        )
         energy = v_out[0]
         force = v_out[1]
         virial = v_out[2]
@@ -542,6 +775,18 @@ class DeepPot(DeepEval):
         else:
             natoms_real = natoms
 
+        if out is not None:
+            # write into the preallocated arrays
+            np.copyto(out[0], np.reshape(energy, out[0].shape))
+            self.reverse_map(np.reshape(force, [nframes, -1, 3]), imap, out=out[1])
+            np.copyto(out[2], np.reshape(virial, out[2].shape))
+            if atomic:
+                self.reverse_map(
+                    np.reshape(ae, [nframes, -1, 1]), imap[:natoms_real], out=out[3]
+                )
+                self.reverse_map(np.reshape(av, [nframes, -1, 9]), imap, out=out[4])
+            return tuple(out)
+
         # reverse map of the outputs
         force = self.reverse_map(np.reshape(force, [nframes, -1, 3]), imap)
         if atomic:
@@ -637,6 +882,9 @@ class DeepPot(DeepEval):
             coords, cells, atom_types, fparam, aparam, efield, mixed_type=mixed_type
         )
         (descriptor,) = run_sess(
-            self.sess, [self.t_descriptor], feed_dict=feed_dict_test
+            self.sess,
+            [self.t_descriptor],
+            feed_dict=feed_dict_test,
+            options=self._get_run_options(),
         )
         return self.reverse_map(np.reshape(descriptor, [nframes, natoms, -1]), imap)
@@ -0,0 +1,253 @@
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from collections import (
+    deque,
+)
+from contextlib import (
+    contextmanager,
+)
+from functools import (
+    lru_cache,
+)
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from deepmd.env import (
+    default_tf_session_config,
+    get_tf_default_nthreads,
+    tf,
+)
+from deepmd.infer.deep_pot import (
+    DeepPot,
+)
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
+
+if TYPE_CHECKING:
+    from pathlib import (
+        Path,
+    )
+
+log = logging.getLogger(__name__)
+
+
+class DeepPotPool(DeepPot):
+    """Thread-safe DeepPot evaluating concurrent calls in parallel lanes.
+
+    The graph is imported once and run by a single session, whose inter-op
+    thread pool is split into `nlanes` pools (lanes). Each call of `eval` or
+    `eval_descriptor` takes a free lane, or waits until one is released, and
+    runs the graph in the thread pool of that lane with the automatic batch
+    size of that lane. Calls from different threads therefore run in parallel
+    without duplicating the weights of the model.
+
+    The latency of each call is recorded. The latency of the last call made
+    by the current thread is given by `last_latency`, and the statistics of
+    the recent calls are given by `get_latency_stat`.
+
+    Parameters
+    ----------
+    model_file : Path
+        The name of the frozen model file.
+    nlanes : int, optional
+        The number of calls evaluated in parallel. By default, the number of
+        inter-op threads, or half of the CPU cores if it is not set.
+    load_prefix: str
+        The prefix in the load computational graph
+    default_tf_graph : bool
+        If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size. Each lane uses its own copy.
+    latency_window : int, default: 10000
+        The number of recent calls kept for the latency statistics.
+
+    Examples
+    --------
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> from deepmd.infer import DeepPotPool
+    >>> dp = DeepPotPool("graph.pb", nlanes=4)
+    >>> with ThreadPoolExecutor(8) as executor:
+    ...     results = list(executor.map(lambda cc: dp.eval(cc, cell, atype), coords))
+    >>> dp.get_latency_stat()
+    """
+
+    def __init__(
+        self,
+        model_file: "Path",
+        nlanes: Optional[int] = None,
+        load_prefix: str = "load",
+        default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
+        latency_window: int = 10000,
+    ) -> None:
+        _, inter = get_tf_default_nthreads()
+        if nlanes is None:
+            nlanes = inter if inter > 0 else max((os.cpu_count() or 1) // 2, 1)
+        self.nlanes = nlanes
+        # the inter-op threads are shared among the lanes; if their number is
+        # decided by TensorFlow, the CPU cores are shared instead
+        ncores = inter if inter > 0 else (os.cpu_count() or 1)
+        self.lane_nthreads = max(ncores // nlanes, 1)
+        DeepPot.__init__(
+            self,
+            model_file,
+            load_prefix=load_prefix,
+            default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
+        )
+        self.lane_batch_size = [
+            copy.deepcopy(self.auto_batch_size) for _ in range(self.nlanes)
+        ]
+        self.lane_run_options = [
+            tf.RunOptions(inter_op_thread_pool=ii) for ii in range(self.nlanes)
+        ]
+        self._free_lanes = queue.Queue()
+        for ii in range(self.nlanes):
+            self._free_lanes.put(ii)
+        self._local = threading.local()
+        self._stat_lock = threading.Lock()
+        self._latency = deque(maxlen=latency_window)
+        self._ncalls = 0
+        self._nframes = 0
+        log.info(
+            f"evaluate the model in {self.nlanes} lanes, "
+            f"each with {self.lane_nthreads} inter-op threads"
+        )
+
+    @property
+    @lru_cache(maxsize=None)
+    def sess(self) -> tf.Session:
+        """Get TF session with one inter-op thread pool for each lane."""
+        config = tf.ConfigProto()
+        config.CopyFrom(default_tf_session_config)
+        for _ in range(self.nlanes):
+            config.session_inter_op_thread_pool.add(num_threads=self.lane_nthreads)
+        return tf.Session(graph=self.graph, config=config)
+
+    @property
+    def last_latency(self) -> Optional[float]:
+        """The latency (s) of the last call made by the current thread."""
+        return getattr(self._local, "latency", None)
+
+    @contextmanager
+    def _lane(self, nframes: int):
+        """Take a free lane for the call in the current thread."""
+        start = time.perf_counter()
+        lane = self._free_lanes.get()
+        self._local.lane = lane
+        try:
+            yield lane
+        finally:
+            self._local.lane = None
+            self._free_lanes.put(lane)
+            latency = time.perf_counter() - start
+            self._local.latency = latency
+            with self._stat_lock:
+                self._latency.append(latency)
+                self._ncalls += 1
+                self._nframes += nframes
+
+    def _get_run_options(self) -> Optional[tf.RunOptions]:
+        lane = getattr(self._local, "lane", None)
+        if lane is None:
+            return None
+        return self.lane_run_options[lane]
+
+    def _eval_func(self, inner_func: Callable, numb_test: int, natoms: int) -> Callable:
+        auto_batch_size = self.lane_batch_size[self._local.lane]
+        if auto_batch_size is None:
+            return inner_func
+
+        def eval_func(*args, **kwargs):
+            return auto_batch_size.execute_all(
+                inner_func, numb_test, natoms, *args, **kwargs
+            )
+
+        return eval_func
+
+    def eval(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: List[int],
+        *args,
+        mixed_type: bool = False,
+        **kwargs,
+    ) -> Tuple[np.ndarray, ...]:
+        """Evaluate the energy, force and virial in a free lane.
+
+        See `DeepPot.eval` for the parameters and the returns. This method can be
+        called from any thread.
+        """
+        _, nframes = self._get_natoms_and_nframes(
+            coords, atom_types, mixed_type=mixed_type
+        )
+        with self._lane(nframes):
+            return DeepPot.eval(
+                self, coords, cells, atom_types, *args, mixed_type=mixed_type, **kwargs
+            )
+
+    def eval_descriptor(
+        self,
+        coords: np.ndarray,
+        cells: np.ndarray,
+        atom_types: List[int],
+        *args,
+        mixed_type: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        """Evaluate the descriptors in a free lane.
+
+        See `DeepPot.eval_descriptor` for the parameters and the returns. This
+        method can be called from any thread.
+        """
+        _, nframes = self._get_natoms_and_nframes(
+            coords, atom_types, mixed_type=mixed_type
+        )
+        with self._lane(nframes):
+            return DeepPot.eval_descriptor(
+                self, coords, cells, atom_types, *args, mixed_type=mixed_type, **kwargs
+            )
+
+    def get_latency_stat(self) -> Dict[str, float]:
+        """Get the statistics of the latency of the recent calls.
+
+        Returns
+        -------
+        dict
+            `ncalls` and `nframes`: the number of calls and frames since the
+            creation or the last reset; `mean`, `p50`, `p90`, `p99` and `max`:
+            the latency (s) of the recent calls, including the time waiting
+            for a free lane
+        """
+        with self._stat_lock:
+            latency = np.array(self._latency)
+            stat = {"ncalls": self._ncalls, "nframes": self._nframes}
+        if latency.size > 0:
+            stat["mean"] = float(np.mean(latency))
+            for pp in (50, 90, 99):
+                stat[f"p{pp}"] = float(np.percentile(latency, pp))
+            stat["max"] = float(np.max(latency))
+        return stat
+
+    def reset_latency_stat(self) -> None:
+        """Reset the statistics of the latency."""
+        with self._stat_lock:
+            self._latency.clear()
+            self._ncalls = 0
+            self._nframes = 0
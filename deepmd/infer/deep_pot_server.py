@@ -0,0 +1,473 @@
+"""Serve a DeepPot model to local clients with dynamic batching.
+
+The server accepts evaluation requests over localhost HTTP or a Unix socket.
+Requests that arrive within a latency budget and have the same atom types are
+coalesced into a single multi-frame evaluation, and the results are split back
+to the callers. :class:`DeepPotClient` has the same evaluation API as
+:class:`deepmd.infer.DeepPot`, so the two can be swapped without changing the
+calling code.
+"""
+
+import http.client
+import io
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import (
+    Future,
+)
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import (
+    unquote,
+    urlparse,
+)
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from deepmd.infer.deep_pot import (
+        DeepPot,
+    )
+
+log = logging.getLogger(__name__)
+
+
+def _dumps(arrays: Dict[str, np.ndarray]) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _loads(data: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(data), allow_pickle=False) as f:
+        return {kk: f[kk] for kk in f.files}
+
+
+class _Request:
+    """A request of evaluation waiting to be batched."""
+
+    def __init__(self, inputs: Dict[str, np.ndarray]) -> None:
+        self.atom_types = np.asarray(inputs["atom_types"], dtype=int)
+        self.mixed_type = bool(inputs.get("mixed_type", False))
+        self.atomic = bool(inputs.get("atomic", False))
+        if self.mixed_type:
+            self.natoms = self.atom_types.shape[-1]
+        else:
+            self.natoms = self.atom_types.size
+        self.coords = np.reshape(inputs["coords"], [-1, self.natoms * 3])
+        self.nframes = self.coords.shape[0]
+        if self.mixed_type:
+            self.atom_types = np.reshape(self.atom_types, [self.nframes, self.natoms])
+        self.cells = inputs.get("cells")
+        if self.cells is not None:
+            self.cells = np.reshape(self.cells, [self.nframes, 9])
+        self.params = {}
+        for kk in ("fparam", "aparam", "efield"):
+            if kk in inputs:
+                self.params[kk] = inputs[kk]
+        self.future = Future()
+
+    def key(self) -> tuple:
+        # requests with the same key can be evaluated in one batch
+        return (
+            self.natoms,
+            self.mixed_type,
+            self.atomic,
+            self.cells is None,
+            tuple(sorted(self.params)),
+            None if self.mixed_type else self.atom_types.tobytes(),
+        )
+
+    def frame_params(self, dp: "DeepPot") -> Dict[str, np.ndarray]:
+        """The parameters of the request broadcast to all frames."""
+        params = {}
+        if "fparam" in self.params:
+            dim = dp.get_dim_fparam()
+            params["fparam"] = np.broadcast_to(
+                np.reshape(self.params["fparam"], [-1, dim]), [self.nframes, dim]
+            )
+        if "aparam" in self.params:
+            dim = dp.get_dim_aparam()
+            aparam = np.reshape(self.params["aparam"], [-1, dim])
+            if aparam.shape[0] == 1:
+                aparam = np.tile(aparam, [self.natoms, 1])
+            params["aparam"] = np.broadcast_to(
+                np.reshape(aparam, [-1, self.natoms * dim]),
+                [self.nframes, self.natoms * dim],
+            )
+        if "efield" in self.params:
+            params["efield"] = np.reshape(
+                self.params["efield"], [self.nframes, self.natoms * 3]
+            )
+        return params
+
+
+class DeepPotBatcher:
+    """Coalesce concurrent evaluation requests into multi-frame evaluations.
+
+    A background thread takes the requests from a queue. The requests that
+    arrive within `max_delay` seconds after the first waiting request are
+    grouped by the number of atoms, the atom types and the given inputs, and
+    each group is evaluated by a single call of `DeepPot.eval`.
+
+    Parameters
+    ----------
+    dp : DeepPot
+        The model
+    max_delay : float, default: 0.002
+        The maximum time (s) to wait for more requests before evaluating a batch
+    max_frames : int, default: 1024
+        The maximum number of frames in a batch
+    """
+
+    def __init__(
+        self, dp: "DeepPot", max_delay: float = 0.002, max_frames: int = 1024
+    ) -> None:
+        self.dp = dp
+        self.max_delay = max_delay
+        self.max_frames = max_frames
+        self.queue = queue.Queue()
+        self.nbatches = 0
+        self.nrequests = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs: Dict[str, np.ndarray]) -> Future:
+        """Submit a request of evaluation.
+
+        Parameters
+        ----------
+        inputs : dict
+            `coords`, `cells` (optional), `atom_types` and the optional `fparam`,
+            `aparam`, `efield`, `atomic` and `mixed_type`, as the arguments of
+            `DeepPot.eval`
+
+        Returns
+        -------
+        Future
+            The future of the tuple returned by `DeepPot.eval`
+        """
+        request = _Request(inputs)
+        self.queue.put(request)
+        return request.future
+
+    def close(self) -> None:
+        """Stop the background thread after the waiting requests are evaluated."""
+        self.queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self.queue.get()
+            if first is None:
+                return
+            requests = [first]
+            nframes = first.nframes
+            deadline = time.monotonic() + self.max_delay
+            while nframes < self.max_frames:
+                try:
+                    request = self.queue.get(
+                        timeout=max(deadline - time.monotonic(), 0.0)
+                    )
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                requests.append(request)
+                nframes += request.nframes
+            groups = {}
+            for request in requests:
+                groups.setdefault(request.key(), []).append(request)
+            for group in groups.values():
+                self._eval(group)
+
+    def _eval(self, requests: List[_Request]) -> None:
+        ref = requests[0]
+        try:
+            kwargs = {}
+            params = [request.frame_params(self.dp) for request in requests]
+            for kk in ref.params:
+                kwargs[kk] = np.concatenate([pp[kk] for pp in params])
+            if ref.mixed_type:
+                atom_types = np.concatenate([rr.atom_types for rr in requests])
+            else:
+                atom_types = ref.atom_types
+            if ref.cells is None:
+                cells = None
+            else:
+                cells = np.concatenate([rr.cells for rr in requests])
+            output = self.dp.eval(
+                np.concatenate([rr.coords for rr in requests]),
+                cells,
+                atom_types,
+                atomic=ref.atomic,
+                mixed_type=ref.mixed_type,
+                **kwargs,
+            )
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        self.nbatches += 1
+        self.nrequests += len(requests)
+        start = 0
+        for request in requests:
+            end = start + request.nframes
+            request.future.set_result(tuple(oo[start:end] for oo in output))
+            start = end
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handle the HTTP requests of the clients."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+    def _send(self, code: int, body: bytes, content_type: str) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/info":
+            self._send(404, b"not found", "text/plain")
+            return
+        self._send(200, json.dumps(self.server.info).encode(), "application/json")
+
+    def do_POST(self):
+        if self.path != "/eval":
+            self._send(404, b"not found", "text/plain")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            inputs = _loads(self.rfile.read(length))
+            output = self.server.batcher.submit(inputs).result()
+        except Exception as e:
+            self._send(500, f"{type(e).__name__}: {e}".encode(), "text/plain")
+            return
+        self._send(
+            200,
+            _dumps({f"out_{ii}": oo for ii, oo in enumerate(output)}),
+            "application/octet-stream",
+        )
+
+    def address_string(self):
+        # the client address of a Unix socket is an empty string
+        return str(self.client_address)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+
+
+def make_server(
+    dp: "DeepPot",
+    host: str = "127.0.0.1",
+    port: int = 0,
+    socket_path: Optional[str] = None,
+    max_delay: float = 0.002,
+    max_frames: int = 1024,
+) -> socketserver.BaseServer:
+    """Make a server of the model.
+
+    Parameters
+    ----------
+    dp : DeepPot
+        The model
+    host : str, default: "127.0.0.1"
+        The host of the HTTP server
+    port : int, default: 0
+        The port of the HTTP server. 0 means a free port.
+    socket_path : str, optional
+        Listen on this Unix socket instead of HTTP over TCP
+    max_delay : float, default: 0.002
+        The maximum time (s) to wait for more requests before evaluating a batch
+    max_frames : int, default: 1024
+        The maximum number of frames in a batch
+
+    Returns
+    -------
+    socketserver.BaseServer
+        The server. Call `serve_forever` to start it, and `shutdown` and
+        `server_close` to stop it. The batcher is `server.batcher`.
+    """
+    if socket_path is not None:
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.batcher = DeepPotBatcher(dp, max_delay=max_delay, max_frames=max_frames)
+    server.info = {
+        "ntypes": int(dp.get_ntypes()),
+        "rcut": float(dp.get_rcut()),
+        "type_map": dp.get_type_map(),
+        "dim_fparam": int(dp.get_dim_fparam()),
+        "dim_aparam": int(dp.get_dim_aparam()),
+        "descriptor_type": dp.get_descriptor_type(),
+    }
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DeepPotClient:
+    """Client of a model served by `dp serve`.
+
+    It has the same evaluation API as :class:`deepmd.infer.DeepPot`. The
+    client can be shared by threads; each thread keeps its own connection.
+
+    Parameters
+    ----------
+    address : str
+        `http://host:port` for a HTTP server, or `unix:///path/to/socket`
+        (or the path of the socket) for a Unix socket
+    timeout : float, optional
+        The timeout (s) of the connection
+
+    Examples
+    --------
+    >>> from deepmd.infer import DeepPotClient
+    >>> dp = DeepPotClient("http://127.0.0.1:8000")
+    >>> e, f, v = dp.eval(coord, cell, atype)
+    """
+
+    def __init__(self, address: str, timeout: Optional[float] = None) -> None:
+        self.address = address
+        self.timeout = timeout
+        url = urlparse(address)
+        if url.scheme in ("http",):
+            self.socket_path = None
+            self.host = url.hostname
+            self.port = url.port or 80
+        elif url.scheme in ("unix", ""):
+            # unix:///abs/path or unix://relative/path
+            self.socket_path = unquote(url.netloc + url.path) if url.scheme else address
+        else:
+            raise ValueError(f"unsupported address {address}")
+        self._local = threading.local()
+        self.info = json.loads(self._request("GET", "/info"))
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.socket_path is not None:
+                conn = _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout
+                )
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> bytes:
+        for retry in (False, True):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # the server may close an idle keep-alive connection
+                conn.close()
+                self._local.conn = None
+                if retry:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(
+                f"request to {self.address} failed: {data.decode(errors='replace')}"
+            )
+        return data
+
+    def get_ntypes(self) -> int:
+        """Get the number of atom types of this model."""
+        return self.info["ntypes"]
+
+    def get_rcut(self) -> float:
+        """Get the cut-off radius of this model."""
+        return self.info["rcut"]
+
+    def get_type_map(self) -> List[str]:
+        """Get the type map (element name of the atom types) of this model."""
+        return self.info["type_map"]
+
+    def get_descriptor_type(self) -> Optional[str]:
+        """Get the descriptor type of this model."""
+        return self.info["descriptor_type"]
+
+    def get_dim_fparam(self) -> int:
+        """Get the number (dimension) of frame parameters of this DP."""
+        return self.info["dim_fparam"]
+
+    def get_dim_aparam(self) -> int:
+        """Get the number (dimension) of atomic parameters of this DP."""
+        return self.info["dim_aparam"]
+
+    def eval(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: Union[List[int], np.ndarray],
+        atomic: bool = False,
+        fparam: Optional[np.ndarray] = None,
+        aparam: Optional[np.ndarray] = None,
+        efield: Optional[np.ndarray] = None,
+        mixed_type: bool = False,
+    ) -> Tuple[np.ndarray, ...]:
+        """Evaluate the energy, force and virial by the served model.
+
+        See `DeepPot.eval` for the parameters and the returns.
+        """
+        inputs = {
+            "coords": np.asarray(coords),
+            "atom_types": np.asarray(atom_types, dtype=int),
+            "atomic": np.array(atomic),
+            "mixed_type": np.array(mixed_type),
+        }
+        for kk, vv in (
+            ("cells", cells),
+            ("fparam", fparam),
+            ("aparam", aparam),
+            ("efield", efield),
+        ):
+            if vv is not None:
+                inputs[kk] = np.asarray(vv)
+        outputs = _loads(self._request("POST", "/eval", _dumps(inputs)))
+        return tuple(outputs[f"out_{ii}"] for ii in range(len(outputs)))
@@ -3,6 +3,7 @@ from typing import (
     List,
     Optional,
     Tuple,
+    Union,
 )
 
 import numpy as np
@@ -13,6 +14,9 @@ from deepmd.common import (
 from deepmd.infer.deep_eval import (
     DeepEval,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 from deepmd.utils.sess import (
     run_sess,
 )
@@ -34,6 +38,9 @@ class DeepTensor(DeepEval):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
     """
 
     tensors = {
@@ -57,10 +64,15 @@ class DeepTensor(DeepEval):
         model_file: "Path",
         load_prefix: str = "load",
         default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
     ) -> None:
         """Constructor."""
         DeepEval.__init__(
-            self, model_file, load_prefix=load_prefix, default_tf_graph=default_tf_graph
+            self,
+            model_file,
+            load_prefix=load_prefix,
+            default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
         )
         # check model type
         model_type = self.tensors["t_tensor"][2:-2]
@@ -131,6 +143,20 @@ class DeepTensor(DeepEval):
         """Get the number (dimension) of atomic parameters of this DP."""
         return self.daparam
 
+    def _get_natoms_and_nframes(
+        self,
+        coords: np.ndarray,
+        atom_types: Union[List[int], np.ndarray],
+        mixed_type: bool = False,
+    ) -> Tuple[int, int]:
+        if mixed_type:
+            natoms = len(atom_types[0])
+        else:
+            natoms = len(atom_types)
+        coords = np.reshape(np.array(coords), [-1, natoms * 3])
+        nframes = coords.shape[0]
+        return natoms, nframes
+
     def eval(
         self,
         coords: np.ndarray,
@@ -177,6 +203,27 @@ class DeepTensor(DeepEval):
             If atomic == False then of size nframes x output_dim
             else of size nframes x natoms x output_dim
         """
+        natoms, nframes = self._get_natoms_and_nframes(
+            coords, atom_types, mixed_type=mixed_type
+        )
+        # the frames are split into batches along the first axis
+        coords = np.reshape(np.array(coords), [nframes, natoms * 3])
+        if cells is not None:
+            cells = np.reshape(np.array(cells), [nframes, 9])
+        if mixed_type:
+            atom_types = np.array(atom_types, dtype=int).reshape([nframes, natoms])
+        return self._eval_func(self._eval_inner, nframes, natoms)(
+            coords, cells, atom_types, atomic=atomic, mixed_type=mixed_type
+        )
+
+    def _eval_inner(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: np.ndarray,
+        atomic: bool = True,
+        mixed_type: bool = False,
+    ) -> np.ndarray:
         # standarize the shape of inputs
         if mixed_type:
             natoms = atom_types[0].size
@@ -228,7 +275,7 @@ class DeepTensor(DeepEval):
                 self._support_gfv or "global" in self.model_type
             ), f"do not support global tensor evaluation with old {self.model_type} model"
             t_out = [self.t_global_tensor if self._support_gfv else self.t_tensor]
-        v_out = self.sess.run(t_out, feed_dict=feed_dict_test)
+        v_out = run_sess(self.sess, t_out, feed_dict=feed_dict_test)
         tensor = v_out[0]
 
         # reverse map of the outputs
@@ -302,7 +349,27 @@ class DeepTensor(DeepEval):
             shape: [nframes x nout x natoms x 9]
         """
         assert self._support_gfv, "do not support eval_full with old tensor model"
+        natoms, nframes = self._get_natoms_and_nframes(
+            coords, atom_types, mixed_type=mixed_type
+        )
+        # the frames are split into batches along the first axis
+        coords = np.reshape(np.array(coords), [nframes, natoms * 3])
+        if cells is not None:
+            cells = np.reshape(np.array(cells), [nframes, 9])
+        if mixed_type:
+            atom_types = np.array(atom_types, dtype=int).reshape([nframes, natoms])
+        return self._eval_func(self._eval_full_inner, nframes, natoms)(
+            coords, cells, atom_types, atomic=atomic, mixed_type=mixed_type
+        )
 
+    def _eval_full_inner(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: np.ndarray,
+        atomic: bool = False,
+        mixed_type: bool = False,
+    ) -> Tuple[np.ndarray, ...]:
         # standarize the shape of inputs
         if mixed_type:
             natoms = atom_types[0].size
@@ -349,7 +416,7 @@ class DeepTensor(DeepEval):
         if atomic:
             t_out += [self.t_tensor, self.t_atom_virial]
 
-        v_out = self.sess.run(t_out, feed_dict=feed_dict_test)
+        v_out = run_sess(self.sess, t_out, feed_dict=feed_dict_test)
         gt = v_out[0]  # global tensor
         force = v_out[1]
         virial = v_out[2]
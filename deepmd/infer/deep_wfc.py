@@ -1,10 +1,14 @@
 from typing import (
     TYPE_CHECKING,
+    Union,
 )
 
 from deepmd.infer.deep_tensor import (
     DeepTensor,
 )
+from deepmd.utils.batch_size import (
+    AutoBatchSize,
+)
 
 if TYPE_CHECKING:
     from pathlib import (
@@ -23,6 +27,9 @@ class DeepWFC(DeepTensor):
         The prefix in the load computational graph
     default_tf_graph : bool
         If uses the default tf graph, otherwise build a new tf graph for evaluation
+    auto_batch_size : bool or int or AutomaticBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
 
     Warnings
     --------
@@ -36,6 +43,7 @@ class DeepWFC(DeepTensor):
         model_file: "Path",
         load_prefix: str = "load",
         default_tf_graph: bool = False,
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
     ) -> None:
         # use this in favor of dict update to move attribute from class to
         # instance namespace
@@ -51,6 +59,7 @@ class DeepWFC(DeepTensor):
             model_file,
             load_prefix=load_prefix,
             default_tf_graph=default_tf_graph,
+            auto_batch_size=auto_batch_size,
         )
 
     def get_dim_fparam(self) -> int:
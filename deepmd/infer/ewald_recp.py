@@ -5,6 +5,7 @@ from typing import (
 import numpy as np
 
 from deepmd.env import (
+    GLOBAL_NP_FLOAT_PRECISION,
     GLOBAL_TF_FLOAT_PRECISION,
     default_tf_session_config,
     op_module,
@@ -95,3 +96,218 @@ class EwaldRecp:
         )
 
         return energy, force, virial
+
+
+# e^2 / (4 pi epsilon_0) in eV A, the same as in the ewald_recp op
+ELECTROSTATIC_CONVERSION = 14.39964535475696995031
+
+
+class EwaldRecpPME:
+    """Evaluate the reciprocal part of the Ewald sum by the smooth particle-mesh Ewald (PME) method.
+
+    The charges are spread onto a mesh by cardinal B-splines, and the
+    structure factors are computed by FFT, so the cost scales as
+    O(N log N) instead of the O(N K^3) of the direct sum in
+    :class:`EwaldRecp`. The same reciprocal vectors as :class:`EwaldRecp`
+    are summed, so the two methods agree up to the interpolation error,
+    which decreases with the B-spline order and the oversampling of the
+    mesh.
+
+    Parameters
+    ----------
+    hh
+        Grid spacing of the reciprocal part of Ewald sum. Unit: A
+    beta
+        Splitting parameter of the Ewald sum. Unit: A^{-1}
+    order
+        The order of the B-spline interpolation
+    oversampling
+        The ratio of the number of mesh points to the number of the
+        reciprocal vectors along each direction
+    """
+
+    def __init__(self, hh, beta, order: int = 8, oversampling: float = 2.0):
+        if order < 3:
+            raise ValueError("The order of the B-spline should be at least 3")
+        if oversampling < 1:
+            raise ValueError("The oversampling of the mesh should be at least 1")
+        self.hh = hh
+        self.beta = beta
+        self.order = order
+        self.oversampling = oversampling
+        # the influence function of the last box
+        self._mesh_cache = (None, None)
+
+    def eval(
+        self, coord: np.ndarray, charge: np.ndarray, box: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Evaluate.
+
+        Parameters
+        ----------
+        coord
+            The coordinates of atoms
+        charge
+            The atomic charge
+        box
+            The simulation region. PBC is assumed
+
+        Returns
+        -------
+        e
+            The energy
+        f
+            The force
+        v
+            The virial
+        """
+        charge = np.array(charge, dtype=np.float64)
+        nframes = charge.shape[0]
+        natoms = charge.shape[1]
+        coord = np.reshape(np.array(coord, dtype=np.float64), [nframes, natoms, 3])
+        box = np.reshape(np.array(box, dtype=np.float64), [nframes, 3, 3])
+        energy = np.empty([nframes], dtype=GLOBAL_NP_FLOAT_PRECISION)
+        force = np.empty([nframes, natoms * 3], dtype=GLOBAL_NP_FLOAT_PRECISION)
+        virial = np.empty([nframes, 9], dtype=GLOBAL_NP_FLOAT_PRECISION)
+        for ii in range(nframes):
+            ee, ff, vv = self._eval_frame(coord[ii], charge[ii], box[ii])
+            energy[ii] = ee
+            force[ii] = ff.ravel()
+            virial[ii] = vv.ravel()
+        return energy, force, virial
+
+    def _get_mesh(self, box: np.ndarray) -> tuple:
+        """Get the mesh and the influence function of a box."""
+        key = box.tobytes()
+        if self._mesh_cache[0] == key:
+            return self._mesh_cache[1]
+        # the same reciprocal vectors as the direct sum: |m_d| <= kk_d / 2
+        lengths = np.linalg.norm(box, axis=1)
+        kk = (lengths / self.hh).astype(int)
+        kk[kk * self.hh < lengths] += 1
+        kk += kk % 2
+        mesh = np.maximum(np.ceil(self.oversampling * (kk + 1)).astype(int), kk + 1)
+        mesh = np.maximum(mesh, self.order)
+        rec_box = np.linalg.inv(box).T
+        volume = np.abs(np.linalg.det(box))
+        mm = [np.fft.fftfreq(nn, 1.0 / nn).round().astype(int) for nn in mesh]
+        mask = (
+            (np.abs(mm[0]) <= kk[0] // 2)[:, None, None]
+            & (np.abs(mm[1]) <= kk[1] // 2)[None, :, None]
+            & (np.abs(mm[2]) <= kk[2] // 2)[None, None, :]
+        )
+        mask[0, 0, 0] = False
+        idx = np.nonzero(mask.ravel())[0]
+        m0, m1, m2 = np.unravel_index(idx, mesh)
+        rm = (
+            mm[0][m0, None] * rec_box[0]
+            + mm[1][m1, None] * rec_box[1]
+            + mm[2][m2, None] * rec_box[2]
+        )
+        nmm2 = np.sum(rm * rm, axis=1)
+        ww = np.exp(-np.pi**2 * nmm2 / self.beta**2) / nmm2
+        # the Euler exponential spline factors |b(m)|^2
+        mp, _ = _bspline(np.zeros(1), self.order)
+        bsq = []
+        for dd in range(3):
+            kn = np.arange(self.order - 1)
+            den = np.sum(
+                mp[0, kn + 1] * np.exp(2j * np.pi * np.outer(mm[dd], kn) / mesh[dd]),
+                axis=1,
+            )
+            bsq.append(1.0 / np.abs(den) ** 2)
+        theta = ww * bsq[0][m0] * bsq[1][m1] * bsq[2][m2]
+        theta *= ELECTROSTATIC_CONVERSION / (2.0 * np.pi * volume)
+        theta_mesh = np.zeros(np.prod(mesh))
+        theta_mesh[idx] = theta
+        vpref = -2.0 * (1.0 + np.pi**2 * nmm2 / self.beta**2) / nmm2
+        ret = (mesh, theta_mesh.reshape(mesh), idx, rm, vpref)
+        self._mesh_cache = (key, ret)
+        return ret
+
+    def _eval_frame(
+        self, coord: np.ndarray, charge: np.ndarray, box: np.ndarray
+    ) -> Tuple[float, np.ndarray, np.ndarray]:
+        mesh, theta_mesh, idx, rm, vpref = self._get_mesh(box)
+        natoms = charge.shape[0]
+        order = self.order
+        inv_box = np.linalg.inv(box)
+        # scaled coordinates in the unit of mesh points
+        uu = coord @ inv_box
+        uu = (uu - np.floor(uu)) * mesh
+        fl = np.floor(uu).astype(int)
+        th = []
+        dth = []
+        grid = []
+        for dd in range(3):
+            tt, dt = _bspline(uu[:, dd] - fl[:, dd], order)
+            th.append(tt)
+            dth.append(dt)
+            grid.append((fl[:, dd, None] - np.arange(order)) % mesh[dd])
+        flat = (grid[0][:, :, None, None] * mesh[1] + grid[1][:, None, :, None]) * mesh[
+            2
+        ] + grid[2][:, None, None, :]
+        spline = th[0][:, :, None, None] * th[1][:, None, :, None]
+        spline = spline * th[2][:, None, None, :]
+        # spread the charges onto the mesh
+        qmesh = np.bincount(
+            flat.ravel(),
+            weights=(charge[:, None, None, None] * spline).ravel(),
+            minlength=np.prod(mesh),
+        ).reshape(mesh)
+        # the approximated structure factor S(m) up to the spline factors
+        sm = np.fft.ifftn(qmesh) * np.prod(mesh)
+        sm2 = np.abs(sm) ** 2
+        energy = np.sum(theta_mesh * sm2)
+        # the derivative of the energy w.r.t. the mesh charges
+        phi = 2.0 * np.prod(mesh) * np.fft.ifftn(theta_mesh * np.conj(sm)).real
+        phi = phi.ravel()[flat]
+        du = np.stack(
+            [
+                np.einsum("nijk,ni,nj,nk->n", phi, dth[0], th[1], th[2]),
+                np.einsum("nijk,ni,nj,nk->n", phi, th[0], dth[1], th[2]),
+                np.einsum("nijk,ni,nj,nk->n", phi, th[0], th[1], dth[2]),
+            ],
+            axis=1,
+        )
+        force = -charge[:, None] * ((du * mesh) @ inv_box.T)
+        eincr = theta_mesh.ravel()[idx] * sm2.ravel()[idx]
+        virial = np.eye(3) * np.sum(eincr) + np.einsum(
+            "m,ma,mb->ab", eincr * vpref, rm, rm
+        )
+        return energy, force.reshape([natoms, 3]), virial
+
+
+def _bspline(ww: np.ndarray, order: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cardinal B-splines and their derivatives.
+
+    Parameters
+    ----------
+    ww
+        The fractional parts of the scaled coordinates, in [0, 1)
+    order
+        The order of the B-spline
+
+    Returns
+    -------
+    np.ndarray
+        M_order(ww + jj) for jj in range(order)
+    np.ndarray
+        The derivatives of M_order(ww + jj) for jj in range(order)
+    """
+    nn = ww.shape[0]
+    jj = np.arange(order)
+    xx = ww[:, None] + jj
+    # M_2(x) = 1 - |x - 1|
+    mm = np.zeros([nn, order])
+    mm[:, 0] = ww
+    mm[:, 1] = 1.0 - ww
+    dm = None
+    for kk in range(3, order + 1):
+        shifted = np.zeros([nn, order])
+        shifted[:, 1:] = mm[:, :-1]
+        if kk == order:
+            # M_n'(x) = M_{n-1}(x) - M_{n-1}(x - 1)
+            dm = mm - shifted
+        mm = (xx * mm + (kk - xx) * shifted) / (kk - 1)
+    return mm, dm
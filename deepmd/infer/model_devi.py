@@ -1,5 +1,14 @@
+import logging
+import os
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
 from typing import (
+    Dict,
+    List,
+    Optional,
     Tuple,
+    Union,
 )
 
 import numpy as np
@@ -14,10 +23,15 @@ from ..utils.batch_size import (
 from ..utils.data import (
     DeepmdData,
 )
+from ..utils.sess import (
+    run_sess,
+)
 from .deep_pot import (
     DeepPot,
 )
 
+log = logging.getLogger(__name__)
+
 
 def calc_model_devi_f(fs: np.ndarray) -> Tuple[np.ndarray]:
     """Calculate model deviation of force.
@@ -89,7 +103,7 @@ def calc_model_devi_v(vs: np.ndarray) -> Tuple[np.ndarray]:
     return max_devi_v, min_devi_v, avg_devi_v
 
 
-def write_model_devi_out(devi: np.ndarray, fname: str, header: str = ""):
+def write_model_devi_out(devi: np.ndarray, fname: str, header: Optional[str] = ""):
     """Write output of model deviation.
 
     Parameters
@@ -98,18 +112,22 @@ def write_model_devi_out(devi: np.ndarray, fname: str, header: str = ""):
         the first column is the steps index
     fname : str
         the file name to dump
-    header : str, default=""
-        the header to dump
+    header : str or None, default=""
+        the header to dump. If None, no header is written, which is used to
+        append the rows following a previously written chunk
     """
     assert devi.shape[1] == 8
-    header = "%s\n%10s" % (header, "step")
-    for item in "vf":
-        header += "%19s%19s%19s" % (
-            f"max_devi_{item}",
-            f"min_devi_{item}",
-            f"avg_devi_{item}",
-        )
-    header += "%19s" % "devi_e"
+    if header is not None:
+        header = "%s\n%10s" % (header, "step")
+        for item in "vf":
+            header += "%19s%19s%19s" % (
+                f"max_devi_{item}",
+                f"min_devi_{item}",
+                f"avg_devi_{item}",
+            )
+        header += "%19s" % "devi_e"
+    else:
+        header = ""
     with open(fname, "ab") as fp:
         np.savetxt(
             fp,
@@ -121,6 +139,49 @@ def write_model_devi_out(devi: np.ndarray, fname: str, header: str = ""):
     return devi
 
 
+def read_model_devi_progress(fname: str) -> Dict[str, int]:
+    """Count the frames of each system written to an output of model deviation.
+
+    A partially written last line, e.g. left by an interrupted run, is
+    removed from the file. The file is read line by line.
+
+    Parameters
+    ----------
+    fname : str
+        the output file of model deviation
+
+    Returns
+    -------
+    dict
+        the number of written frames of each system
+    """
+    progress = {}
+    if not os.path.isfile(fname):
+        return progress
+    with open(fname, "rb+") as fp:
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell()
+        fp.seek(max(size - 4096, 0))
+        tail = fp.read()
+        if tail and not tail.endswith(b"\n"):
+            fp.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+    system = None
+    last_comment = None
+    with open(fname) as fp:
+        for line in fp:
+            if line.startswith("#"):
+                words = line[1:].split()
+                if words[:1] == ["step"] and last_comment is not None:
+                    # the column names follow the name of the system
+                    system = last_comment
+                    progress.setdefault(system, 0)
+                else:
+                    last_comment = line[2:].rstrip("\n")
+            elif line.strip() and system is not None:
+                progress[system] += 1
+    return progress
+
+
 def _check_tmaps(tmaps, ref_tmap=None):
     """Check whether type maps are identical."""
     assert isinstance(tmaps, list)
@@ -136,6 +197,220 @@ def _check_tmaps(tmaps, ref_tmap=None):
     return flag
 
 
+class DeepPotEnsemble:
+    """Evaluate several DeepPot models on the same frames.
+
+    The inputs are sorted and the natoms vector and the mesh are made only once
+    for all the models, and the sessions of the models are run concurrently.
+    Models with a data modifier are evaluated by their own `eval` method.
+
+    Parameters
+    ----------
+    models : list of DeepPot
+        Models to evaluate, which should have the same type map
+    auto_batch_size : bool or int or AutoBatchSize, default: True
+        If True, automatic batch size will be used. If int, it will be used
+        as the initial batch size.
+    nthreads : int, optional
+        Number of threads running the sessions. Defaults to the number of models.
+
+    Examples
+    --------
+    >>> from deepmd.infer import DeepPot
+    >>> from deepmd.infer.model_devi import DeepPotEnsemble
+    >>> models = DeepPotEnsemble([DeepPot("graph.000.pb"), DeepPot("graph.001.pb")])
+    >>> es, fs, vs = models.eval(coord, cell, atype)
+    """
+
+    # placeholders shared by the feed dicts of all the models
+    feed_tensors = (
+        "t_natoms",
+        "t_type",
+        "t_coord",
+        "t_box",
+        "t_mesh",
+        "t_efield",
+        "t_fparam",
+        "t_aparam",
+    )
+
+    def __init__(
+        self,
+        models: List[DeepPot],
+        auto_batch_size: Union[bool, int, AutoBatchSize] = True,
+        nthreads: Optional[int] = None,
+    ) -> None:
+        self.models = list(models)
+        if len(self.models) == 0:
+            raise ValueError("At least one model should be given.")
+        if not _check_tmaps([dp.get_type_map() for dp in self.models]):
+            raise RuntimeError("The models does not have the same type map.")
+        if auto_batch_size is True:
+            auto_batch_size = AutoBatchSize()
+        elif auto_batch_size is False:
+            auto_batch_size = None
+        elif isinstance(auto_batch_size, int):
+            auto_batch_size = AutoBatchSize(auto_batch_size)
+        self.auto_batch_size = auto_batch_size
+        self.fused = all(
+            dp.modifier_type is None
+            and dp.get_ntypes() == self.models[0].get_ntypes()
+            and dp.has_fparam == self.models[0].has_fparam
+            and dp.has_aparam == self.models[0].has_aparam
+            for dp in self.models
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=nthreads if nthreads is not None else len(self.models)
+        )
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def close(self) -> None:
+        """Shut down the threads running the sessions."""
+        self.executor.shutdown()
+
+    def eval(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: Union[List[int], np.ndarray],
+        fparam: Optional[np.ndarray] = None,
+        aparam: Optional[np.ndarray] = None,
+        mixed_type: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Evaluate the energy, force and virial by all the models.
+
+        Parameters
+        ----------
+        coords
+            The coordinates of atoms.
+            The array should be of size nframes x natoms x 3
+        cells
+            The cell of the region.
+            If None then non-PBC is assumed, otherwise using PBC.
+            The array should be of size nframes x 9
+        atom_types
+            The atom types
+            The list should contain natoms ints
+        fparam
+            The frame parameter
+        aparam
+            The atomic parameter
+        mixed_type
+            Whether to perform the mixed_type mode.
+
+        Returns
+        -------
+        energy
+            The system energy, of size nmodels x nframes x 1
+        force
+            The force on each atom, of size nmodels x nframes x natoms x 3
+        virial
+            The virial, of size nmodels x nframes x 9
+        """
+        if not self.fused:
+            outputs = list(
+                self.executor.map(
+                    lambda dp: dp.eval(
+                        coords,
+                        cells,
+                        atom_types,
+                        fparam=fparam,
+                        aparam=aparam,
+                        mixed_type=mixed_type,
+                    )[:3],
+                    self.models,
+                )
+            )
+            return tuple(np.array(oo) for oo in zip(*outputs))
+        natoms, nframes = self.models[0]._get_natoms_and_nframes(
+            coords, atom_types, mixed_type=mixed_type
+        )
+        coords = np.reshape(np.array(coords), [nframes, natoms * 3])
+        if cells is not None:
+            cells = np.reshape(np.array(cells), [nframes, 9])
+        if mixed_type:
+            atom_types = np.reshape(np.array(atom_types), [nframes, natoms])
+        if self.auto_batch_size is not None:
+            output = self.auto_batch_size.execute_all(
+                self._eval_inner,
+                nframes,
+                natoms * len(self.models),
+                coords,
+                cells,
+                atom_types,
+                fparam=fparam,
+                aparam=aparam,
+                mixed_type=mixed_type,
+            )
+        else:
+            output = self._eval_inner(
+                coords,
+                cells,
+                atom_types,
+                fparam=fparam,
+                aparam=aparam,
+                mixed_type=mixed_type,
+            )
+        # frames are the first axis when batching, models are the first in outputs
+        return tuple(np.swapaxes(oo, 0, 1) for oo in output)
+
+    def _eval_inner(
+        self,
+        coords: np.ndarray,
+        cells: Optional[np.ndarray],
+        atom_types: np.ndarray,
+        fparam: Optional[np.ndarray] = None,
+        aparam: Optional[np.ndarray] = None,
+        mixed_type: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ref = self.models[0]
+        natoms, nframes = ref._get_natoms_and_nframes(
+            coords, atom_types, mixed_type=mixed_type
+        )
+        feed_dict, imap, _ = ref._prepare_feed_dict(
+            coords,
+            cells,
+            atom_types,
+            fparam=fparam,
+            aparam=aparam,
+            mixed_type=mixed_type,
+        )
+        feed_values = {
+            name: feed_dict[getattr(ref, name)]
+            for name in self.feed_tensors
+            if getattr(ref, name, None) is not None and getattr(ref, name) in feed_dict
+        }
+
+        def run(dp: DeepPot) -> List[np.ndarray]:
+            feed = {}
+            for name, value in feed_values.items():
+                tensor = getattr(dp, name)
+                if name == "t_box" and len(tensor.shape) == 1:
+                    value = np.reshape(value, [-1])
+                elif name == "t_box":
+                    value = np.reshape(value, [nframes, 9])
+                feed[tensor] = value
+            return run_sess(
+                dp.sess, [dp.t_energy, dp.t_force, dp.t_virial], feed_dict=feed
+            )
+
+        energies = []
+        forces = []
+        virials = []
+        for energy, force, virial in self.executor.map(run, self.models):
+            force = DeepPot.reverse_map(np.reshape(force, [nframes, -1, 3]), imap)
+            energies.append(np.reshape(energy, [nframes, 1]))
+            forces.append(np.reshape(force, [nframes, natoms, 3]))
+            virials.append(np.reshape(virial, [nframes, 9]))
+        return (
+            np.stack(energies, axis=1),
+            np.stack(forces, axis=1),
+            np.stack(virials, axis=1),
+        )
+
+
 def calc_model_devi(
     coord,
     box,
@@ -155,8 +430,9 @@ def calc_model_devi(
         Box to specify periodic boundary condition. If None, no pbc will be used
     atype : numpy.ndarray, `n_atoms x 1`
         Atom types
-    models : list of DeepPot models
-        Models used to evaluate deviation
+    models : list of DeepPot models or DeepPotEnsemble
+        Models used to evaluate deviation. The inputs are prepared once and the
+        models are evaluated concurrently.
     fname : str or None
         File to dump results, default None
     frequency : int
@@ -181,24 +457,21 @@ def calc_model_devi(
     >>> graphs = [DP("graph.000.pb"), DP("graph.001.pb")]
     >>> model_devi = calc_model_devi(coord, cell, atype, graphs)
     """
-    energies = []
-    forces = []
-    virials = []
     natom = atype.shape[-1]
-    for dp in models:
-        ret = dp.eval(
-            coord,
-            box,
-            atype,
-            mixed_type=mixed_type,
+    if isinstance(models, DeepPotEnsemble):
+        energies, forces, virials = models.eval(
+            coord, box, atype, mixed_type=mixed_type
         )
-        energies.append(ret[0] / natom)
-        forces.append(ret[1])
-        virials.append(ret[2] / natom)
-
-    energies = np.array(energies)
-    forces = np.array(forces)
-    virials = np.array(virials)
+    else:
+        ensemble = DeepPotEnsemble(models, auto_batch_size=models[0].auto_batch_size)
+        try:
+            energies, forces, virials = ensemble.eval(
+                coord, box, atype, mixed_type=mixed_type
+            )
+        finally:
+            ensemble.close()
+    energies = energies / natom
+    virials = virials / natom
 
     devi = [np.arange(coord.shape[0]) * frequency]
     devi += list(calc_model_devi_v(virials))
@@ -211,10 +484,23 @@ def calc_model_devi(
 
 
 def make_model_devi(
-    *, models: list, system: str, set_prefix: str, output: str, frequency: int, **kwargs
+    *,
+    models: list,
+    system: str,
+    set_prefix: str,
+    output: str,
+    frequency: int,
+    chunk_size: Optional[int] = None,
+    resume: bool = False,
+    **kwargs,
 ):
     """Make model deviation calculation.
 
+    If `chunk_size` is given, the frames are read from the memory-mapped sets
+    in chunks, and the deviations of each chunk are appended to the output file
+    as soon as they are computed, so the memory usage does not depend on the
+    number of frames. The deviations are then not returned.
+
     Parameters
     ----------
     models : list
@@ -229,33 +515,48 @@ def make_model_devi(
         The number of steps that elapse between writing coordinates
         in a trajectory by a MD engine (such as Gromacs / Lammps).
         This paramter is used to determine the index in the output file.
+    chunk_size : int, optional
+        The number of frames read and evaluated at a time. If not given, the
+        frames of each set are evaluated at once
+    resume : bool, default=False
+        Continue an interrupted run: the frames of each system that are
+        already in the output file are skipped
     **kwargs
         Arbitrary keyword arguments.
+
+    Returns
+    -------
+    list of np.ndarray or None
+        The model deviations of each system, or None if `chunk_size` is given
     """
     auto_batch_size = AutoBatchSize()
-    # init models
-    dp_models = [DeepPot(model, auto_batch_size=auto_batch_size) for model in models]
-
-    # check type maps
-    tmaps = [dp.get_type_map() for dp in dp_models]
-    if _check_tmaps(tmaps):
-        tmap = tmaps[0]
-    else:
-        raise RuntimeError("The models does not have the same type map.")
+    # init models, which are checked to have the same type map
+    dp_models = DeepPotEnsemble(
+        [DeepPot(model, auto_batch_size=auto_batch_size) for model in models],
+        auto_batch_size=auto_batch_size,
+    )
+    tmap = dp_models.models[0].get_type_map()
 
     all_sys = expand_sys_str(system)
     if len(all_sys) == 0:
         raise RuntimeError("Did not find valid system")
+    progress = read_model_devi_progress(output) if resume else {}
     devis_coll = []
     for system in all_sys:
         # create data-system
-        dp_data = DeepmdData(system, set_prefix, shuffle_test=False, type_map=tmap)
+        dp_data = DeepmdData(
+            system, set_prefix, shuffle_test=False, type_map=tmap, memmap=True
+        )
         mixed_type = dp_data.mixed_type
+        nframes_done = progress.get(system, 0)
+        if nframes_done > 0:
+            log.info(f"skip {nframes_done} frames of {system} in {output}")
 
-        data_sets = [dp_data._load_set(set_name) for set_name in dp_data.dirs]
-        nframes_tot = 0
+        # the header has been written if the system is in the output
+        header_written = system in progress
+        iframe = nframes_done
         devis = []
-        for data in data_sets:
+        for data in dp_data.iter_frames(chunk_size, start=nframes_done):
             coord = data["coord"]
             box = data["box"]
             if mixed_type:
@@ -265,10 +566,21 @@ def make_model_devi(
             if not dp_data.pbc:
                 box = None
             devi = calc_model_devi(coord, box, atype, dp_models, mixed_type=mixed_type)
-            nframes_tot += coord.shape[0]
-            devis.append(devi)
-        devis = np.vstack(devis)
-        devis[:, 0] = np.arange(nframes_tot) * frequency
-        write_model_devi_out(devis, output, header=system)
-        devis_coll.append(devis)
-    return devis_coll
+            nframes = coord.shape[0]
+            devi[:, 0] = np.arange(iframe, iframe + nframes) * frequency
+            write_model_devi_out(
+                devi, output, header=None if header_written else system
+            )
+            header_written = True
+            iframe += nframes
+            if chunk_size is None:
+                devis.append(devi)
+        if not header_written:
+            # a system without frames
+            write_model_devi_out(np.zeros((0, 8)), output, header=system)
+        if chunk_size is None:
+            devis_coll.append(np.vstack(devis) if devis else np.zeros((0, 8)))
+    dp_models.close()
+    if chunk_size is None:
+        return devis_coll
+    return None
@@ -1,3 +1,4 @@
+import logging
 from typing import (
     List,
     Optional,
@@ -22,10 +23,15 @@ from .model import (
     Model,
 )
 from .model_stat import (
+    DataStatCache,
+    collect_descrpt_stat,
+    concat_sys_stat,
     make_stat_input,
     merge_sys_stat,
 )
 
+log = logging.getLogger(__name__)
+
 
 class EnerModel(Model):
     """Energy model.
@@ -51,6 +57,10 @@ class EnerModel(Model):
             The lower boundary of the interpolation between short-range tabulated interaction and DP. It is only required when `use_srtab` is provided.
     sw_rmin
             The upper boundary of the interpolation between short-range tabulated interaction and DP. It is only required when `use_srtab` is provided.
+    spin
+            The spin settings
+    data_stat_cache
+            The directory to cache the data statistics of each system
     """
 
     model_type = "ener"
@@ -68,6 +78,7 @@ class EnerModel(Model):
         sw_rmin: Optional[float] = None,
         sw_rmax: Optional[float] = None,
         spin: Optional[Spin] = None,
+        data_stat_cache: Optional[str] = None,
     ) -> None:
         """Constructor."""
         # descriptor
@@ -88,6 +99,7 @@ class EnerModel(Model):
             self.type_map = type_map
         self.data_stat_nbatch = data_stat_nbatch
         self.data_stat_protect = data_stat_protect
+        self.data_stat_cache = data_stat_cache
         self.srtab_name = use_srtab
         if self.srtab_name is not None:
             self.srtab = PairTab(self.srtab_name)
@@ -107,6 +119,14 @@ class EnerModel(Model):
         return self.type_map
 
     def data_stat(self, data):
+        if self.data_stat_cache is not None:
+            if self._support_data_stat_cache(data):
+                self._data_stat_cached(data)
+                return
+            log.warning(
+                "the data stat cache is not supported by the descriptor "
+                f"{type(self.descrpt).__name__} or by mixed systems, ignored"
+            )
         all_stat = make_stat_input(data, self.data_stat_nbatch, merge_sys=False)
         m_all_stat = merge_sys_stat(all_stat)
         self._compute_input_stat(
@@ -115,7 +135,78 @@ class EnerModel(Model):
         self._compute_output_stat(all_stat, mixed_type=data.mixed_type)
         # self.bias_atom_e = data.compute_energy_shift(self.rcond)
 
-    def _compute_input_stat(self, all_stat, protection=1e-2, mixed_type=False):
+    def _support_data_stat_cache(self, data) -> bool:
+        # the per-system statistics are collected in the multi-task mode of
+        # the descriptor; hybrid descriptors share the stat dict among children
+        return (
+            hasattr(self.descrpt, "multi_task")
+            and not hasattr(self.descrpt, "descrpt_list")
+            and not data.mixed_systems
+        )
+
+    def _data_stat_cache_key(self, data) -> dict:
+        """The model settings that affect the data statistics."""
+        descrpt = self.descrpt
+        return {
+            "descriptor": type(descrpt).__name__,
+            "rcut": self.rcut,
+            "rcut_smth": getattr(
+                descrpt, "rcut_r_smth", getattr(descrpt, "rcut_smth", None)
+            ),
+            "sel": getattr(descrpt, "sel_a", None),
+            "sel_r": getattr(descrpt, "sel_r", None),
+            "exclude_types": sorted(
+                [list(tt) for tt in getattr(descrpt, "exclude_types", [])]
+            ),
+            "type_map": self.type_map,
+            "mixed_type": data.mixed_type,
+            "data_stat_nbatch": self.data_stat_nbatch,
+        }
+
+    def _data_stat_cached(self, data):
+        cache = DataStatCache(self.data_stat_cache, self._data_stat_cache_key(data))
+        nsys = data.get_nsystems()
+        keys = [cache.system_key(data, ii) for ii in range(nsys)]
+        sys_stats = [cache.load(kk) for kk in keys]
+        new_idx = [ii for ii in range(nsys) if sys_stats[ii] is None]
+        log.info(
+            f"data stat of {nsys - len(new_idx)} systems loaded from {self.data_stat_cache}, "
+            f"{len(new_idx)} systems to compute"
+        )
+        if len(new_idx) > 0:
+            all_stat = make_stat_input(
+                data, self.data_stat_nbatch, merge_sys=False, sys_idx=new_idx
+            )
+            for jj, ii in enumerate(new_idx):
+                sys_stat = {kk: vv[jj] for kk, vv in all_stat.items()}
+                sys_stats[ii] = {
+                    "descrpt": collect_descrpt_stat(
+                        self.descrpt,
+                        lambda: self._compute_descrpt_stat(sys_stat, data.mixed_type),
+                    ),
+                    "fitting": concat_sys_stat(
+                        sys_stat,
+                        ["energy", "natoms_vec", "real_natoms_vec", "fparam", "aparam"],
+                    ),
+                }
+                cache.save(keys[ii], sys_stats[ii])
+        self.descrpt.merge_input_stats(
+            {
+                kk: [ss["descrpt"][kk] for ss in sys_stats]
+                for kk in sys_stats[0]["descrpt"]
+            }
+        )
+        # each system is regarded as a single batch
+        fit_stat = {
+            kk: [[ss["fitting"][kk]] for ss in sys_stats]
+            for kk in sys_stats[0]["fitting"]
+        }
+        self.fitting.compute_input_stats(
+            merge_sys_stat(fit_stat), protection=self.data_stat_protect
+        )
+        self._compute_output_stat(fit_stat, mixed_type=data.mixed_type)
+
+    def _compute_descrpt_stat(self, all_stat, mixed_type=False):
         if mixed_type:
             self.descrpt.compute_input_stats(
                 all_stat["coord"],
@@ -136,6 +227,9 @@ class EnerModel(Model):
                 all_stat["default_mesh"],
                 all_stat,
             )
+
+    def _compute_input_stat(self, all_stat, protection=1e-2, mixed_type=False):
+        self._compute_descrpt_stat(all_stat, mixed_type=mixed_type)
         self.fitting.compute_input_stats(all_stat, protection=protection)
 
     def _compute_output_stat(self, all_stat, mixed_type=False):
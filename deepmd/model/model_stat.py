@@ -1,9 +1,20 @@
+import hashlib
+import json
+import logging
+import os
 from collections import (
     defaultdict,
 )
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
 
 import numpy as np
 
+log = logging.getLogger(__name__)
+
 
 def _make_all_stat_ref(data, nbatches):
     all_stat = defaultdict(list)
@@ -17,7 +28,7 @@ def _make_all_stat_ref(data, nbatches):
     return all_stat
 
 
-def make_stat_input(data, nbatches, merge_sys=True):
+def make_stat_input(data, nbatches, merge_sys=True, sys_idx=None):
     """Pack data for statistics.
 
     Parameters
@@ -28,6 +39,8 @@ def make_stat_input(data, nbatches, merge_sys=True):
         The number of batches
     merge_sys : bool (True)
         Merge system data
+    sys_idx : list of int, optional
+        Only pack the data of these systems. All systems are packed by default.
 
     Returns
     -------
@@ -38,8 +51,10 @@ def make_stat_input(data, nbatches, merge_sys=True):
         else merge_sys == True can be accessed by
             all_stat[key][batch_idx][frame_idx]
     """
+    if sys_idx is None:
+        sys_idx = range(data.get_nsystems())
     all_stat = defaultdict(list)
-    for ii in range(data.get_nsystems()):
+    for ii in sys_idx:
         sys_stat = defaultdict(list)
         for jj in range(nbatches):
             stat_data = data.get_batch(sys_idx=ii)
@@ -65,3 +80,166 @@ def merge_sys_stat(all_stat):
             for bb in all_stat[dd][ii]:
                 ret[dd].append(bb)
     return ret
+
+
+class DataStatCache:
+    """On-disk cache of the data statistics of each system.
+
+    For each system, the sums of the descriptor statistics (`sumr`, `suma`,
+    `sumn`, `sumr2`, `suma2`) and the inputs of the fitting statistics
+    (`energy`, `natoms_vec`, `real_natoms_vec`, `fparam`, `aparam`) are
+    stored in a `.npz` file in the cache directory. The file name is a hash
+    of the model settings that affect the statistics and of the fingerprint
+    of the system, i.e. its path, its batch size and the metadata index of
+    its sets. Adding or removing a system therefore only requires computing
+    the statistics of the new systems.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory of the cache
+    model_key : dict
+        The model settings that affect the statistics, e.g. the descriptor type,
+        the cutoff radii, the selection and the type map
+    """
+
+    cache_version = 1
+
+    def __init__(self, cache_dir: str, model_key: dict) -> None:
+        self.cache_dir = cache_dir
+        self.model_key = model_key
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def system_key(self, data, sys_idx: int) -> str:
+        """Get the cache key of a system.
+
+        Parameters
+        ----------
+        data : DeepmdDataSystem
+            The data systems
+        sys_idx : int
+            The index of the system
+
+        Returns
+        -------
+        str
+            The cache key
+        """
+        sys_data = data.data_systems[sys_idx]
+        fingerprint = {
+            "version": self.cache_version,
+            "model": self.model_key,
+            "system": os.path.abspath(str(data.system_dirs[sys_idx])),
+            "batch_size": int(data.batch_size[sys_idx]),
+            "sets": sys_data.index.sets,
+        }
+        return hashlib.sha256(
+            json.dumps(fingerprint, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def load(self, key: str) -> Optional[Dict[str, Dict[str, np.ndarray]]]:
+        """Load the statistics of a system.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the system
+
+        Returns
+        -------
+        dict or None
+            The dict with items `descrpt` and `fitting`, or None if the system
+            is not cached
+        """
+        try:
+            with np.load(self._path(key)) as f:
+                stat = {"descrpt": {}, "fitting": {}}
+                for kk in f.files:
+                    group, name = kk.split("/", 1)
+                    stat[group][name] = f[kk]
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(self._path(key)):
+                log.warning(f"cannot read the data stat cache {self._path(key)}: {e}")
+            return None
+        return stat
+
+    def save(self, key: str, stat: Dict[str, Dict[str, np.ndarray]]) -> None:
+        """Save the statistics of a system.
+
+        Parameters
+        ----------
+        key : str
+            The cache key of the system
+        stat : dict
+            The dict with items `descrpt` and `fitting`
+        """
+        arrays = {
+            f"{group}/{name}": value
+            for group in ("descrpt", "fitting")
+            for name, value in stat[group].items()
+        }
+        # write to a temporary file and rename it, so that concurrent
+        # trainings never read a partially written file
+        tmp_path = f"{self._path(key)}.{os.getpid()}"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            log.warning(f"cannot write the data stat cache {self._path(key)}: {e}")
+
+
+def collect_descrpt_stat(descrpt, compute) -> Dict[str, np.ndarray]:
+    """Collect the descriptor statistics of one system instead of merging them.
+
+    The descriptor is switched to the multi-task mode, in which
+    `compute_input_stats` appends the statistics of each batch to
+    `descrpt.stat_dict`, and the statistics of the batches are summed.
+
+    Parameters
+    ----------
+    descrpt : Descriptor
+        The descriptor, which should support the multi-task mode
+    compute : callable
+        Calls `descrpt.compute_input_stats` with the batches of the system
+
+    Returns
+    -------
+    dict
+        The sums of the statistics, e.g. `sumr`, `suma`, `sumn`, `sumr2`, `suma2`
+    """
+    multi_task = descrpt.multi_task
+    stat_dict = getattr(descrpt, "stat_dict", None)
+    descrpt.multi_task = True
+    descrpt.stat_dict = defaultdict(list)
+    try:
+        compute()
+        collected = descrpt.stat_dict
+    finally:
+        descrpt.multi_task = multi_task
+        if stat_dict is None:
+            del descrpt.stat_dict
+        else:
+            descrpt.stat_dict = stat_dict
+    return {kk: np.sum(vv, axis=0) for kk, vv in collected.items()}
+
+
+def concat_sys_stat(all_stat, keys: List[str]) -> Dict[str, np.ndarray]:
+    """Concatenate the batches of one system for the given keys.
+
+    Parameters
+    ----------
+    all_stat : dict
+        The statistic data of one system, all_stat[key][batch_idx][frame_idx]
+    keys : list of str
+        The keys to concatenate. Missing keys are skipped.
+
+    Returns
+    -------
+    dict
+        The concatenated data, all_stat[key][frame_idx]
+    """
+    return {kk: np.concatenate(all_stat[kk], axis=0) for kk in keys if kk in all_stat}
@@ -1,9 +1,16 @@
-from . import (
-    data,
-    descriptor,
-    entrypoints,
-    fit,
-    utils,
+from deepmd.utils.lazy import (
+    lazy_attributes,
+)
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "data": (".data", None),
+        "descriptor": (".descriptor", None),
+        "entrypoints": (".entrypoints", None),
+        "fit": (".fit", None),
+        "utils": (".utils", None),
+    },
 )
 
 __all__ = [
@@ -1,26 +1,21 @@
-from .argcheck import (
-    nvnmd_args,
+from deepmd.utils.lazy import (
+    lazy_attributes,
 )
-from .config import (
-    nvnmd_cfg,
-)
-from .encode import (
-    Encode,
-)
-from .fio import (
-    FioBin,
-    FioDic,
-    FioTxt,
-)
-from .network import (
-    one_layer,
-)
-from .op import (
-    map_nvnmd,
-)
-from .weight import (
-    get_filter_weight,
-    get_fitnet_weight,
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "nvnmd_args": (".argcheck", "nvnmd_args"),
+        "nvnmd_cfg": (".config", "nvnmd_cfg"),
+        "Encode": (".encode", "Encode"),
+        "FioBin": (".fio", "FioBin"),
+        "FioDic": (".fio", "FioDic"),
+        "FioTxt": (".fio", "FioTxt"),
+        "one_layer": (".network", "one_layer"),
+        "map_nvnmd": (".op", "map_nvnmd"),
+        "get_filter_weight": (".weight", "get_filter_weight"),
+        "get_fitnet_weight": (".weight", "get_fitnet_weight"),
+    },
 )
 
 __all__ = [
@@ -3,11 +3,15 @@ import glob
 import logging
 import os
 import platform
+import queue
 import shutil
+import threading
 import time
 from typing import (
     Dict,
     List,
+    Optional,
+    Tuple,
 )
 
 import google.protobuf.message
@@ -72,12 +76,18 @@ from deepmd.utils.graph import (
 from deepmd.utils.learning_rate import (
     LearningRateExp,
 )
+from deepmd.utils.phase_timer import (
+    PhaseTimer,
+)
 from deepmd.utils.sess import (
     run_sess,
 )
 from deepmd.utils.spin import (
     Spin,
 )
+from deepmd.utils.throughput import (
+    ThroughputMetrics,
+)
 from deepmd.utils.type_embed import (
     TypeEmbedNet,
 )
@@ -226,6 +236,7 @@ class DPTrainer:
                     model_param.get("sw_rmin"),
                     model_param.get("sw_rmax"),
                     self.spin,
+                    data_stat_cache=model_param.get("data_stat_cache"),
                 )
             # elif fitting_type == 'wfc':
             #     self.model = WFCModel(model_param, self.descrpt, self.fitting)
@@ -402,14 +413,24 @@ class DPTrainer:
         self.disp_freq = tr_data.get("disp_freq", 1000)
         self.save_freq = tr_data.get("save_freq", 1000)
         self.save_ckpt = tr_data.get("save_ckpt", "model.ckpt")
+        self.max_ckpt_keep = tr_data.get("max_ckpt_keep", 5)
+        self.async_ckpt = tr_data.get("async_ckpt", False)
+        self.async_valid = self.run_opt.is_chief and tr_data.get("async_valid", False)
         self.display_in_training = tr_data.get("disp_training", True)
         self.timing_in_training = tr_data.get("time_training", True)
+        self.phase_timing = tr_data.get("phase_timing", False)
+        self.phase_timing_window = tr_data.get("phase_timing_window", 1000)
+        self.phase_timing_file = tr_data.get("phase_timing_file", None)
+        self.metrics_file = tr_data.get("metrics_file", None)
+        self.metrics_freq = tr_data.get("metrics_freq", 100)
         self.profiling = self.run_opt.is_chief and tr_data.get("profiling", False)
         self.profiling_file = tr_data.get("profiling_file", "timeline.json")
         self.enable_profiler = tr_data.get("enable_profiler", False)
         self.tensorboard = self.run_opt.is_chief and tr_data.get("tensorboard", False)
         self.tensorboard_log_dir = tr_data.get("tensorboard_log_dir", "log")
         self.tensorboard_freq = tr_data.get("tensorboard_freq", 1)
+        self.prefetch_depth = tr_data.get("prefetch_depth", 0)
+        self.prefetch_workers = tr_data.get("prefetch_workers", 1)
         self.mixed_prec = tr_data.get("mixed_precision", None)
         if self.mixed_prec is not None:
             if (
@@ -770,7 +791,9 @@ class DPTrainer:
         # Initializes or restore global variables
         init_op = tf.global_variables_initializer()
         if self.run_opt.is_chief:
-            self.saver = tf.train.Saver(save_relative_paths=True)
+            self.saver = tf.train.Saver(
+                save_relative_paths=True, max_to_keep=self.max_ckpt_keep
+            )
             if self.run_opt.init_mode == "init_from_scratch":
                 log.info("initialize model from scratch")
                 run_sess(self.sess, init_op)
@@ -803,6 +826,7 @@ class DPTrainer:
         else:
             run_sess(self.sess, init_op)
             self.saver = None
+        self.ckpt_writer = None
 
         # Ensure variable consistency among tasks when training starts
         if self.run_opt.is_distrib:
@@ -813,6 +837,48 @@ class DPTrainer:
                 log.info("receive global variables from task#0")
             run_sess(self.sess, bcast_op)
 
+        phase_timing_file = self.phase_timing_file
+        if phase_timing_file is not None and self.run_opt.is_distrib:
+            # one file for each rank
+            root, ext = os.path.splitext(phase_timing_file)
+            phase_timing_file = f"{root}.{self.run_opt.my_rank}{ext}"
+        self.phase_timer = PhaseTimer(
+            enabled=self.phase_timing and not self.is_compress,
+            window=self.phase_timing_window,
+            trace_file=phase_timing_file,
+        )
+        if self.saver is not None and not self.is_compress:
+            self.ckpt_writer = CheckpointWriter(
+                self.sess,
+                self.saver,
+                self.save_ckpt,
+                max_to_keep=self.max_ckpt_keep,
+                asynchronous=self.async_ckpt,
+                phase_timer=self.phase_timer,
+            )
+
+        self.valid_sess = None
+        self._valid_thread = None
+        self._valid_error = None
+        if self.async_valid and self.display_in_training and not self.is_compress:
+            # each session has its own values of the variables, so the
+            # validation session evaluates a snapshot of the training variables
+            self.valid_sess = tf.Session(config=config)
+            self._valid_variables = tf.global_variables()
+            with tf.name_scope("valid_snapshot"):
+                self._valid_load_feeds = [
+                    tf.placeholder(var.dtype.base_dtype, var.shape)
+                    for var in self._valid_variables
+                ]
+                self._valid_load_ops = tf.group(
+                    *[
+                        tf.assign(var, value)
+                        for var, value in zip(
+                            self._valid_variables, self._valid_load_feeds
+                        )
+                    ]
+                )
+
     def train(self, train_data=None, valid_data=None):
         # if valid_data is None:  # no validation set specified.
         #     valid_data = train_data  # using training set as validation set.
@@ -890,183 +956,209 @@ class DPTrainer:
         train_time = 0
         total_train_time = 0.0
         wall_time_tic = time.time()
+        phase_timer = self.phase_timer
+
+        metrics = None
+        if self.metrics_file is not None:
+            metrics_file = self.metrics_file
+            if self.run_opt.is_distrib:
+                # one file for each rank
+                root, ext = os.path.splitext(metrics_file)
+                metrics_file = f"{root}.{self.run_opt.my_rank}{ext}"
+            metrics = ThroughputMetrics(
+                metrics_file,
+                rank=self.run_opt.my_rank,
+                device=self.run_opt.my_device,
+                multi_task=self.multi_task_mode,
+                append=self.run_opt.init_mode == "restart",
+            )
 
         next_batch_train_op = None
+        fitting_key = None
         next_fitting_key = None
         next_train_batch_list = None
         next_datasetloader = None
 
         # dataset loader op
         if not self.multi_task_mode:
-            datasetloader = DatasetLoader(train_data)
+            datasetloader = DatasetLoader(
+                train_data,
+                prefetch_depth=self.prefetch_depth,
+                prefetch_workers=self.prefetch_workers,
+                phase_timer=phase_timer,
+            )
             data_op = datasetloader.build()
         else:
             datasetloader = {}
             data_op = {}
             for fitting_key in self.fitting_type_dict:
-                datasetloader[fitting_key] = DatasetLoader(train_data[fitting_key])
+                datasetloader[fitting_key] = DatasetLoader(
+                    train_data[fitting_key],
+                    prefetch_depth=self.prefetch_depth,
+                    prefetch_workers=self.prefetch_workers,
+                    phase_timer=phase_timer,
+                )
                 data_op[fitting_key] = datasetloader[fitting_key].build()
 
-        while cur_batch < stop_batch:
-            # first round validation:
-            if is_first_step:
+        # the prefetching threads are stopped even if the training fails
+        try:
+            while cur_batch < stop_batch:
+                step_tic = time.perf_counter()
+                phase_timer.step = cur_batch
+                # first round validation:
+                if is_first_step:
+                    tic_batch = time.perf_counter()
+                    if not self.multi_task_mode:
+                        with phase_timer.phase("get_batch"):
+                            train_batch = train_data.get_batch()
+                        batch_train_op = self.train_op
+                    else:
+                        fitting_idx = dp_random.choice(
+                            np.arange(self.nfitting), p=np.array(self.fitting_prob)
+                        )
+                        fitting_key = self.fitting_key_list[fitting_idx]
+                        with phase_timer.phase("get_batch"):
+                            train_batch = train_data[fitting_key].get_batch()
+                        batch_train_op = self.train_op[fitting_key]
+                    if metrics is not None:
+                        metrics.add_data_wait_time(time.perf_counter() - tic_batch)
+                else:
+                    train_batch = next_datasetloader.get_data_dict(
+                        next_train_batch_list
+                    )
+                    batch_train_op = next_batch_train_op
+                    fitting_key = next_fitting_key
+                # for next round
                 if not self.multi_task_mode:
-                    train_batch = train_data.get_batch()
-                    batch_train_op = self.train_op
+                    next_datasetloader = datasetloader
+                    next_batch_train_op = self.train_op
+                    next_train_batch_op = data_op
                 else:
                     fitting_idx = dp_random.choice(
                         np.arange(self.nfitting), p=np.array(self.fitting_prob)
                     )
-                    fitting_key = self.fitting_key_list[fitting_idx]
-                    train_batch = train_data[fitting_key].get_batch()
-                    batch_train_op = self.train_op[fitting_key]
-            else:
-                train_batch = next_datasetloader.get_data_dict(next_train_batch_list)
-                batch_train_op = next_batch_train_op
-                fitting_key = next_fitting_key
-            # for next round
-            if not self.multi_task_mode:
-                next_datasetloader = datasetloader
-                next_batch_train_op = self.train_op
-                next_train_batch_op = data_op
-            else:
-                fitting_idx = dp_random.choice(
-                    np.arange(self.nfitting), p=np.array(self.fitting_prob)
-                )
-                next_fitting_key = self.fitting_key_list[fitting_idx]
-                next_datasetloader = datasetloader[next_fitting_key]
-                next_batch_train_op = self.train_op[fitting_key]
-                next_train_batch_op = data_op[fitting_key]
-
-            if self.display_in_training and is_first_step:
-                if self.run_opt.is_chief:
-                    if not self.multi_task_mode:
-                        valid_batches = (
-                            [
-                                valid_data.get_batch()
-                                for ii in range(self.valid_numb_batch)
-                            ]
-                            if valid_data is not None
-                            else None
-                        )
-                        self.valid_on_the_fly(
-                            fp, [train_batch], valid_batches, print_header=True
-                        )
-                    else:
-                        train_batches = {}
-                        valid_batches = {}
-                        # valid_numb_batch_dict
-                        for fitting_key_ii in train_data:
-                            # enumerate fitting key as fitting_key_ii
-                            train_batches[fitting_key_ii] = [
-                                train_data[fitting_key_ii].get_batch()
-                            ]
-                            valid_batches[fitting_key_ii] = (
-                                [
-                                    valid_data[fitting_key_ii].get_batch()
-                                    for ii in range(
-                                        self.valid_numb_batch_dict[fitting_key_ii]
-                                    )
-                                ]
-                                if fitting_key_ii in valid_data
-                                else None
+                    next_fitting_key = self.fitting_key_list[fitting_idx]
+                    next_datasetloader = datasetloader[next_fitting_key]
+                    next_batch_train_op = self.train_op[fitting_key]
+                    next_train_batch_op = data_op[fitting_key]
+
+                if self.display_in_training and is_first_step:
+                    if self.run_opt.is_chief:
+                        with phase_timer.phase("validation"):
+                            self._validate(
+                                fp,
+                                train_batch,
+                                train_data,
+                                valid_data,
+                                print_header=True,
+                                fitting_key=fitting_key,
                             )
-                        self.valid_on_the_fly(
-                            fp,
-                            train_batches,
-                            valid_batches,
-                            print_header=True,
-                            fitting_key=fitting_key,
-                        )
-                is_first_step = False
-
-            if self.timing_in_training:
-                tic = time.time()
-            train_feed_dict = self.get_feed_dict(train_batch, is_training=True)
-            # use tensorboard to visualize the training of deepmd-kit
-            # it will takes some extra execution time to generate the tensorboard data
-            if self.tensorboard and (cur_batch % self.tensorboard_freq == 0):
-                summary, _, next_train_batch_list = run_sess(
-                    self.sess,
-                    [summary_merged_op, batch_train_op, next_train_batch_op],
-                    feed_dict=train_feed_dict,
-                    options=prf_options,
-                    run_metadata=prf_run_metadata,
-                )
-                tb_train_writer.add_summary(summary, cur_batch)
-            else:
-                _, next_train_batch_list = run_sess(
-                    self.sess,
-                    [batch_train_op, next_train_batch_op],
-                    feed_dict=train_feed_dict,
-                    options=prf_options,
-                    run_metadata=prf_run_metadata,
-                )
-            if self.timing_in_training:
-                toc = time.time()
-            if self.timing_in_training:
-                train_time += toc - tic
-            cur_batch = run_sess(self.sess, self.global_step)
-            self.cur_batch = cur_batch
-
-            # on-the-fly validation
-            if self.display_in_training and (cur_batch % self.disp_freq == 0):
+                    is_first_step = False
+
                 if self.timing_in_training:
                     tic = time.time()
-                if self.run_opt.is_chief:
-                    if not self.multi_task_mode:
-                        valid_batches = (
-                            [
-                                valid_data.get_batch()
-                                for ii in range(self.valid_numb_batch)
-                            ]
-                            if valid_data is not None
-                            else None
+                with phase_timer.phase("get_feed_dict"):
+                    train_feed_dict = self.get_feed_dict(train_batch, is_training=True)
+                # the data OP of the next step, the optimizer and the allreduce of
+                # Horovod are all run in the same session call
+                with phase_timer.phase("run_step"):
+                    # use tensorboard to visualize the training of deepmd-kit
+                    # it will takes some extra execution time to generate the tensorboard data
+                    if self.tensorboard and (cur_batch % self.tensorboard_freq == 0):
+                        summary, _, next_train_batch_list = run_sess(
+                            self.sess,
+                            [summary_merged_op, batch_train_op, next_train_batch_op],
+                            feed_dict=train_feed_dict,
+                            options=prf_options,
+                            run_metadata=prf_run_metadata,
                         )
-                        self.valid_on_the_fly(fp, [train_batch], valid_batches)
+                        tb_train_writer.add_summary(summary, cur_batch)
                     else:
-                        train_batches = {}
-                        valid_batches = {}
-                        for fitting_key_ii in train_data:
-                            train_batches[fitting_key_ii] = [
-                                train_data[fitting_key_ii].get_batch()
-                            ]
-                            valid_batches[fitting_key_ii] = (
-                                [
-                                    valid_data[fitting_key_ii].get_batch()
-                                    for ii in range(
-                                        self.valid_numb_batch_dict[fitting_key_ii]
-                                    )
-                                ]
-                                if fitting_key_ii in valid_data
-                                else None
-                            )
-                        self.valid_on_the_fly(
-                            fp, train_batches, valid_batches, fitting_key=fitting_key
+                        _, next_train_batch_list = run_sess(
+                            self.sess,
+                            [batch_train_op, next_train_batch_op],
+                            feed_dict=train_feed_dict,
+                            options=prf_options,
+                            run_metadata=prf_run_metadata,
                         )
                 if self.timing_in_training:
                     toc = time.time()
-                    test_time = toc - tic
-                    wall_time = toc - wall_time_tic
-                    log.info(
-                        "batch %7d training time %.2f s, testing time %.2f s, total wall time %.2f s"
-                        % (cur_batch, train_time, test_time, wall_time)
-                    )
-                    # the first training time is not accurate
-                    if cur_batch > self.disp_freq or stop_batch < 2 * self.disp_freq:
-                        total_train_time += train_time
-                    train_time = 0
-                    wall_time_tic = toc
-                if (
-                    self.save_freq > 0
-                    and cur_batch % self.save_freq == 0
-                    and self.saver is not None
-                ):
-                    self.save_checkpoint(cur_batch)
+                if self.timing_in_training:
+                    train_time += toc - tic
+                cur_batch = run_sess(self.sess, self.global_step)
+                self.cur_batch = cur_batch
+                if metrics is not None:
+                    metrics.add_batch(train_batch, fitting_key)
+                    if cur_batch % self.metrics_freq == 0:
+                        for loader in (
+                            [datasetloader]
+                            if not self.multi_task_mode
+                            else datasetloader.values()
+                        ):
+                            metrics.add_data_wait_time(loader.pop_data_wait_time())
+                        metrics.write(cur_batch)
+
+                # on-the-fly validation
+                if self.display_in_training and (cur_batch % self.disp_freq == 0):
+                    if self.timing_in_training:
+                        tic = time.time()
+                    if self.run_opt.is_chief:
+                        with phase_timer.phase("validation"):
+                            self._validate(
+                                fp,
+                                train_batch,
+                                train_data,
+                                valid_data,
+                                fitting_key=fitting_key,
+                            )
+                    if self.timing_in_training:
+                        toc = time.time()
+                        test_time = toc - tic
+                        wall_time = toc - wall_time_tic
+                        log.info(
+                            "batch %7d training time %.2f s, testing time %.2f s, total wall time %.2f s"
+                            % (cur_batch, train_time, test_time, wall_time)
+                        )
+                        if self.prefetch_depth > 0:
+                            self._log_prefetch_stat(cur_batch, datasetloader)
+                        phase_timer.log_stat(cur_batch)
+                        # the first training time is not accurate
+                        if (
+                            cur_batch > self.disp_freq
+                            or stop_batch < 2 * self.disp_freq
+                        ):
+                            total_train_time += train_time
+                        train_time = 0
+                        wall_time_tic = toc
+                    if (
+                        self.save_freq > 0
+                        and cur_batch % self.save_freq == 0
+                        and self.saver is not None
+                    ):
+                        with phase_timer.phase("checkpoint"):
+                            self.save_checkpoint(cur_batch)
+                phase_timer.record("step", step_tic, time.perf_counter())
+        finally:
+            if not self.multi_task_mode:
+                datasetloader.close()
+            else:
+                for loader in datasetloader.values():
+                    loader.close()
         if (
             self.save_freq == 0 or cur_batch == 0 or cur_batch % self.save_freq != 0
         ) and self.saver is not None:
             self.save_checkpoint(cur_batch)
+        if self.ckpt_writer is not None:
+            # the last checkpoint should be complete when the training ends
+            self.ckpt_writer.close()
+        if self.valid_sess is not None:
+            # the learning curve should be complete when the training ends
+            self.flush_validation()
+            self.valid_sess.close()
+            self.valid_sess = None
+        phase_timer.close()
+        if metrics is not None:
+            metrics.close()
         if self.run_opt.is_chief:
             fp.close()
         if self.timing_in_training and stop_batch // self.disp_freq > 0:
@@ -1091,35 +1183,32 @@ class DPTrainer:
         if self.enable_profiler and self.run_opt.is_chief:
             tfv2.profiler.experimental.stop()
 
-    def save_checkpoint(self, cur_batch: int):
-        try:
-            ckpt_prefix = self.saver.save(
-                self.sess,
-                os.path.join(os.getcwd(), self.save_ckpt),
-                global_step=cur_batch,
+    @staticmethod
+    def _log_prefetch_stat(cur_batch, datasetloader):
+        """Log how often the training waited for the prefetched batches, and reset the counters."""
+        if isinstance(datasetloader, DatasetLoader):
+            datasetloader = {"": datasetloader}
+        for fitting_key, loader in datasetloader.items():
+            stat = loader.get_prefetch_stat()
+            log.info(
+                "batch %7d %sdata prefetch: starved %d/%d batches, waiting time %.2f s, queue size %d"
+                % (
+                    cur_batch,
+                    f"{fitting_key} " if fitting_key else "",
+                    stat["nstarved"],
+                    stat["nbatches"],
+                    stat["wait_time"],
+                    stat["qsize"],
+                )
             )
-        except google.protobuf.message.DecodeError as e:
-            raise GraphTooLargeError(
-                "The graph size exceeds 2 GB, the hard limitation of protobuf."
-                " Then a DecodeError was raised by protobuf. You should "
-                "reduce the size of your model."
-            ) from e
-        # make symlinks from prefix with step to that without step to break nothing
-        # get all checkpoint files
-        original_files = glob.glob(ckpt_prefix + ".*")
-        for ori_ff in original_files:
-            new_ff = self.save_ckpt + ori_ff[len(ckpt_prefix) :]
-            try:
-                # remove old one
-                os.remove(new_ff)
-            except OSError:
-                pass
-            if platform.system() != "Windows":
-                # by default one does not have access to create symlink on Windows
-                os.symlink(ori_ff, new_ff)
-            else:
-                shutil.copyfile(ori_ff, new_ff)
-        log.info("saved checkpoint %s" % self.save_ckpt)
+            loader.reset_prefetch_stat()
+
+    def save_checkpoint(self, cur_batch: int):
+        """Save the checkpoint of the current step.
+
+        The checkpoint may be written on a background thread, see `CheckpointWriter`.
+        """
+        self.ckpt_writer.save(cur_batch)
 
     def get_feed_dict(self, batch, is_training):
         feed_dict = {}
@@ -1149,15 +1238,142 @@ class DPTrainer:
     #         fp.write(print_str)
     #         fp.close ()
 
+    def _get_valid_batches(self, valid_data, fitting_key=None):
+        """Get the validation batches of the fitting net `fitting_key` in multi-task mode."""
+        if fitting_key is None:
+            if valid_data is None:
+                return None
+            return [valid_data.get_batch() for ii in range(self.valid_numb_batch)]
+        if fitting_key not in valid_data:
+            return None
+        return [
+            valid_data[fitting_key].get_batch()
+            for ii in range(self.valid_numb_batch_dict[fitting_key])
+        ]
+
+    def _validate(
+        self,
+        fp,
+        train_batch,
+        train_data,
+        valid_data,
+        print_header=False,
+        fitting_key=None,
+    ):
+        """Validate the model and print the learning curve.
+
+        If the validation session exists, i.e. `async_valid` is set, the variables are copied into the validation
+        session, and the validation batches are loaded, evaluated and printed
+        on a background thread while the training continues.
+        """
+        if not self.multi_task_mode:
+            train_batches = [train_batch]
+            if self.valid_sess is None:
+                valid_batches = self._get_valid_batches(valid_data)
+        else:
+            train_batches = {}
+            valid_batches = {}
+            for fitting_key_ii in train_data:
+                train_batches[fitting_key_ii] = [train_data[fitting_key_ii].get_batch()]
+                if self.valid_sess is None:
+                    valid_batches[fitting_key_ii] = self._get_valid_batches(
+                        valid_data, fitting_key_ii
+                    )
+        if self.valid_sess is None:
+            self.valid_on_the_fly(
+                fp,
+                train_batches,
+                valid_batches,
+                print_header=print_header,
+                fitting_key=fitting_key,
+            )
+            return
+        self.flush_validation()
+        # the snapshot is taken on the training thread, so the results belong
+        # to the current step
+        values = run_sess(self.sess, self._valid_variables)
+        self._valid_thread = threading.Thread(
+            target=self._validate_in_background,
+            args=(
+                fp,
+                values,
+                self.cur_batch,
+                train_batches,
+                valid_data,
+                print_header,
+                fitting_key,
+            ),
+            name="validation",
+        )
+        self._valid_thread.start()
+
+    def _validate_in_background(
+        self,
+        fp,
+        values,
+        cur_batch,
+        train_batches,
+        valid_data,
+        print_header,
+        fitting_key,
+    ):
+        try:
+            with self.phase_timer.phase("validation_background"):
+                run_sess(
+                    self.valid_sess,
+                    self._valid_load_ops,
+                    feed_dict=dict(zip(self._valid_load_feeds, values)),
+                )
+                if not self.multi_task_mode:
+                    valid_batches = self._get_valid_batches(valid_data)
+                else:
+                    valid_batches = {
+                        fitting_key_ii: self._get_valid_batches(
+                            valid_data, fitting_key_ii
+                        )
+                        for fitting_key_ii in train_batches
+                    }
+                self.valid_on_the_fly(
+                    fp,
+                    train_batches,
+                    valid_batches,
+                    print_header=print_header,
+                    fitting_key=fitting_key,
+                    sess=self.valid_sess,
+                    cur_batch=cur_batch,
+                )
+        except Exception as e:
+            # raised in the training thread by the next flush
+            self._valid_error = e
+
+    def flush_validation(self):
+        """Wait for the validation on the background thread, and raise its error if any."""
+        if self._valid_thread is not None:
+            self._valid_thread.join()
+            self._valid_thread = None
+        if self._valid_error is not None:
+            error, self._valid_error = self._valid_error, None
+            raise error
+
     def valid_on_the_fly(
-        self, fp, train_batches, valid_batches, print_header=False, fitting_key=None
+        self,
+        fp,
+        train_batches,
+        valid_batches,
+        print_header=False,
+        fitting_key=None,
+        sess=None,
+        cur_batch=None,
     ):
-        train_results = self.get_evaluation_results(train_batches)
-        valid_results = self.get_evaluation_results(valid_batches)
+        if sess is None:
+            sess = self.sess
+        if cur_batch is None:
+            cur_batch = self.cur_batch
+        train_results = self.get_evaluation_results(train_batches, sess=sess)
+        valid_results = self.get_evaluation_results(valid_batches, sess=sess)
 
-        cur_batch = self.cur_batch
         if not self.multi_task_mode:
-            current_lr = run_sess(self.sess, self.learning_rate)
+            current_lr = run_sess(sess, self.learning_rate)
         else:
             assert (
                 fitting_key is not None
@@ -1167,7 +1383,7 @@ class DPTrainer:
             current_lr_dict = {}
             for fitting_key_ii in train_batches:
                 current_lr_dict[fitting_key_ii] = run_sess(
-                    self.sess, self.learning_rate_dict[fitting_key_ii]
+                    sess, self.learning_rate_dict[fitting_key_ii]
                 )
         if print_header:
             self.print_header(fp, train_results, valid_results, self.multi_task_mode)
@@ -1288,10 +1504,12 @@ class DPTrainer:
         }
         return single_results
 
-    def get_evaluation_results(self, batch_list):
+    def get_evaluation_results(self, batch_list, sess=None):
+        if sess is None:
+            sess = self.sess
         if not self.multi_task_mode:
             avg_results = self.eval_single_list(
-                batch_list, self.loss, self.sess, self.get_feed_dict
+                batch_list, self.loss, sess, self.get_feed_dict
             )
         else:
             avg_results = {}
@@ -1299,7 +1517,7 @@ class DPTrainer:
                 avg_results[fitting_key] = self.eval_single_list(
                     batch_list[fitting_key],
                     self.loss_dict[fitting_key],
-                    self.sess,
+                    sess,
                     self.get_feed_dict,
                     prefix=f"{fitting_key}_",
                 )
@@ -1437,10 +1655,22 @@ class DatasetLoader:
     It can be used to load the training data in the training process, so there is
     no waiting time between training steps.
 
+    If `prefetch_depth` is positive, `prefetch_workers` background threads keep
+    assembling batches, including reloading and shuffling sets and modifying
+    the data, into a queue holding at most `prefetch_depth` batches. The OP
+    then only takes a ready batch from the queue.
+
     Parameters
     ----------
     train_data : DeepmdDataSystem
         The training data.
+    prefetch_depth : int, default=0
+        The maximum number of batches prefetched in the background.
+        If 0, the batches are loaded by the OP itself.
+    prefetch_workers : int, default=1
+        The number of threads that prefetch the batches.
+    phase_timer : PhaseTimer, optional
+        The timer of loading and waiting for the batches.
 
     Examples
     --------
@@ -1451,12 +1681,119 @@ class DatasetLoader:
     >>> data_dict = loader.get_data_dict(data_list)
     """
 
-    def __init__(self, train_data: DeepmdDataSystem):
+    def __init__(
+        self,
+        train_data: DeepmdDataSystem,
+        prefetch_depth: int = 0,
+        prefetch_workers: int = 1,
+        phase_timer: Optional[PhaseTimer] = None,
+    ):
         self.train_data = train_data
+        self.phase_timer = (
+            phase_timer if phase_timer is not None else PhaseTimer(enabled=False)
+        )
         # get the keys of the data
         batch_data = self.train_data.get_batch()
         self.data_keys = batch_data.keys()
         self.data_types = [tf.as_dtype(x.dtype) for x in batch_data.values()]
+        self.prefetch_depth = prefetch_depth
+        self.prefetch_workers = prefetch_workers
+        self.reset_prefetch_stat()
+        self._data_wait_time = 0.0
+        self._workers = []
+        if self.prefetch_depth > 0:
+            self._queue = queue.Queue(maxsize=self.prefetch_depth)
+            self._stop_event = threading.Event()
+            for ii in range(self.prefetch_workers):
+                worker = threading.Thread(
+                    target=self._prefetch, name=f"prefetch_{ii}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _get_batch_list(self) -> Tuple[np.ndarray, ...]:
+        with self.phase_timer.phase("get_batch"):
+            batch_data = self.train_data.get_batch()
+        # convert dict to list of arryas
+        return tuple([batch_data[kk] for kk in self.data_keys])
+
+    def _prefetch(self):
+        """Keep putting batches into the queue until the loader is closed."""
+        while not self._stop_event.is_set():
+            try:
+                item = self._get_batch_list()
+            except Exception as e:
+                # raised in the training thread when the batch is taken
+                item = e
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _take_batch(self) -> Tuple[np.ndarray, ...]:
+        """Take a prefetched batch, and record how long the training waits for it."""
+        tic = time.perf_counter()
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            self.prefetch_stat["nstarved"] += 1
+            item = self._queue.get()
+        toc = time.perf_counter()
+        self.phase_timer.record("wait_batch", tic, toc)
+        self.prefetch_stat["wait_time"] += toc - tic
+        self._data_wait_time += toc - tic
+        self.prefetch_stat["nbatches"] += 1
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def _load_batch(self) -> Tuple[np.ndarray, ...]:
+        """Load a batch in the data OP, and record the time."""
+        tic = time.perf_counter()
+        item = self._get_batch_list()
+        self._data_wait_time += time.perf_counter() - tic
+        return item
+
+    def pop_data_wait_time(self) -> float:
+        """Get the time spent in loading or waiting for the batches by the data OP
+        since the previous call.
+
+        Returns
+        -------
+        float
+            The time in seconds
+        """
+        wait_time, self._data_wait_time = self._data_wait_time, 0.0
+        return wait_time
+
+    def reset_prefetch_stat(self):
+        """Reset the statistics of the prefetching queue."""
+        self.prefetch_stat = {"nbatches": 0, "nstarved": 0, "wait_time": 0.0}
+
+    def get_prefetch_stat(self) -> Dict[str, float]:
+        """Get the statistics of the prefetching queue since the last reset.
+
+        Returns
+        -------
+        Dict[str, float]
+            `nbatches`: the number of batches taken from the queue;
+            `nstarved`: the number of times the queue was empty when a batch was needed;
+            `wait_time`: the total time waiting for the batches, in seconds;
+            `qsize`: the number of batches in the queue now.
+        """
+        stat = dict(self.prefetch_stat)
+        stat["qsize"] = self._queue.qsize() if self.prefetch_depth > 0 else 0
+        return stat
+
+    def close(self):
+        """Stop the prefetching threads."""
+        if self.prefetch_depth > 0:
+            self._stop_event.set()
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
 
     def build(self) -> List[tf.Tensor]:
         """Build the OP that loads the training data.
@@ -1466,13 +1803,10 @@ class DatasetLoader:
         List[tf.Tensor]
             Tensor of the loaded data.
         """
-        train_data = self.train_data
-
-        def get_train_batch() -> List[np.ndarray]:
-            batch_data = train_data.get_batch()
-            # convert dict to list of arryas
-            batch_data = tuple([batch_data[kk] for kk in self.data_keys])
-            return batch_data
+        if self.prefetch_depth > 0:
+            get_train_batch = self._take_batch
+        else:
+            get_train_batch = self._load_batch
 
         return tf.py_func(get_train_batch, [], self.data_types, name="train_data")
 
@@ -1490,3 +1824,165 @@ class DatasetLoader:
             The dict of the loaded data.
         """
         return {kk: vv for kk, vv in zip(self.data_keys, batch_list)}
+
+
+class CheckpointWriter:
+    """Write the checkpoints of the training, optionally on a background thread.
+
+    In the asynchronous mode, the variables are copied into snapshot variables
+    on the training thread, which is fast, and the snapshot is then saved and
+    linked to `save_ckpt` on a background thread while the training continues.
+    A new checkpoint waits for the previous one to be written.
+
+    Parameters
+    ----------
+    sess : tf.Session
+        The training session.
+    saver : tf.train.Saver
+        The saver of the training variables, which also defines the meta graph
+        saved with each checkpoint.
+    save_ckpt : str
+        The prefix of the checkpoints, relative to the working directory.
+    max_to_keep : int
+        The number of the recent checkpoints to keep.
+    asynchronous : bool, default=False
+        Whether to write the checkpoints on a background thread.
+    phase_timer : PhaseTimer, optional
+        The timer of the writing on the background thread.
+    """
+
+    def __init__(
+        self,
+        sess: tf.Session,
+        saver: tf.train.Saver,
+        save_ckpt: str,
+        max_to_keep: int,
+        asynchronous: bool = False,
+        phase_timer: Optional[PhaseTimer] = None,
+    ):
+        self.sess = sess
+        self.phase_timer = (
+            phase_timer if phase_timer is not None else PhaseTimer(enabled=False)
+        )
+        self.save_ckpt = save_ckpt
+        self.save_path = os.path.join(os.getcwd(), save_ckpt)
+        self.asynchronous = asynchronous
+        self._thread = None
+        self._error = None
+        if not self.asynchronous:
+            self.saver = saver
+            return
+        # the meta graph does not change during the training, so it is only
+        # serialized once; it keeps the saver of the training variables
+        try:
+            self._meta_graph = saver.export_meta_graph().SerializeToString()
+        except google.protobuf.message.DecodeError as e:
+            raise GraphTooLargeError(
+                "The graph size exceeds 2 GB, the hard limitation of protobuf."
+                " Then a DecodeError was raised by protobuf. You should "
+                "reduce the size of your model."
+            ) from e
+        var_dict = {}
+        copy_ops = []
+        with tf.name_scope("ckpt_snapshot"):
+            for var in tf.global_variables():
+                with tf.colocate_with(var):
+                    # not in any collection, so not initialized or saved with the model
+                    snapshot = tf.Variable(
+                        tf.zeros(var.shape, dtype=var.dtype.base_dtype),
+                        trainable=False,
+                        collections=[],
+                        name=var.op.name.replace("/", "_"),
+                    )
+                    copy_ops.append(tf.assign(snapshot, var))
+                # saved with the name of the training variable
+                var_dict[var.op.name] = snapshot
+        self._copy_op = tf.group(*copy_ops)
+        self.saver = tf.train.Saver(
+            var_list=var_dict,
+            max_to_keep=max_to_keep,
+            save_relative_paths=True,
+        )
+
+    def save(self, cur_batch: int):
+        """Save the checkpoint of the current step.
+
+        Parameters
+        ----------
+        cur_batch : int
+            The current training step.
+        """
+        if not self.asynchronous:
+            self._write(cur_batch)
+            return
+        self.flush()
+        run_sess(self.sess, self._copy_op)
+        self._thread = threading.Thread(
+            target=self._write_in_background,
+            args=(cur_batch,),
+            name="checkpoint_writer",
+        )
+        self._thread.start()
+
+    def flush(self):
+        """Wait for the checkpoint being written, and raise its error if any."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        """Wait for the last checkpoint to be written."""
+        self.flush()
+
+    def _write_in_background(self, cur_batch: int):
+        try:
+            with self.phase_timer.phase("checkpoint_background"):
+                self._write(cur_batch)
+        except Exception as e:
+            # raised in the training thread by the next flush
+            self._error = e
+
+    def _write(self, cur_batch: int):
+        if self.asynchronous:
+            # write the meta graph first, so the checkpoint is complete once
+            # it is recorded in the checkpoint state file
+            with open(f"{self.save_path}-{cur_batch}.meta", "wb") as f:
+                f.write(self._meta_graph)
+            ckpt_prefix = self.saver.save(
+                self.sess,
+                self.save_path,
+                global_step=cur_batch,
+                write_meta_graph=False,
+            )
+        else:
+            try:
+                ckpt_prefix = self.saver.save(
+                    self.sess,
+                    self.save_path,
+                    global_step=cur_batch,
+                )
+            except google.protobuf.message.DecodeError as e:
+                raise GraphTooLargeError(
+                    "The graph size exceeds 2 GB, the hard limitation of protobuf."
+                    " Then a DecodeError was raised by protobuf. You should "
+                    "reduce the size of your model."
+                ) from e
+        # make symlinks from prefix with step to that without step to break nothing
+        # get all checkpoint files
+        original_files = glob.glob(ckpt_prefix + ".*")
+        for ori_ff in original_files:
+            new_ff = self.save_ckpt + ori_ff[len(ckpt_prefix) :]
+            try:
+                # remove old one
+                os.remove(new_ff)
+            except OSError:
+                pass
+            if platform.system() != "Windows":
+                # by default one does not have access to create symlink on Windows
+                os.symlink(ori_ff, new_ff)
+            else:
+                shutil.copyfile(ori_ff, new_ff)
+        log.info("saved checkpoint %s" % self.save_ckpt)
@@ -1,19 +1,18 @@
 #
-from .data import (
-    DeepmdData,
+from .lazy import (
+    lazy_attributes,
 )
-from .data_system import (
-    DeepmdDataSystem,
-)
-from .learning_rate import (
-    LearningRateExp,
-)
-from .pair_tab import (
-    PairTab,
-)
-from .plugin import (
-    Plugin,
-    PluginVariant,
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "DeepmdData": (".data", "DeepmdData"),
+        "DeepmdDataSystem": (".data_system", "DeepmdDataSystem"),
+        "LearningRateExp": (".learning_rate", "LearningRateExp"),
+        "PairTab": (".pair_tab", "PairTab"),
+        "Plugin": (".plugin", "Plugin"),
+        "PluginVariant": (".plugin", "PluginVariant"),
+    },
 )
 
 __all__ = [
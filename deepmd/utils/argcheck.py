@@ -14,8 +14,8 @@ from dargs import (
 )
 
 from deepmd.common import (
-    ACTIVATION_FN_DICT,
-    PRECISION_DICT,
+    VALID_ACTIVATION,
+    VALID_PRECISION,
 )
 from deepmd.nvnmd.utils.argcheck import (
     nvnmd_args,
@@ -50,8 +50,8 @@ def type_embedding_args():
     doc_neuron = "Number of neurons in each hidden layers of the embedding net. When two layers are of the same size or one layer is twice as large as the previous layer, a skip connection is built."
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_seed = "Random seed for parameter initialization"
-    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
-    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_trainable = "If the parameters in the embedding net are trainable"
 
     return [
@@ -174,10 +174,10 @@ def descrpt_se_a_args():
     doc_rcut_smth = "Where to start smoothing. For example the 1/r term is smoothed from `rcut` to `rcut_smth`"
     doc_neuron = "Number of neurons in each hidden layers of the embedding net. When two layers are of the same size or one layer is twice as large as the previous layer, a skip connection is built."
     doc_axis_neuron = "Size of the submatrix of G (embedding matrix)."
-    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_type_one_side = r"If true, the embedding network parameters vary by types of neighbor atoms only, so there will be $N_\text{types}$ sets of embedding network parameters. Otherwise, the embedding network parameters vary by types of centric atoms and types of neighbor atoms, so there will be $N_\text{types}^2$ sets of embedding network parameters."
-    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_trainable = "If the parameters in the embedding net is trainable"
     doc_seed = "Random seed for parameter initialization"
     doc_exclude_types = "The excluded pairs of types which have no interaction with each other. For example, `[[0, 1]]` means no interaction between type 0 and type 1."
@@ -227,9 +227,9 @@ def descrpt_se_t_args():
     doc_rcut = "The cut-off radius."
     doc_rcut_smth = "Where to start smoothing. For example the 1/r term is smoothed from `rcut` to `rcut_smth`"
     doc_neuron = "Number of neurons in each hidden layers of the embedding net. When two layers are of the same size or one layer is twice as large as the previous layer, a skip connection is built."
-    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
-    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_trainable = "If the parameters in the embedding net are trainable"
     doc_seed = "Random seed for parameter initialization"
     doc_set_davg_zero = "Set the normalization average to zero. This option should be set when `atom_ener` in the energy fitting is used"
@@ -277,10 +277,10 @@ def descrpt_se_r_args():
     doc_rcut = "The cut-off radius."
     doc_rcut_smth = "Where to start smoothing. For example the 1/r term is smoothed from `rcut` to `rcut_smth`"
     doc_neuron = "Number of neurons in each hidden layers of the embedding net. When two layers are of the same size or one layer is twice as large as the previous layer, a skip connection is built."
-    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_type_one_side = r"If true, the embedding network parameters vary by types of neighbor atoms only, so there will be $N_\text{types}$ sets of embedding network parameters. Otherwise, the embedding network parameters vary by types of centric atoms and types of neighbor atoms, so there will be $N_\text{types}^2$ sets of embedding network parameters."
-    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_trainable = "If the parameters in the embedding net are trainable"
     doc_seed = "Random seed for parameter initialization"
     doc_exclude_types = "The excluded pairs of types which have no interaction with each other. For example, `[[0, 1]]` means no interaction between type 0 and type 1."
@@ -342,10 +342,10 @@ def descrpt_se_atten_args():
     doc_rcut_smth = "Where to start smoothing. For example the 1/r term is smoothed from `rcut` to `rcut_smth`"
     doc_neuron = "Number of neurons in each hidden layers of the embedding net. When two layers are of the same size or one layer is twice as large as the previous layer, a skip connection is built."
     doc_axis_neuron = "Size of the submatrix of G (embedding matrix)."
-    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_type_one_side = r"If true, the embedding network parameters vary by types of neighbor atoms only, so there will be $N_\text{types}$ sets of embedding network parameters. Otherwise, the embedding network parameters vary by types of centric atoms and types of neighbor atoms, so there will be $N_\text{types}^2$ sets of embedding network parameters."
-    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_trainable = "If the parameters in the embedding net is trainable"
     doc_seed = "Random seed for parameter initialization"
     doc_set_davg_zero = "Set the normalization average to zero. This option should be set when `se_atten` descriptor or `atom_ener` in the energy fitting is used"
@@ -403,11 +403,11 @@ def descrpt_se_a_mask_args():
 
     doc_neuron = "Number of neurons in each hidden layers of the embedding net. When two layers are of the same size or one layer is twice as large as the previous layer, a skip connection is built."
     doc_axis_neuron = "Size of the submatrix of G (embedding matrix)."
-    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the embedding net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_type_one_side = r"If true, the embedding network parameters vary by types of neighbor atoms only, so there will be $N_\text{types}$ sets of embedding network parameters. Otherwise, the embedding network parameters vary by types of centric atoms and types of neighbor atoms, so there will be $N_\text{types}^2$ sets of embedding network parameters."
     doc_exclude_types = "The excluded pairs of types which have no interaction with each other. For example, `[[0, 1]]` means no interaction between type 0 and type 1."
-    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the embedding net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_trainable = "If the parameters in the embedding net is trainable"
     doc_seed = "Random seed for parameter initialization"
 
@@ -472,8 +472,8 @@ def fitting_ener():
     doc_numb_fparam = "The dimension of the frame parameter. If set to >0, file `fparam.npy` should be included to provided the input fparams."
     doc_numb_aparam = "The dimension of the atomic parameter. If set to >0, file `aparam.npy` should be included to provided the input aparams."
     doc_neuron = "The number of neurons in each hidden layers of the fitting net. When two hidden layers are of the same size, a skip connection is built."
-    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
-    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_trainable = "Whether the parameters in the fitting net are trainable. This option can be\n\n\
 - bool: True if all parameters of the fitting net are trainable, False otherwise.\n\n\
@@ -535,8 +535,8 @@ def fitting_dos():
     doc_numb_fparam = "The dimension of the frame parameter. If set to >0, file `fparam.npy` should be included to provided the input fparams."
     doc_numb_aparam = "The dimension of the atomic parameter. If set to >0, file `aparam.npy` should be included to provided the input aparams."
     doc_neuron = "The number of neurons in each hidden layers of the fitting net. When two hidden layers are of the same size, a skip connection is built."
-    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
-    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
     doc_trainable = "Whether the parameters in the fitting net are trainable. This option can be\n\n\
 - bool: True if all parameters of the fitting net are trainable, False otherwise.\n\n\
@@ -573,9 +573,9 @@ def fitting_dos():
 
 def fitting_polar():
     doc_neuron = "The number of neurons in each hidden layers of the fitting net. When two hidden layers are of the same size, a skip connection is built."
-    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
-    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_scale = "The output of the fitting net (polarizability matrix) will be scaled by ``scale``"
     # doc_diag_shift = 'The diagonal part of the polarizability matrix  will be shifted by ``diag_shift``. The shift operation is carried out after ``scale``.'
     doc_fit_diag = "Fit the diagonal part of the rotational invariant polarizability matrix, which will be converted to normal polarizability matrix by contracting with the rotation matrix."
@@ -624,9 +624,9 @@ def fitting_polar():
 
 def fitting_dipole():
     doc_neuron = "The number of neurons in each hidden layers of the fitting net. When two hidden layers are of the same size, a skip connection is built."
-    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(ACTIVATION_FN_DICT.keys())} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
+    doc_activation_function = f'The activation function in the fitting net. Supported activation functions are {list_to_doc(VALID_ACTIVATION)} Note that "gelu" denotes the custom operator version, and "gelu_tf" denotes the TF standard version. If you set "None" or "none" here, no activation function will be used.'
     doc_resnet_dt = 'Whether to use a "Timestep" in the skip connection'
-    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(PRECISION_DICT.keys())} Default follows the interface precision."
+    doc_precision = f"The precision of the fitting net parameters, supported options are {list_to_doc(VALID_PRECISION)} Default follows the interface precision."
     doc_sel_type = "The atom types for which the atomic dipole will be provided. If not set, all types will be selected."
     doc_seed = "Random seed for parameter initialization of the fitting net"
     return [
@@ -687,6 +687,10 @@ def modifier_dipole_charge():
     doc_sys_charge_map = f"The charge of real atoms. The list length should be the same as the {make_link('type_map', 'model/type_map')}"
     doc_ewald_h = "The grid spacing of the FFT grid. Unit is A"
     doc_ewald_beta = f"The splitting parameter of Ewald sum. Unit is A^{-1}"
+    doc_ewald_method = "The method to compute the reciprocal part of Ewald sum of the training data. `direct`: the direct sum over the reciprocal vectors, whose cost grows as the number of atoms times the number of reciprocal vectors. `pme`: the smooth particle-mesh Ewald method, which sums the same reciprocal vectors by FFT and scales as O(N log N). It is recommended for large systems. The frozen model always uses the direct sum."
+    doc_pme_order = "The order of the B-spline interpolation of the `pme` method. A higher order is more accurate and more expensive."
+    doc_pme_oversampling = "The ratio of the number of mesh points of the `pme` method to the number of reciprocal vectors along each direction. A larger ratio is more accurate and more expensive."
+    doc_correction_cache = "The directory to cache the corrections of energy, force and virial of each training and validation set. The corrections of a set are computed only once and reused in the later epochs and trainings, as long as the dipole model, the charge maps, the Ewald parameters and the coordinates, cells and types of the set are unchanged. If not set, the corrections are computed every time a set is loaded."
 
     return [
         Argument("model_name", str, optional=False, doc=doc_model_name),
@@ -694,6 +698,28 @@ def modifier_dipole_charge():
         Argument("sys_charge_map", list, optional=False, doc=doc_sys_charge_map),
         Argument("ewald_beta", float, optional=True, default=0.4, doc=doc_ewald_beta),
         Argument("ewald_h", float, optional=True, default=1.0, doc=doc_ewald_h),
+        Argument(
+            "correction_cache",
+            str,
+            optional=True,
+            default=None,
+            doc=doc_correction_cache,
+        ),
+        Argument(
+            "ewald_method",
+            str,
+            optional=True,
+            default="direct",
+            doc=doc_ewald_method,
+        ),
+        Argument("pme_order", int, optional=True, default=8, doc=doc_pme_order),
+        Argument(
+            "pme_oversampling",
+            float,
+            optional=True,
+            default=2.0,
+            doc=doc_pme_oversampling,
+        ),
     ]
 
 
@@ -742,6 +768,7 @@ def model_args():
     doc_type_map = "A list of strings. Give the name to each type of atoms. It is noted that the number of atom type of training system must be less than 128 in a GPU environment. If not given, type.raw in each system should use the same type indexes, and type_map.raw will take no effect."
     doc_data_stat_nbatch = "The model determines the normalization from the statistics of the data. This key specifies the number of `frames` in each `system` used for statistics."
     doc_data_stat_protect = "Protect parameter for atomic energy regression."
+    doc_data_stat_cache = "The directory to cache the data statistics of each system. The statistics of a system are reused as long as the descriptor type, the cutoff radii, the selection, the type map, `data_stat_nbatch`, the batch size and the data files of the system are unchanged, so changing the list of systems only computes the statistics of the new systems. Note that the frames used for the statistics of the cached systems are not drawn again, which changes the random stream of the training. Only supported by the energy model with a non-hybrid descriptor."
     doc_data_bias_nsample = "The number of training samples in a system to compute and change the energy bias."
     doc_type_embedding = "The type embedding."
     doc_descrpt = "The descriptor of atomic environment."
@@ -774,6 +801,12 @@ def model_args():
                 default=1e-2,
                 doc=doc_data_stat_protect,
             ),
+            Argument(
+                "data_stat_cache",
+                str,
+                optional=True,
+                doc=doc_data_stat_cache,
+            ),
             Argument(
                 "data_bias_nsample",
                 int,
@@ -1256,6 +1289,17 @@ def training_data_args():  # ! added by Ziyao: new specification style for data
         "Should be of the same length as `systems`, "
         "specifying the probability of each system."
     )
+    doc_memmap = (
+        "Memory-map the `*.npy` files of the sets instead of reading whole sets into memory. "
+        "Only the frames gathered into a batch are read from disk, so the memory usage scales "
+        "with the batch size rather than the size of the sets. The datasets of HDF5 systems are read in the same lazy way."
+    )
+    doc_shard = (
+        "In parallel training, split the training frames of each system into contiguous blocks of nearly equal sizes, one for each rank. "
+        "Each rank only loads and samples the frames in its block, so the ranks do not load the same sets or train on the same frames. "
+        "The probabilities of the systems are derived from the sizes of the whole systems, so they are the same on all the ranks as without sharding. "
+        "A system with fewer frames than ranks is used by every rank."
+    )
 
     args = [
         Argument("systems", [list, str], optional=False, default=".", doc=doc_systems),
@@ -1285,6 +1329,8 @@ def training_data_args():  # ! added by Ziyao: new specification style for data
             doc=doc_sys_probs,
             alias=["sys_weights"],
         ),
+        Argument("memmap", bool, optional=True, default=False, doc=doc_memmap),
+        Argument("shard", bool, optional=True, default=False, doc=doc_shard),
     ]
 
     doc_training_data = "Configurations of training data."
@@ -1320,6 +1366,8 @@ def validation_data_args():  # ! added by Ziyao: new specification style for dat
         "Should be of the same length as `systems`, "
         "specifying the probability of each system."
     )
+    link_memmap = make_link("memmap", "training/training_data/memmap")
+    doc_memmap = f"Memory-map the validation sets in the same way as the training data (see {link_memmap}), so that only the frames of each validation batch are read from disk."
     doc_numb_btch = "An integer that specifies the number of batches to be sampled for each validation period."
 
     args = [
@@ -1350,6 +1398,7 @@ def validation_data_args():  # ! added by Ziyao: new specification style for dat
             doc=doc_sys_probs,
             alias=["sys_weights"],
         ),
+        Argument("memmap", bool, optional=True, default=False, doc=doc_memmap),
         Argument(
             "numb_btch",
             int,
@@ -1412,14 +1461,57 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
     doc_disp_freq = "The frequency of printing learning curve."
     doc_save_freq = "The frequency of saving check point."
     doc_save_ckpt = "The file name of saving check point."
+    doc_max_ckpt_keep = "The maximum number of checkpoints to keep. The oldest checkpoints will be deleted once the number of checkpoints exceeds max_ckpt_keep."
+    doc_async_ckpt = (
+        "Write the checkpoints on a background thread. "
+        "The variables are copied in memory at the saving step, and the training continues while the copy is written to the disk. "
+        "The copy keeps another set of the variables in the device memory. "
+        "The last checkpoint is always completely written before the training ends."
+    )
+    doc_async_valid = (
+        "Validate the model on a background thread. "
+        "At every `disp_freq` steps, the variables are copied into a separate session, "
+        "which loads and evaluates the validation batches and writes the learning curve with the step they belong to, while the training continues. "
+        "The separate session keeps another copy of the variables in the device memory. "
+        "The order of the batches is not reproducible with a given `seed` when the validation is asynchronous."
+    )
     doc_disp_training = "Displaying verbose information during training."
     doc_time_training = "Timing durining training."
+    doc_phase_timing = (
+        "Time the phases of each training step, i.e. loading the batch, making the feed dict, "
+        "running the step, the validation and the checkpointing, as well as the data prefetching and "
+        "the writing on the background threads. The percentiles of the durations are printed with the timing information."
+    )
+    doc_phase_timing_window = (
+        "The number of recent durations of each phase used for the percentiles."
+    )
+    doc_phase_timing_file = (
+        "The file to export the timed phases. If the name ends with `.jsonl`, each phase is written as a line of JSON; "
+        "otherwise, the file is in the Chrome trace event format, which can be opened by `chrome://tracing` or Perfetto. "
+        "In parallel training, the rank is inserted before the extension."
+    )
+    doc_metrics_file = (
+        "The file to write the throughput of the training as lines of JSON, "
+        "including the steps, frames and atoms per second, the fraction of the time spent in loading or waiting for the data, "
+        "and the peak memory of the host and the device. "
+        "In multi-task mode, the throughput of each fitting net is also given. "
+        "In parallel training, the rank is inserted before the extension. The file is appended to when the training is restarted. If not set, the throughput is not written."
+    )
+    doc_metrics_freq = "The frequency of writing the throughput to `metrics_file`. Set in the unit of training steps."
     doc_profiling = "Profiling during training."
     doc_profiling_file = "Output file for profiling."
     doc_enable_profiler = "Enable TensorFlow Profiler (available in TensorFlow 2.3) to analyze performance. The log will be saved to `tensorboard_log_dir`."
     doc_tensorboard = "Enable tensorboard"
     doc_tensorboard_log_dir = "The log directory of tensorboard outputs"
     doc_tensorboard_freq = "The frequency of writing tensorboard events."
+    doc_prefetch_depth = (
+        "The maximum number of training batches prefetched by background threads. "
+        "The threads load and shuffle the sets, apply the data modifier and assemble the batches "
+        "while the model is being trained. If 0, each batch is loaded by the training data OP one step ahead. "
+        "The number of times the training waited for an empty queue is reported along with the timing information. "
+        "The order of the batches is not reproducible with a given `seed` when the prefetching is enabled."
+    )
+    doc_prefetch_workers = "The number of background threads prefetching training batches. Only used when `prefetch_depth` is positive."
     doc_data_dict = (
         "The dictionary of multi DataSystems in multi-task mode. "
         "Each data_dict[fitting_key], with user-defined name `fitting_key` in `model/fitting_net_dict`, "
@@ -1453,12 +1545,42 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
         Argument(
             "save_ckpt", str, optional=True, default="model.ckpt", doc=doc_save_ckpt
         ),
+        Argument("max_ckpt_keep", int, optional=True, default=5, doc=doc_max_ckpt_keep),
+        Argument("async_ckpt", bool, optional=True, default=False, doc=doc_async_ckpt),
+        Argument(
+            "async_valid", bool, optional=True, default=False, doc=doc_async_valid
+        ),
         Argument(
             "disp_training", bool, optional=True, default=True, doc=doc_disp_training
         ),
         Argument(
             "time_training", bool, optional=True, default=True, doc=doc_time_training
         ),
+        Argument(
+            "phase_timing", bool, optional=True, default=False, doc=doc_phase_timing
+        ),
+        Argument(
+            "phase_timing_window",
+            int,
+            optional=True,
+            default=1000,
+            doc=doc_phase_timing_window,
+        ),
+        Argument(
+            "phase_timing_file",
+            [str, None],
+            optional=True,
+            default=None,
+            doc=doc_phase_timing_file,
+        ),
+        Argument(
+            "metrics_file",
+            [str, None],
+            optional=True,
+            default=None,
+            doc=doc_metrics_file,
+        ),
+        Argument("metrics_freq", int, optional=True, default=100, doc=doc_metrics_freq),
         Argument("profiling", bool, optional=True, default=False, doc=doc_profiling),
         Argument(
             "profiling_file",
@@ -1487,6 +1609,12 @@ def training_args():  # ! modified by Ziyao: data configuration isolated.
         Argument(
             "tensorboard_freq", int, optional=True, default=1, doc=doc_tensorboard_freq
         ),
+        Argument(
+            "prefetch_depth", int, optional=True, default=0, doc=doc_prefetch_depth
+        ),
+        Argument(
+            "prefetch_workers", int, optional=True, default=1, doc=doc_prefetch_workers
+        ),
         Argument("data_dict", dict, optional=True, doc=doc_data_dict),
         Argument("fitting_weight", dict, optional=True, doc=doc_fitting_weight),
     ]
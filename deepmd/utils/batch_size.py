@@ -1,13 +1,18 @@
+import hashlib
+import json
 import logging
 import os
+import sys
 from typing import (
     Callable,
+    Optional,
     Tuple,
 )
 
 import numpy as np
 
 from deepmd.env import (
+    GLOBAL_NP_FLOAT_PRECISION,
     tf,
 )
 from deepmd.utils.errors import (
@@ -29,6 +34,21 @@ class AutoBatchSize:
 
     In other cases, we assume all OOM error will raise :class:`OutOfMemoryError`.
 
+    If `memory_aware` is set, or the environment variable
+    `DP_INFER_BATCH_SIZE_MEMORY_AWARE` is set to 1, the batch size on CPUs is
+    allowed to increase up to an estimate from the available memory, where the
+    memory used per atom is estimated from the growth of the peak resident
+    memory of the process. The estimate is rough: the peak never decreases and
+    includes all the memory of the process, so the memory reused by the
+    allocator is not seen. As the process may still be killed when it runs out
+    of memory, it is disabled by default.
+
+    The learned batch sizes can be saved to and loaded from a profile on the
+    disk by :meth:`load_profile`, so that later runs of the same model on the
+    same device start with the known working batch size. The profile is only
+    used when its path is given by the environment variable
+    `DP_INFER_BATCH_SIZE_PROFILE`.
+
     Parameters
     ----------
     initial_batch_size : int, default: 1024
@@ -36,6 +56,12 @@ class AutoBatchSize:
         is not set
     factor : float, default: 2.
         increased factor
+    memory_aware : bool, default: False
+        whether to estimate the maximum batch size on CPUs from the available
+        memory; also enabled by the environment variable
+        `DP_INFER_BATCH_SIZE_MEMORY_AWARE`
+    memory_fraction : float, default: 0.5
+        the fraction of the available memory that the estimated batch size uses
 
     Attributes
     ----------
@@ -45,14 +71,34 @@ class AutoBatchSize:
         maximum working batch size
     minimal_not_working_batch_size : int
         minimal not working batch size
+    memory_limit_batch_size : int or None
+        maximum batch size estimated from the available memory
     """
 
-    def __init__(self, initial_batch_size: int = 1024, factor: float = 2.0) -> None:
+    def __init__(
+        self,
+        initial_batch_size: int = 1024,
+        factor: float = 2.0,
+        memory_aware: bool = False,
+        memory_fraction: float = 0.5,
+    ) -> None:
         # See also PyTorchLightning/pytorch-lightning#1638
         # TODO: discuss a proper initial batch size
         self.current_batch_size = initial_batch_size
+        self.profile_path = None
+        self.profile_key = None
+        self._saved_profile = None
+        self.memory_aware = False
+        self.memory_fraction = memory_fraction
+        self.memory_per_atom = None
+        self.memory_limit_batch_size = None
+        self._base_peak_memory = None
         DP_INFER_BATCH_SIZE = int(os.environ.get("DP_INFER_BATCH_SIZE", 0))
-        if DP_INFER_BATCH_SIZE > 0:
+        memory_aware = memory_aware or bool(
+            int(os.environ.get("DP_INFER_BATCH_SIZE_MEMORY_AWARE", 0))
+        )
+        self.fixed = DP_INFER_BATCH_SIZE > 0
+        if self.fixed:
             self.current_batch_size = DP_INFER_BATCH_SIZE
             self.maximum_working_batch_size = DP_INFER_BATCH_SIZE
             self.minimal_not_working_batch_size = self.maximum_working_batch_size + 1
@@ -61,9 +107,14 @@ class AutoBatchSize:
             if tf.test.is_gpu_available():
                 self.minimal_not_working_batch_size = 2**31
             else:
-                self.minimal_not_working_batch_size = (
-                    self.maximum_working_batch_size + 1
-                )
+                if memory_aware and get_peak_memory() is not None:
+                    # limited by the estimate from the available memory instead
+                    self.memory_aware = True
+                    self.minimal_not_working_batch_size = 2**31
+                else:
+                    self.minimal_not_working_batch_size = (
+                        self.maximum_working_batch_size + 1
+                    )
                 log.warning(
                     "You can use the environment variable DP_INFER_BATCH_SIZE to"
                     "control the inference batch size (nframes * natoms). "
@@ -99,6 +150,8 @@ class AutoBatchSize:
         OutOfMemoryError
             OOM when batch size is 1
         """
+        if self.memory_aware and self._base_peak_memory is None:
+            self._base_peak_memory = get_peak_memory()
         try:
             n_batch, result = callable(
                 max(self.current_batch_size // natoms, 1), start_index
@@ -119,21 +172,111 @@ class AutoBatchSize:
                 ) from e
             # adjust the next batch size
             self._adjust_batch_size(1.0 / self.factor)
+            self._save_profile()
             return 0, None
         else:
             n_tot = n_batch * natoms
             self.maximum_working_batch_size = max(
                 self.maximum_working_batch_size, n_tot
             )
+            if self.memory_aware:
+                self._estimate_memory_limit(n_tot)
             # adjust the next batch size
             if (
                 n_tot + natoms > self.current_batch_size
                 and self.current_batch_size * self.factor
                 < self.minimal_not_working_batch_size
+                and (
+                    not self.memory_aware
+                    or self.memory_limit_batch_size is not None
+                    and self.current_batch_size * self.factor
+                    < self.memory_limit_batch_size
+                )
             ):
                 self._adjust_batch_size(self.factor)
+            self._save_profile()
             return n_batch, result
 
+    def _estimate_memory_limit(self, n_tot: int) -> None:
+        """Estimate the maximum batch size from the available memory.
+
+        Parameters
+        ----------
+        n_tot : int
+            the number of atoms in the last executed batch
+        """
+        peak_memory = get_peak_memory()
+        available_memory = _get_available_memory()
+        if peak_memory is None or available_memory is None:
+            return
+        if peak_memory > self._base_peak_memory:
+            # the overhead of the first run is included, so it is overestimated
+            self.memory_per_atom = (peak_memory - self._base_peak_memory) / n_tot
+        if self.memory_per_atom is None:
+            return
+        self.memory_limit_batch_size = n_tot + int(
+            self.memory_fraction * available_memory / self.memory_per_atom
+        )
+
+    def load_profile(self, key: str, path: Optional[str] = None) -> None:
+        """Load the batch sizes learned in previous runs and save the new ones.
+
+        The profile is not used if the batch size is given by the environment
+        variable `DP_INFER_BATCH_SIZE`, or a profile has already been loaded.
+
+        Parameters
+        ----------
+        key : str
+            the key of the batch sizes in the profile, e.g. given by
+            :func:`get_profile_key`
+        path : str, optional
+            the path of the profile; the default is given by the environment
+            variable `DP_INFER_BATCH_SIZE_PROFILE`
+        """
+        if path is None:
+            path = get_profile_path()
+        if not path or self.fixed or self.profile_key is not None:
+            return
+        self.profile_path = path
+        self.profile_key = key
+        profile = _read_profile(path).get(key)
+        if profile is None:
+            return
+        self.maximum_working_batch_size = profile["maximum_working_batch_size"]
+        self.minimal_not_working_batch_size = profile["minimal_not_working_batch_size"]
+        self.current_batch_size = self.maximum_working_batch_size
+        self._saved_profile = profile
+        log.info(
+            "Load batch size %d from the profile %s"
+            % (self.current_batch_size, self.profile_path)
+        )
+
+    def _save_profile(self) -> None:
+        """Save the learned batch sizes to the profile if they are changed."""
+        if self.profile_key is None:
+            return
+        profile = {
+            "maximum_working_batch_size": self.maximum_working_batch_size,
+            "minimal_not_working_batch_size": self.minimal_not_working_batch_size,
+        }
+        if profile == self._saved_profile:
+            return
+        self._saved_profile = profile
+        profiles = _read_profile(self.profile_path)
+        profiles[self.profile_key] = profile
+        # write to a temporary file and rename it, so that concurrent
+        # processes never read a partially written profile
+        tmp_path = f"{self.profile_path}.{os.getpid()}"
+        try:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(self.profile_path)), exist_ok=True
+            )
+            with open(tmp_path, "w") as f:
+                json.dump(profiles, f, indent=2)
+            os.replace(tmp_path, self.profile_path)
+        except OSError as e:
+            log.debug(f"cannot write the batch size profile {self.profile_path}: {e}")
+
     def _adjust_batch_size(self, factor: float):
         old_batch_size = self.current_batch_size
         self.current_batch_size = int(self.current_batch_size * factor)
@@ -202,3 +345,89 @@ class AutoBatchSize:
             # avoid returning tuple if callable doesn't return tuple
             r = r[0]
         return r
+
+
+def get_profile_path() -> str:
+    """Get the path of the batch size profile.
+
+    Returns
+    -------
+    str
+        the path given by the environment variable `DP_INFER_BATCH_SIZE_PROFILE`;
+        an empty string, the default, means that the profile is disabled
+    """
+    return os.environ.get("DP_INFER_BATCH_SIZE_PROFILE", "")
+
+
+def get_profile_key(model_file: str) -> str:
+    """Get the key of the batch sizes of a model in the profile.
+
+    Parameters
+    ----------
+    model_file : str
+        the model file
+
+    Returns
+    -------
+    str
+        the key made of the hash of the model file, the device and the precision
+    """
+    sha = hashlib.sha256()
+    with open(model_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return ":".join(
+        [sha.hexdigest(), _get_device_name(), np.dtype(GLOBAL_NP_FLOAT_PRECISION).name]
+    )
+
+
+def _get_device_name() -> str:
+    """Get the name of the device used for inference."""
+    try:
+        gpus = tf.config.experimental.list_physical_devices("GPU")
+    except AttributeError:
+        gpus = []
+    if not gpus:
+        return "cpu"
+    names = []
+    for gpu in gpus:
+        try:
+            details = tf.config.experimental.get_device_details(gpu)
+        except AttributeError:
+            details = {}
+        names.append(details.get("device_name", gpu.name))
+    return ",".join(names)
+
+
+def _read_profile(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_peak_memory() -> Optional[int]:
+    """Get the peak resident memory (bytes) of this process."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, while bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _get_available_memory() -> Optional[int]:
+    """Get the available memory (bytes) of the system."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
@@ -2,8 +2,10 @@
 
 import logging
 from typing import (
+    Iterator,
     List,
     Optional,
+    Tuple,
 )
 
 import numpy as np
@@ -13,6 +15,9 @@ from deepmd.env import (
     GLOBAL_NP_FLOAT_PRECISION,
 )
 from deepmd.utils import random as dp_random
+from deepmd.utils.data_index import (
+    DataSystemIndex,
+)
 from deepmd.utils.path import (
     DPPath,
 )
@@ -41,6 +46,18 @@ class DeepmdData:
             Data modifier that has the method `modify_data`
     trn_all_set
             Use all sets as training dataset. Otherwise, if the number of sets is more than 1, the last set is left for test.
+    memmap
+            Memory-map the `*.npy` files of the sets instead of reading them into memory.
+            Only the gathered frames are read from disk and converted, so the resident
+            memory scales with the batch size rather than the set size.
+            The datasets of HDF5 systems are sliced lazily in the same way.
+    shard
+            The index of the shard and the number of shards, e.g. the rank and the
+            number of ranks in parallel training. The frames of the training sets
+            are split into contiguous blocks of nearly equal sizes, and only the
+            block of this shard is used for training, so the sets out of the block
+            are never loaded. If the system has fewer frames than shards, all frames
+            are used by every shard.
     """
 
     def __init__(
@@ -52,9 +69,12 @@ class DeepmdData:
         optional_type_map: bool = True,
         modifier=None,
         trn_all_set: bool = False,
+        memmap: bool = False,
+        shard: Optional[Tuple[int, int]] = None,
     ):
         """Constructor."""
         root = DPPath(sys_path)
+        self.set_prefix = set_prefix
         self.dirs = root.glob(set_prefix + ".*")
         if not len(self.dirs):
             raise FileNotFoundError(f"No {set_prefix}.* is found in {sys_path}")
@@ -102,6 +122,8 @@ class DeepmdData:
             raise RuntimeError("mixed_type format must have type_map!")
         # make idx map
         self.idx_map = self._make_idx_map(self.atom_type)
+        # frame counts and array shapes of all sets, read from the array headers
+        self.index = DataSystemIndex(root, self.dirs)
         # train dirs
         self.test_dir = self.dirs[-1]
         if trn_all_set:
@@ -111,6 +133,12 @@ class DeepmdData:
                 self.train_dirs = self.dirs
             else:
                 self.train_dirs = self.dirs[:-1]
+        # the training sets of all the shards, and the range of the frames
+        # used by this shard in each partially used set
+        self.all_train_dirs = self.train_dirs
+        self.shard_ranges = {}
+        if shard is not None:
+            self._make_shard(*shard)
         self.data_dict = {}
         # add box and coord
         self.add("box", 9, must=self.pbc)
@@ -123,6 +151,7 @@ class DeepmdData:
         self.shuffle_test = shuffle_test
         # set modifier
         self.modifier = modifier
+        self.memmap = memmap
 
     def add(
         self,
@@ -210,36 +239,16 @@ class DeepmdData:
     def check_batch_size(self, batch_size):
         """Check if the system can get a batch of data with `batch_size` frames."""
         for ii in self.train_dirs:
-            if self.data_dict["coord"]["high_prec"]:
-                tmpe = (
-                    (ii / "coord.npy").load_numpy().astype(GLOBAL_ENER_FLOAT_PRECISION)
-                )
-            else:
-                tmpe = (ii / "coord.npy").load_numpy().astype(GLOBAL_NP_FLOAT_PRECISION)
-            if tmpe.ndim == 1:
-                tmpe = tmpe.reshape([1, -1])
-            if tmpe.shape[0] < batch_size:
-                return ii, tmpe.shape[0]
+            nframes = self._get_train_nframes(ii)
+            if nframes < batch_size:
+                return ii, nframes
         return None
 
     def check_test_size(self, test_size):
         """Check if the system can get a test dataset with `test_size` frames."""
-        if self.data_dict["coord"]["high_prec"]:
-            tmpe = (
-                (self.test_dir / "coord.npy")
-                .load_numpy()
-                .astype(GLOBAL_ENER_FLOAT_PRECISION)
-            )
-        else:
-            tmpe = (
-                (self.test_dir / "coord.npy")
-                .load_numpy()
-                .astype(GLOBAL_NP_FLOAT_PRECISION)
-            )
-        if tmpe.ndim == 1:
-            tmpe = tmpe.reshape([1, -1])
-        if tmpe.shape[0] < test_size:
-            return self.test_dir, tmpe.shape[0]
+        nframes = self.index.get_nframes(self.test_dir)
+        if nframes < test_size:
+            return self.test_dir, nframes
         else:
             return None
 
@@ -259,16 +268,32 @@ class DeepmdData:
             self._load_batch_set(self.train_dirs[self.set_count % self.get_numb_set()])
             self.set_count += 1
             set_size = self.batch_set["coord"].shape[0]
-            if self.modifier is not None:
-                self.modifier.modify_data(self.batch_set, self)
         iterator_1 = self.iterator + batch_size
         if iterator_1 >= set_size:
             iterator_1 = set_size
         idx = np.arange(self.iterator, iterator_1)
         self.iterator += batch_size
         ret = self._get_subdata(self.batch_set, idx)
+        if self.modifier is not None and self.memmap:
+            # the mapped set is never materialized, so the gathered frames are
+            # modified by the corrections computed once for the whole set
+            self.modifier.modify_data(
+                ret,
+                self,
+                set_name=self.batch_set_name,
+                frame_idx=self._get_frame_idx(self.batch_set, idx),
+            )
         return ret
 
+    def load_test(self) -> None:
+        """Load (and shuffle) the test set if it has not been loaded.
+
+        The test set is otherwise loaded on the first request of test data.
+        The data items should be added before.
+        """
+        if not hasattr(self, "test_set"):
+            self._load_test_set(self.test_dir, self.shuffle_test)
+
     def get_test(self, ntests: int = -1) -> dict:
         """Get the test data with `ntests` frames.
 
@@ -277,8 +302,7 @@ class DeepmdData:
         ntests
             Size of the test data set. If `ntests` is -1, all test data will be get.
         """
-        if not hasattr(self, "test_set"):
-            self._load_test_set(self.test_dir, self.shuffle_test)
+        self.load_test()
         if ntests == -1:
             idx = None
         else:
@@ -290,10 +314,79 @@ class DeepmdData:
             # print('ntest', self.test_set['type'].shape[0], ntests, ntests_)
             idx = np.arange(ntests_)
         ret = self._get_subdata(self.test_set, idx=idx)
-        if self.modifier is not None:
-            self.modifier.modify_data(ret, self)
+        if self.modifier is not None and self.memmap:
+            self.modifier.modify_data(
+                ret,
+                self,
+                set_name=self.test_dir,
+                frame_idx=self._get_frame_idx(self.test_set, idx),
+            )
         return ret
 
+    def iter_test(
+        self, chunk_size: Optional[int] = None, ntests: int = -1
+    ) -> Iterator[dict]:
+        """Iterate over the test data in chunks of `chunk_size` frames.
+
+        Only the frames of the current chunk are gathered, so together with
+        `memmap` the memory usage does not depend on the size of the test set.
+
+        Parameters
+        ----------
+        chunk_size
+            Number of frames in each chunk. If it is None, all the frames are
+            returned in a single chunk.
+        ntests
+            Number of frames to iterate over. If `ntests` is -1, all test data
+            will be iterated.
+        """
+        self.load_test()
+        nframes = self.test_set["type"].shape[0]
+        if ntests != -1:
+            nframes = min(ntests, nframes)
+        if chunk_size is None:
+            chunk_size = max(nframes, 1)
+        for start in range(0, nframes, chunk_size):
+            idx = np.arange(start, min(start + chunk_size, nframes))
+            ret = self._get_subdata(self.test_set, idx=idx)
+            if self.modifier is not None and self.memmap:
+                self.modifier.modify_data(
+                    ret,
+                    self,
+                    set_name=self.test_dir,
+                    frame_idx=self._get_frame_idx(self.test_set, idx),
+                )
+            yield ret
+
+    def iter_frames(
+        self, chunk_size: Optional[int] = None, start: int = 0
+    ) -> Iterator[dict]:
+        """Iterate over the frames of all sets in order, in chunks of `chunk_size` frames.
+
+        The chunks do not span sets and the frames are not shuffled or modified.
+        Together with `memmap`, only the frames of the current chunk are read.
+
+        Parameters
+        ----------
+        chunk_size
+            Maximal number of frames in each chunk. If None, each set is
+            given in one chunk
+        start
+            Number of frames to skip from the beginning of the first set.
+            The skipped sets are not loaded.
+        """
+        for set_name in self.dirs:
+            nframes = self.index.get_nframes(set_name)
+            if start >= nframes:
+                start -= nframes
+                continue
+            data = self._load_set(set_name)
+            step = chunk_size if chunk_size is not None else nframes - start
+            for ii in range(start, nframes, step):
+                idx = np.arange(ii, min(ii + step, nframes))
+                yield self._get_subdata(data, idx=idx)
+            start = 0
+
     def get_ntypes(self) -> int:
         """Number of atom types in the system."""
         if self.type_map is not None:
@@ -315,17 +408,20 @@ class DeepmdData:
 
     def get_numb_batch(self, batch_size: int, set_idx: int) -> int:
         """Get the number of batches in a set."""
-        data = self._load_set(self.train_dirs[set_idx])
-        ret = data["coord"].shape[0] // batch_size
+        ret = self._get_train_nframes(self.train_dirs[set_idx]) // batch_size
         if ret == 0:
             ret = 1
         return ret
 
     def get_sys_numb_batch(self, batch_size: int) -> int:
-        """Get the number of batches in the data system."""
+        """Get the number of batches in the data system.
+
+        The batches of all the shards are counted, so that the probabilities
+        of the systems derived from it do not depend on the sharding.
+        """
         ret = 0
-        for ii in range(len(self.train_dirs)):
-            ret += self.get_numb_batch(batch_size, ii)
+        for ii in self.all_train_dirs:
+            ret += max(self.index.get_nframes(ii) // batch_size, 1)
         return ret
 
     def get_natoms(self):
@@ -360,8 +456,8 @@ class DeepmdData:
         ndof = info["ndof"]
         eners = []
         for ii in self.train_dirs:
-            data = self._load_set(ii)
-            ei = data[key].reshape([-1, ndof])
+            data = self._load_train_set(ii)
+            ei = np.reshape(data[key], [-1, ndof])
             eners.append(ei)
         eners = np.concatenate(eners, axis=0)
         if eners.size == 0:
@@ -397,13 +493,63 @@ class DeepmdData:
             else:
                 if idx is not None:
                     new_data[ii] = dd[idx]
+                elif isinstance(dd, MappedFrames):
+                    new_data[ii] = dd[:]
                 else:
                     new_data[ii] = dd
         return new_data
 
+    def _get_frame_idx(self, data: dict, idx: Optional[np.ndarray]) -> np.ndarray:
+        """Get the indexes in the set of the frames `idx` of the mapped data."""
+        frame_idx = data["coord"].frame_idx
+        if frame_idx is None:
+            frame_idx = np.arange(data["coord"].array.shape[0])
+        if idx is None:
+            return frame_idx
+        return frame_idx[idx]
+
+    def _make_shard(self, rank: int, nproc: int):
+        """Keep the training sets and frames in the block of the shard `rank`."""
+        nframes = [self.index.get_nframes(ii) for ii in self.all_train_dirs]
+        total = sum(nframes)
+        if total < nproc:
+            # too few frames to be split
+            return
+        start = total * rank // nproc
+        end = total * (rank + 1) // nproc
+        train_dirs = []
+        offset = 0
+        for set_name, nn in zip(self.all_train_dirs, nframes):
+            set_start = max(start - offset, 0)
+            set_end = min(end - offset, nn)
+            if set_start < set_end:
+                train_dirs.append(set_name)
+                if set_end - set_start < nn:
+                    self.shard_ranges[set_name] = (set_start, set_end)
+            offset += nn
+        self.train_dirs = train_dirs
+
+    def _get_train_nframes(self, set_name: DPPath) -> int:
+        """Get the number of frames in a training set used by this shard."""
+        if set_name in self.shard_ranges:
+            set_start, set_end = self.shard_ranges[set_name]
+            return set_end - set_start
+        return self.index.get_nframes(set_name)
+
+    def _load_train_set(self, set_name: DPPath):
+        """Load the frames in a training set used by this shard."""
+        data = self._load_set(set_name)
+        if set_name in self.shard_ranges:
+            data = self._take_frames(data, np.arange(*self.shard_ranges[set_name]))
+        return data
+
     def _load_batch_set(self, set_name: DPPath):
         if not hasattr(self, "batch_set") or self.get_numb_set() > 1:
-            self.batch_set = self._load_set(set_name)
+            self.batch_set = self._load_train_set(set_name)
+            self.batch_set_name = set_name
+            if self.modifier is not None and not self.memmap:
+                # modify the whole set once, before it is shuffled
+                self.modifier.modify_data(self.batch_set, self, set_name=set_name)
         self.batch_set, _ = self._shuffle_data(self.batch_set)
         self.reset_get_batch()
 
@@ -412,16 +558,23 @@ class DeepmdData:
 
     def _load_test_set(self, set_name: DPPath, shuffle_test):
         self.test_set = self._load_set(set_name)
+        if self.modifier is not None and not self.memmap:
+            self.modifier.modify_data(self.test_set, self, set_name=set_name)
         if shuffle_test:
             self.test_set, _ = self._shuffle_data(self.test_set)
 
     def _shuffle_data(self, data):
-        ret = {}
         nframes = data["coord"].shape[0]
         idx = np.arange(nframes)
         # the training times of each frame
         idx = np.repeat(idx, np.reshape(data["numb_copy"], (nframes,)))
         dp_random.shuffle(idx)
+        return self._take_frames(data, idx), idx
+
+    def _take_frames(self, data: dict, idx: np.ndarray) -> dict:
+        """Take the frames `idx` of all the arrays of a set."""
+        ret = {}
+        nframes = data["coord"].shape[0]
         for kk in data:
             if (
                 type(data[kk]) == np.ndarray
@@ -430,23 +583,28 @@ class DeepmdData:
                 and "find_" not in kk
             ):
                 ret[kk] = data[kk][idx]
+            elif isinstance(data[kk], MappedFrames):
+                # only compose the frame indexes, nothing is read from disk
+                ret[kk] = data[kk].take(idx)
             else:
                 ret[kk] = data[kk]
-        return ret, idx
+        return ret
 
     def _load_set(self, set_name: DPPath):
         # get nframes
         if not isinstance(set_name, DPPath):
             set_name = DPPath(set_name)
         path = set_name / "coord.npy"
-        if self.data_dict["coord"]["high_prec"]:
+        if self.memmap:
+            coord = path.load_numpy(mmap=True)
+        elif self.data_dict["coord"]["high_prec"]:
             coord = path.load_numpy().astype(GLOBAL_ENER_FLOAT_PRECISION)
         else:
             coord = path.load_numpy().astype(GLOBAL_NP_FLOAT_PRECISION)
         if coord.ndim == 1:
             coord = coord.reshape([1, -1])
         nframes = coord.shape[0]
-        assert coord.shape[1] == self.data_dict["coord"]["ndof"] * self.natoms
+        assert coord.size == nframes * self.data_dict["coord"]["ndof"] * self.natoms
         # load keys
         data = {}
         for kk in self.data_dict.keys():
@@ -469,10 +627,13 @@ class DeepmdData:
                 k_in = self.data_dict[kk]["reduce"]
                 ndof = self.data_dict[kk]["ndof"]
                 data["find_" + kk] = data["find_" + k_in]
-                tmp_in = data[k_in].astype(GLOBAL_ENER_FLOAT_PRECISION)
-                data[kk] = np.sum(
-                    np.reshape(tmp_in, [nframes, self.natoms, ndof]), axis=1
-                )
+                if isinstance(data[k_in], MappedFrames):
+                    data[kk] = data[k_in].reduce_atoms()
+                else:
+                    tmp_in = data[k_in].astype(GLOBAL_ENER_FLOAT_PRECISION)
+                    data[kk] = np.sum(
+                        np.reshape(tmp_in, [nframes, self.natoms, ndof]), axis=1
+                    )
 
         if self.mixed_type:
             # nframes x natoms
@@ -511,6 +672,12 @@ class DeepmdData:
                 ),
                 axis=-1,
             )
+        elif self.memmap:
+            data["type"] = MappedFrames(
+                np.broadcast_to(self.atom_type[self.idx_map], (nframes, self.natoms)),
+                self.atom_type.dtype,
+                self.natoms,
+            )
         else:
             data["type"] = np.tile(self.atom_type[self.idx_map], (nframes, 1))
 
@@ -541,6 +708,8 @@ class DeepmdData:
                 idx_map = self._idx_map_sel(self.atom_type, type_sel)
             ndof = ndof_ * natoms
         else:
+            natoms = None
+            idx_map = None
             ndof = ndof_
         if dtype is not None:
             pass
@@ -549,7 +718,27 @@ class DeepmdData:
         else:
             dtype = GLOBAL_NP_FLOAT_PRECISION
         path = set_name / (key + ".npy")
-        if path.is_file():
+        explanation = "This error may occur when your label mismatch it's name, i.e. you might store global tensor in `atomic_tensor.npy` or atomic tensor in `tensor.npy`."
+        if path.is_file() and self.memmap:
+            data = path.load_numpy(mmap=True)
+            if data.size != nframes * ndof:
+                err_message = (
+                    "cannot reshape array of size {} into shape ({}, {})".format(
+                        data.size, nframes, ndof
+                    )
+                )
+                log.error(err_message)
+                log.error(explanation)
+                raise ValueError(err_message + ". " + explanation)
+            if isinstance(data, np.ndarray):
+                data = data.reshape([nframes, -1])
+            elif data.shape != (nframes, data.size // nframes):
+                # HDF5 datasets cannot be reshaped without reading them
+                data = np.reshape(data[()], [nframes, -1])
+            return np.float32(1.0), MappedFrames(
+                data, dtype, ndof, natoms=natoms, idx_map=idx_map, repeat=repeat
+            )
+        elif path.is_file():
             data = path.load_numpy().astype(dtype)
             try:  # YWolfeee: deal with data shape error
                 if atomic:
@@ -558,7 +747,6 @@ class DeepmdData:
                     data = data.reshape([nframes, -1])
                 data = np.reshape(data, [nframes, ndof])
             except ValueError as err_message:
-                explanation = "This error may occur when your label mismatch it's name, i.e. you might store global tensor in `atomic_tensor.npy` or atomic tensor in `tensor.npy`."
                 log.error(str(err_message))
                 log.error(explanation)
                 raise ValueError(str(err_message) + ". " + explanation)
@@ -567,6 +755,14 @@ class DeepmdData:
             return np.float32(1.0), data
         elif must:
             raise RuntimeError("%s not found!" % path)
+        elif self.memmap:
+            # a read-only view of one frame, which costs no memory for the set
+            data = np.broadcast_to(
+                np.full([ndof], default, dtype=dtype), [nframes, ndof]
+            )
+            return np.float32(0.0), MappedFrames(
+                data, dtype, ndof, natoms=natoms, idx_map=idx_map, repeat=repeat
+            )
         else:
             data = np.full([nframes, ndof], default, dtype=dtype)
             if repeat != 1:
@@ -603,3 +799,149 @@ class DeepmdData:
 
     def _check_mode(self, set_path: DPPath):
         return (set_path / "real_atom_types.npy").is_file()
+
+
+class MappedFrames:
+    """Frames of a data item that are read from a memory-mapped array on demand.
+
+    Indexing an instance with the indexes of frames reads only these frames,
+    converts them to `dtype`, reorders the atoms and repeats the data in the
+    same way as :meth:`DeepmdData._load_data` does for a whole set.
+
+    Parameters
+    ----------
+    array
+        The raw array in the shape of nframes x ndof_raw, usually a memory-mapped view
+        or an HDF5 dataset
+    dtype
+        The dtype of the gathered data
+    ndof
+        The number of dof of each frame, before repeating
+    natoms
+        The number of atoms if the item is an atomic property
+    idx_map
+        The map applied to the atoms of the gathered frames
+    repeat
+        The data will be repeated `repeat` times
+    frame_idx
+        The indexes of the frames in `array`, e.g. after shuffling.
+        If None, the frames are taken in order.
+    reduce
+        Sum the atomic property over atoms and return the data in high precision
+    """
+
+    def __init__(
+        self,
+        array: np.ndarray,
+        dtype: np.dtype,
+        ndof: int,
+        natoms: Optional[int] = None,
+        idx_map: Optional[np.ndarray] = None,
+        repeat: int = 1,
+        frame_idx: Optional[np.ndarray] = None,
+        reduce: bool = False,
+    ):
+        self.array = array
+        self.base_dtype = dtype
+        self.ndof = ndof
+        self.natoms = natoms
+        self.idx_map = idx_map
+        self.repeat = repeat
+        self.frame_idx = frame_idx
+        self.reduce = reduce
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The dtype of the gathered data."""
+        if self.reduce:
+            return np.dtype(GLOBAL_ENER_FLOAT_PRECISION)
+        return np.dtype(self.base_dtype)
+
+    @property
+    def shape(self) -> tuple:
+        """The shape of the data if all frames are gathered."""
+        if self.frame_idx is None:
+            nframes = self.array.shape[0]
+        else:
+            nframes = self.frame_idx.shape[0]
+        if self.reduce:
+            return (nframes, self.ndof // self.natoms)
+        return (nframes, self.ndof * self.repeat)
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    def take(self, idx: np.ndarray) -> "MappedFrames":
+        """Select frames without reading them.
+
+        Parameters
+        ----------
+        idx
+            The indexes of the frames
+
+        Returns
+        -------
+        MappedFrames
+            The selected frames
+        """
+        if self.frame_idx is not None:
+            idx = self.frame_idx[idx]
+        return MappedFrames(
+            self.array,
+            self.base_dtype,
+            self.ndof,
+            natoms=self.natoms,
+            idx_map=self.idx_map,
+            repeat=self.repeat,
+            frame_idx=idx,
+            reduce=self.reduce,
+        )
+
+    def reduce_atoms(self) -> "MappedFrames":
+        """Generate the item reduced over atoms from this atomic item."""
+        assert self.natoms is not None, "reduced property should be atomic"
+        assert self.repeat == 1, "reduced proerties should not have been repeated"
+        return MappedFrames(
+            self.array,
+            self.base_dtype,
+            self.ndof,
+            natoms=self.natoms,
+            idx_map=self.idx_map,
+            frame_idx=self.frame_idx,
+            reduce=True,
+        )
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, idx) -> np.ndarray:
+        """Read the frames with the indexes `idx` from disk."""
+        if self.frame_idx is not None:
+            idx = self.frame_idx[idx]
+        elif isinstance(idx, slice):
+            idx = np.arange(*idx.indices(self.array.shape[0]))
+        if isinstance(self.array, np.ndarray):
+            # np.array makes an in-memory copy of the gathered rows only
+            data = np.array(self.array[idx], dtype=self.base_dtype)
+        else:
+            # HDF5 datasets can only be indexed by increasing indexes
+            uniq_idx, inv_idx = np.unique(idx, return_inverse=True)
+            data = np.array(self.array[uniq_idx], dtype=self.base_dtype)[inv_idx]
+        nframes = data.shape[0]
+        if self.natoms is not None:
+            data = data.reshape([nframes, self.natoms, self.ndof // self.natoms])
+            data = data[:, self.idx_map, :]
+            if self.reduce:
+                data = np.sum(data.astype(GLOBAL_ENER_FLOAT_PRECISION), axis=1)
+                return data.reshape([nframes, self.ndof // self.natoms])
+        data = data.reshape([nframes, self.ndof])
+        if self.repeat != 1:
+            data = np.repeat(data, self.repeat).reshape([nframes, -1])
+        return data
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        data = self[:]
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import (
+    Path,
+)
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+from deepmd.utils.path import (
+    DPOSPath,
+    DPPath,
+)
+
+log = logging.getLogger(__name__)
+
+
+class DataSystemIndex:
+    """Metadata index of the sets in a data system.
+
+    The number of frames, the number of atoms and the shapes and dtypes of all
+    arrays in each set are read from the headers of the `*.npy` files or the
+    shapes of the HDF5 datasets, so no array payload is loaded.
+    If the environment variable `DP_DATA_CACHE_DIR` is set, the index of a
+    system stored in a directory is cached in that directory (see
+    :func:`get_data_cache_path`) and reused as long as the files in the sets
+    are not modified. Nothing is written into the data system.
+
+    Parameters
+    ----------
+    sys_path : DPPath
+        Path to the data system
+    set_paths : list of DPPath
+        Paths to the sets in the data system
+    """
+
+    index_name = "index.json"
+    index_version = 1
+
+    def __init__(self, sys_path: DPPath, set_paths: List[DPPath]) -> None:
+        self.sys_path = sys_path
+        self.cache_path = None
+        cached = {}
+        if isinstance(sys_path, DPOSPath):
+            self.cache_path = get_data_cache_path(sys_path, self.index_name)
+        if self.cache_path is not None:
+            cached = self._read_cache()
+        self.sets = {}
+        updated = False
+        for set_path in set_paths:
+            key = self._set_key(set_path)
+            stamps = self._get_stamps(set_path)
+            if key in cached and stamps is not None and cached[key]["stamps"] == stamps:
+                self.sets[key] = cached[key]
+            else:
+                self.sets[key] = self._build_set(set_path, stamps)
+                updated = True
+        if updated and self.cache_path is not None:
+            self._write_cache()
+
+    def get_nframes(self, set_path: DPPath) -> int:
+        """Get the number of frames in a set."""
+        return self.sets[self._set_key(set_path)]["nframes"]
+
+    def get_natoms(self, set_path: DPPath) -> int:
+        """Get the number of atoms in a set."""
+        return self.sets[self._set_key(set_path)]["natoms"]
+
+    def get_arrays(self, set_path: DPPath) -> Dict[str, dict]:
+        """Get the shapes and the dtypes of the arrays in a set.
+
+        Parameters
+        ----------
+        set_path : DPPath
+            Path to the set
+
+        Returns
+        -------
+        dict
+            The key is the name of the array (without `.npy`). The value is
+            a dict with items `shape` and `dtype`.
+        """
+        return self.sets[self._set_key(set_path)]["arrays"]
+
+    def _set_key(self, set_path: DPPath) -> str:
+        if isinstance(set_path, DPOSPath):
+            # relative to the system so that the cache survives moving the system
+            return set_path.path.name
+        return str(set_path)
+
+    def _get_stamps(self, set_path: DPPath) -> Optional[Dict[str, list]]:
+        """Modification time and size of each `*.npy` file, used to check the cache."""
+        if not isinstance(set_path, DPOSPath):
+            return None
+        stamps = {}
+        with os.scandir(set_path.path) as it:
+            for entry in it:
+                if entry.name.endswith(".npy"):
+                    stat = entry.stat()
+                    stamps[entry.name] = [stat.st_mtime_ns, stat.st_size]
+        return stamps
+
+    def _build_set(self, set_path: DPPath, stamps: Optional[Dict[str, list]]) -> dict:
+        arrays = {}
+        for path in set_path.glob("*.npy"):
+            shape, dtype = path.load_numpy_header()
+            name = os.path.basename(str(path))[: -len(".npy")]
+            arrays[name] = {"shape": list(shape), "dtype": dtype.str}
+        coord_shape = arrays["coord"]["shape"]
+        nframes = 1 if len(coord_shape) == 1 else coord_shape[0]
+        ncoord = 1
+        for ii in coord_shape:
+            ncoord *= ii
+        return {
+            "nframes": nframes,
+            "natoms": ncoord // 3 // nframes if nframes > 0 else 0,
+            "arrays": arrays,
+            "stamps": stamps,
+        }
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get("version") != self.index_version:
+            return {}
+        return cached.get("sets", {})
+
+    def _write_cache(self) -> None:
+        # write to a temporary file and rename it, so that concurrent
+        # processes never read a partially written index
+        tmp_path = self.cache_path.with_name(f"{self.index_name}.{os.getpid()}")
+        try:
+            os.makedirs(self.cache_path.parent, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": self.index_version, "sets": self.sets}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            log.debug(f"cannot write the index of data system {self.sys_path}: {e}")
+
+
+def get_data_cache_path(sys_path: DPOSPath, name: str) -> Optional[Path]:
+    """Get the path of a file caching the metadata of a data system.
+
+    The files of a system are kept in a subdirectory of the directory given by
+    the environment variable `DP_DATA_CACHE_DIR`, named by the hash of the
+    absolute path of the system, so the data directories are never written.
+
+    Parameters
+    ----------
+    sys_path : DPOSPath
+        Path to the data system
+    name : str
+        Name of the cache file
+
+    Returns
+    -------
+    Path or None
+        The path of the cache file, or None if `DP_DATA_CACHE_DIR` is not set
+    """
+    cache_dir = os.environ.get("DP_DATA_CACHE_DIR")
+    if not cache_dir:
+        return None
+    sys_hash = hashlib.sha256(str(sys_path.path.resolve()).encode()).hexdigest()
+    return Path(cache_dir) / sys_hash / name
@@ -1,9 +1,11 @@
 import collections
 import logging
+import threading
 import warnings
 from typing import (
     List,
     Optional,
+    Tuple,
 )
 
 import numpy as np
@@ -39,6 +41,8 @@ class DeepmdDataSystem:
         trn_all_set=False,
         sys_probs=None,
         auto_prob_style="prob_sys_size",
+        memmap: bool = False,
+        shard: Optional[Tuple[int, int]] = None,
     ):
         """Constructor.
 
@@ -78,6 +82,13 @@ class DeepmdDataSystem:
                                 where `stt_idx` is the starting index of the system, `end_idx` is then ending (not including) index of the system,
                                 the probabilities of the systems in this block sums up to `weight`, and the relatively probabilities within this block is proportional
         to the number of batches in the system.
+        memmap : bool
+            Memory-map the `*.npy` files of the sets and only read the frames that are gathered into batches.
+        shard : tuple of int, optional
+            The index of the shard and the number of shards, e.g. the rank and the number of ranks in
+            parallel training. The training frames of each system are split into the shards, and only
+            the frames of this shard are loaded. The probabilities of the systems are derived from the
+            sizes of the whole systems, so they are the same for all the shards.
         """
         # init data
         self.rcut = rcut
@@ -94,8 +105,17 @@ class DeepmdDataSystem:
                     optional_type_map=optional_type_map,
                     modifier=modifier,
                     trn_all_set=trn_all_set,
+                    memmap=memmap,
+                    shard=shard,
                 )
             )
+        # get_batch may be called from the threads prefetching the data,
+        # so the state of each system is protected by its own lock, and the
+        # drawing of the systems and `pick_idx` by another one
+        self.sys_locks = [threading.Lock() for _ in self.data_systems]
+        self.pick_lock = threading.Lock()
+        # looks ahead the draws of the systems of mixed batches
+        self._lookahead_random = np.random.RandomState()
         # check mix_type format
         error_format_msg = (
             "if one of the system is of mixed_type format, "
@@ -414,21 +434,29 @@ class DeepmdDataSystem:
         dict
             The batch data
         """
-        if sys_idx is not None:
-            self.pick_idx = sys_idx
-        else:
-            # prob = self._get_sys_probs(sys_probs, auto_prob_style)
-            self.pick_idx = dp_random.choice(np.arange(self.nsystems), p=self.sys_probs)
-        b_data = self.data_systems[self.pick_idx].get_batch(
-            self.batch_size[self.pick_idx]
-        )
-        b_data["natoms_vec"] = self.natoms_vec[self.pick_idx]
-        b_data["default_mesh"] = self.default_mesh[self.pick_idx]
+        with self.pick_lock:
+            if sys_idx is not None:
+                pick_idx = sys_idx
+            else:
+                # prob = self._get_sys_probs(sys_probs, auto_prob_style)
+                pick_idx = dp_random.choice(np.arange(self.nsystems), p=self.sys_probs)
+            self.pick_idx = pick_idx
+        with self.sys_locks[pick_idx]:
+            b_data = self.data_systems[pick_idx].get_batch(self.batch_size[pick_idx])
+        b_data["natoms_vec"] = self.natoms_vec[pick_idx]
+        b_data["default_mesh"] = self.default_mesh[pick_idx]
         return b_data
 
     def get_batch_mixed(self) -> dict:
         """Get a batch of data from the data systems in the mixed way.
 
+        The batch is the same as the one merged from the frames got one by one,
+        for the same random seed. The systems of the frames are drawn at once,
+        up to the first frame that needs a system to load its next set, as
+        loading a set draws random numbers to shuffle it. The frames from the
+        same system are gathered by one call of :meth:`DeepmdData.get_batch`,
+        and then padded into the merged batch.
+
         Returns
         -------
         dict
@@ -436,16 +464,184 @@ class DeepmdDataSystem:
         """
         # mixed systems have a global batch size
         batch_size = self.batch_size[0]
-        batch_data = []
-        for _ in range(batch_size):
-            self.pick_idx = dp_random.choice(np.arange(self.nsystems), p=self.sys_probs)
-            bb_data = self.data_systems[self.pick_idx].get_batch(1)
-            bb_data["natoms_vec"] = self.natoms_vec[self.pick_idx]
-            bb_data["default_mesh"] = self.default_mesh[self.pick_idx]
-            batch_data.append(bb_data)
-        b_data = self._merge_batch_data(batch_data)
+        pick_idx = np.empty(batch_size, dtype=int)
+        sys_batches = {}
+        nget = 0
+        while nget < batch_size:
+            with self.pick_lock:
+                picks = self._draw_mixed_picks(batch_size - nget)
+                self.pick_idx = picks[-1]
+            pick_idx[nget : nget + picks.size] = picks
+            for ii, count in zip(*np.unique(picks, return_counts=True)):
+                with self.sys_locks[ii]:
+                    sys_batches.setdefault(ii, []).append(
+                        self._get_sys_frames(ii, count)
+                    )
+            nget += picks.size
+        sys_data = {
+            ii: self._concat_sys_batches(batches) for ii, batches in sys_batches.items()
+        }
+        return self._merge_sys_data(pick_idx, sys_data)
+
+    def _draw_mixed_picks(self, nframes: int) -> np.ndarray:
+        """Draw the systems of at most `nframes` frames of a mixed batch.
+
+        The draws stop at the first frame that is not left in the loaded set
+        of its system. They are looked ahead with a copy of the random
+        generator, so that only the kept draws are taken from it. Only the
+        drawn systems are checked, without their locks: if another thread
+        gets frames meanwhile, the frames are still gathered correctly by
+        :meth:`_get_sys_frames`, only not in the order of a serial run.
+
+        Parameters
+        ----------
+        nframes : int
+            The maximal number of frames
+
+        Returns
+        -------
+        np.ndarray
+            The index of the system of each drawn frame
+        """
+        # the same draws as dp_random.choice(nsystems, p=sys_probs) gives
+        cdf = np.cumsum(np.asarray(self.sys_probs, dtype=np.float64))
+        cdf /= cdf[-1]
+        self._lookahead_random.set_state(dp_random.get_state())
+        picks = cdf.searchsorted(
+            self._lookahead_random.random_sample(nframes), side="right"
+        )
+        uniq, inv, counts = np.unique(picks, return_inverse=True, return_counts=True)
+        nleft = np.array([self._get_nframes_left(ii) for ii in uniq])
+        if np.any(counts > nleft):
+            # the order of each draw among the draws of its system
+            order = np.empty(nframes, dtype=int)
+            order[np.argsort(inv, kind="stable")] = np.arange(nframes) - np.repeat(
+                np.cumsum(counts) - counts, counts
+            )
+            nframes = np.flatnonzero(order >= nleft[inv])[0] + 1
+        return cdf.searchsorted(dp_random.random(nframes), side="right")
+
+    def _get_sys_frames(self, sys_idx: int, nframes: int) -> dict:
+        """Get the frames of a system in a mixed batch.
+
+        The frames left in the loaded set are taken before the next set is
+        loaded, as if the frames were got one by one.
+        """
+        data = self.data_systems[sys_idx]
+        batches = []
+        while nframes > 0:
+            # the frames left in the loaded set, or the first one of the next set
+            nget = min(max(self._get_nframes_left(sys_idx), 1), nframes)
+            batches.append(data.get_batch(nget))
+            nframes -= nget
+        return self._concat_sys_batches(batches)
+
+    def _get_nframes_left(self, sys_idx: int) -> int:
+        """Get the number of frames left in the loaded set of a system."""
+        data = self.data_systems[sys_idx]
+        if not hasattr(data, "batch_set"):
+            return 0
+        return max(data.batch_set["coord"].shape[0] - data.iterator, 0)
+
+    @staticmethod
+    def _concat_sys_batches(batches: List[dict]) -> dict:
+        """Concatenate the batches got from the same system."""
+        if len(batches) == 1:
+            return batches[0]
+        b_data = {}
+        for kk in batches[0]:
+            if "find_" in kk:
+                b_data[kk] = batches[0][kk]
+            else:
+                b_data[kk] = np.concatenate([bb[kk] for bb in batches], axis=0)
         return b_data
 
+    def _merge_sys_data(self, pick_idx: np.ndarray, sys_data: dict) -> dict:
+        """Merge frames from different systems into a mixed batch.
+
+        Parameters
+        ----------
+        pick_idx : np.ndarray
+            The index of the system of each frame in the batch.
+        sys_data : dict
+            The batch data of each system in `pick_idx`, which has as many
+            frames as the system appears in `pick_idx`.
+
+        Returns
+        -------
+        dict
+            The merged batch data. It is the same as that merged by
+            :meth:`_merge_batch_data` from the frames in the order of `pick_idx`.
+        """
+        sys_list = sorted(sys_data)
+        # the rows of the frames of each system, in the order of sys_list
+        sys_rows = np.argsort(pick_idx, kind="stable")
+        b_data = {}
+        # the arrays are not reused between batches, as the previous batches
+        # may still be waiting in the prefetching queue
+        max_natoms = max(self.natoms_vec[ii][0] for ii in sys_list)
+        # natoms_vec
+        natoms_vec = np.zeros(2 + self.get_ntypes(), dtype=int)
+        natoms_vec[0:3] = max_natoms
+        b_data["natoms_vec"] = natoms_vec
+        # real_natoms_vec
+        b_data["real_natoms_vec"] = np.array(self.natoms_vec)[pick_idx]
+        # type
+        b_data["type"] = self._pad_sys_data(
+            [sys_data[ii]["type"] for ii in sys_list], sys_rows, max_natoms, -1
+        )
+        # default_mesh
+        default_mesh = np.mean([self.default_mesh[ii] for ii in pick_idx], axis=0)
+        b_data["default_mesh"] = default_mesh
+        # other data
+        first_data = sys_data[pick_idx[0]]
+        data_dict = self.get_data_dict(0)
+        for kk, vv in data_dict.items():
+            if kk not in first_data:
+                continue
+            b_data["find_" + kk] = first_data["find_" + kk]
+            if not vv["atomic"]:
+                ndof = first_data[kk].shape[1]
+            else:
+                ndof = max_natoms * vv["ndof"] * vv["repeat"]
+            b_data[kk] = self._pad_sys_data(
+                [sys_data[ii][kk] for ii in sys_list], sys_rows, ndof, 0
+            )
+        return b_data
+
+    @staticmethod
+    def _pad_sys_data(
+        blocks: List[np.ndarray], sys_rows: np.ndarray, ndof: int, fill_value
+    ) -> np.ndarray:
+        """Put the data of the systems into the rows of a batch, padded to `ndof` columns.
+
+        Parameters
+        ----------
+        blocks : list of np.ndarray
+            The data of each system
+        sys_rows : np.ndarray
+            The rows of the frames of all blocks in the batch
+        ndof : int
+            The number of columns of the batch
+        fill_value
+            The value of the padded columns
+
+        Returns
+        -------
+        np.ndarray
+            The data of the batch
+        """
+        if all(bb.shape[1] == ndof for bb in blocks):
+            merged = np.empty((sys_rows.size, ndof), dtype=blocks[0].dtype)
+            merged[sys_rows] = np.concatenate(blocks, axis=0)
+            return merged
+        merged = np.full((sys_rows.size, ndof), fill_value, dtype=blocks[0].dtype)
+        start = 0
+        for bb in blocks:
+            merged[sys_rows[start : start + bb.shape[0]], : bb.shape[1]] = bb
+            start += bb.shape[0]
+        return merged
+
     def _merge_batch_data(self, batch_data: List[dict]) -> dict:
         """Merge batch data from different systems.
 
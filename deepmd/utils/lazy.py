@@ -0,0 +1,62 @@
+"""Lazy import of the attributes of a package."""
+
+from importlib import (
+    import_module,
+)
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+def lazy_attributes(
+    package: str, attributes: Dict[str, Tuple[str, Optional[str]]]
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """Make the module-level `__getattr__` and `__dir__` of a package that imports its attributes on first access.
+
+    Importing a package then does not import its submodules, e.g. TensorFlow is
+    not imported by the commands that do not need it.
+
+    Parameters
+    ----------
+    package : str
+        The name of the package, i.e. `__name__`
+    attributes : dict
+        The name of each attribute, mapped to the module that defines it,
+        relative to the package, and the name of the attribute in that module.
+        If the name is None, the attribute is the module itself.
+
+    Returns
+    -------
+    Callable[[str], Any]
+        The `__getattr__` of the package
+    Callable[[], List[str]]
+        The `__dir__` of the package
+
+    Examples
+    --------
+    >>> __getattr__, __dir__ = lazy_attributes(
+    ...     __name__,
+    ...     {"DeepmdData": (".data", "DeepmdData")},
+    ... )
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in attributes:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        module_name, attr_name = attributes[name]
+        value = import_module(module_name, package)
+        if attr_name is not None:
+            value = getattr(value, attr_name)
+        # later accesses do not go through this function
+        setattr(import_module(package), name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(import_module(package))) | set(attributes))
+
+    return __getattr__, __dir__
@@ -1,7 +1,16 @@
+import hashlib
+import json
 import logging
 import math
+import multiprocessing
+import os
+from concurrent.futures import (
+    ProcessPoolExecutor,
+)
 from typing import (
+    Dict,
     List,
+    Optional,
     Tuple,
 )
 
@@ -13,21 +22,41 @@ from deepmd.env import (
     op_module,
     tf,
 )
+from deepmd.utils.data import (
+    DeepmdData,
+)
+from deepmd.utils.data_index import (
+    get_data_cache_path,
+)
 from deepmd.utils.data_system import (
     DeepmdDataSystem,
 )
 from deepmd.utils.parallel_op import (
     ParallelOp,
 )
+from deepmd.utils.path import (
+    DPOSPath,
+)
 
 log = logging.getLogger(__name__)
 
+# neighbor statistics of the systems computed in this process, so that
+# the descriptors of a hybrid model with the same rcut share a single scan
+_stat_cache = {}
+
 
 class NeighborStat:
     """Class for getting training data information.
 
     It loads data from DeepmdData object, and measures the data info, including neareest nbor distance between atoms, max nbor size of atoms and the output data range of the environment matrix.
 
+    The frames are fed to the op in chunks of `chunk_size` frames. The statistics
+    of each system are cached in memory and, for a system stored in a directory,
+    in the data cache directory given by the environment variable
+    `DP_DATA_CACHE_DIR` if it is set (see :func:`get_data_cache_path`), keyed by
+    the cut-off radius. The cache is reused as long as the files in the sets
+    are not modified.
+
     Parameters
     ----------
     ntypes
@@ -36,18 +65,29 @@ class NeighborStat:
             The cut-off radius
     one_type : bool, optional, default=False
         Treat all types as a single type.
+    chunk_size : int, optional, default=1024
+        The maximum number of frames fed to the op in one call.
+    nproc : int, optional, default=1
+        The number of processes to scan the systems in parallel.
     """
 
+    cache_name = "neighbor_stat.json"
+    cache_version = 1
+
     def __init__(
         self,
         ntypes: int,
         rcut: float,
         one_type: bool = False,
+        chunk_size: int = 1024,
+        nproc: int = 1,
     ) -> None:
         """Constructor."""
         self.rcut = rcut
         self.ntypes = ntypes
         self.one_type = one_type
+        self.chunk_size = chunk_size
+        self.nproc = nproc
         sub_graph = tf.Graph()
 
         def builder():
@@ -71,17 +111,40 @@ class NeighborStat:
                 # all types = 0, natoms_vec = [natoms, natoms, natoms]
                 t_type = tf.clip_by_value(t_type, -1, 0)
                 t_natoms = tf.tile(t_natoms[0:1], [3])
+            t_rcut = tf.constant([self.rcut], dtype=GLOBAL_NP_FLOAT_PRECISION)
+
+            def frame_stat(ii):
+                # the op only computes the first frame of its inputs
+                _max_nbor_size, _min_nbor_dist = op_module.neighbor_stat(
+                    place_holders["coord"][ii : ii + 1],
+                    t_type[ii : ii + 1],
+                    t_natoms,
+                    place_holders["box"][ii : ii + 1],
+                    place_holders["default_mesh"],
+                    rcut=self.rcut,
+                )
+                # the distances of neighbors are not larger than rcut, so rcut
+                # is given for a frame without any neighbor
+                return (
+                    tf.reduce_max(_max_nbor_size, axis=0),
+                    tf.reduce_min(tf.concat([_min_nbor_dist, t_rcut], axis=0)),
+                    tf.size(_min_nbor_dist) > 0,
+                )
 
-            _max_nbor_size, _min_nbor_dist = op_module.neighbor_stat(
-                place_holders["coord"],
-                t_type,
-                t_natoms,
-                place_holders["box"],
-                place_holders["default_mesh"],
-                rcut=self.rcut,
+            _max_nbor_size, _min_nbor_dist, _has_nbor = tf.map_fn(
+                frame_stat,
+                tf.range(tf.shape(place_holders["coord"])[0]),
+                dtype=(tf.int32, GLOBAL_NP_FLOAT_PRECISION, tf.bool),
             )
             place_holders["dir"] = tf.placeholder(tf.string)
-            return place_holders, (_max_nbor_size, _min_nbor_dist, place_holders["dir"])
+            place_holders["sys_idx"] = tf.placeholder(tf.int32)
+            return place_holders, (
+                _max_nbor_size,
+                _min_nbor_dist,
+                _has_nbor,
+                place_holders["dir"],
+                place_holders["sys_idx"],
+            )
 
         with sub_graph.as_default():
             self.p = ParallelOp(builder, config=default_tf_session_config)
@@ -107,46 +170,227 @@ class NeighborStat:
         self.max_nbor_size = [0]
         if not self.one_type:
             self.max_nbor_size *= self.ntypes
+        if not hasattr(data, "default_mesh"):
+            data._make_default_mesh()
+
+        nsys = len(data.system_dirs)
+        sys_stats = [self._load_cache(data.data_systems[ii]) for ii in range(nsys)]
+        sys_idx = [ii for ii in range(nsys) if sys_stats[ii] is None]
+        log.info(
+            "neighbor statistics of %d systems loaded from the cache"
+            % (nsys - len(sys_idx))
+        )
+        if self.nproc > 1 and len(sys_idx) > 1:
+            # each process builds its own graph; fork is unsafe with TensorFlow
+            with ProcessPoolExecutor(
+                max_workers=min(self.nproc, len(sys_idx)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.ntypes, self.rcut, self.one_type, self.chunk_size),
+            ) as executor:
+                futures = {
+                    ii: executor.submit(
+                        _get_sys_stat_worker,
+                        str(data.system_dirs[ii]),
+                        data.data_systems[ii].set_prefix,
+                        data.data_systems[ii].type_map,
+                        np.array(data.natoms_vec[ii]),
+                        np.array(data.default_mesh[ii]),
+                    )
+                    for ii in sys_idx
+                }
+                for ii, future in futures.items():
+                    sys_stats[ii] = future.result()
+        elif len(sys_idx) > 0:
+            computed = self._compute_stat(
+                [data.data_systems[ii] for ii in sys_idx],
+                [data.natoms_vec[ii] for ii in sys_idx],
+                [data.default_mesh[ii] for ii in sys_idx],
+            )
+            for ii, stat in zip(sys_idx, computed):
+                sys_stats[ii] = stat
+        for ii in sys_idx:
+            self._save_cache(data.data_systems[ii], sys_stats[ii])
+
+        for dt, mn in sys_stats:
+            self.min_nbor_dist = min(self.min_nbor_dist, dt)
+            self.max_nbor_size = np.maximum(mn, self.max_nbor_size)
+
+        log.info("training data with min nbor dist: " + str(self.min_nbor_dist))
+        log.info("training data with max nbor size: " + str(self.max_nbor_size))
+        return self.min_nbor_dist, self.max_nbor_size
+
+    def _compute_stat(
+        self,
+        data_systems: List[DeepmdData],
+        natoms_vec: List[np.ndarray],
+        default_mesh: List[np.ndarray],
+    ) -> List[Tuple[float, np.ndarray]]:
+        """Scan the frames of the systems.
+
+        Parameters
+        ----------
+        data_systems
+            The data systems to scan
+        natoms_vec
+            The natoms vector of each system
+        default_mesh
+            The default mesh of each system
+
+        Returns
+        -------
+        list of tuple
+            The nearest neighbor distance and the max nbor size of each system
+        """
+        sys_min_nbor_dist = [self.rcut] * len(data_systems)
+        sys_max_nbor_size = [0] * len(data_systems)
 
         def feed():
-            for ii in range(len(data.system_dirs)):
-                for jj in data.data_systems[ii].dirs:
-                    data_set = data.data_systems[ii]._load_set(jj)
-                    for kk in range(np.array(data_set["type"]).shape[0]):
+            for ii, sys_data in enumerate(data_systems):
+                natoms = sys_data.natoms
+                for jj in sys_data.dirs:
+                    data_set = sys_data._load_set(jj)
+                    nframes = data_set["type"].shape[0]
+                    for start in range(0, nframes, self.chunk_size):
+                        idx = np.arange(start, min(start + self.chunk_size, nframes))
                         yield {
-                            "coord": np.array(data_set["coord"])[kk].reshape(
-                                [-1, data.natoms[ii] * 3]
+                            "coord": np.asarray(data_set["coord"][idx]).reshape(
+                                [-1, natoms * 3]
                             ),
-                            "type": np.array(data_set["type"])[kk].reshape(
-                                [-1, data.natoms[ii]]
+                            "type": np.asarray(data_set["type"][idx]).reshape(
+                                [-1, natoms]
                             ),
-                            "natoms_vec": np.array(data.natoms_vec[ii]),
-                            "box": np.array(data_set["box"])[kk].reshape([-1, 9]),
-                            "default_mesh": np.array(data.default_mesh[ii]),
+                            "natoms_vec": np.array(natoms_vec[ii]),
+                            "box": np.asarray(data_set["box"][idx]).reshape([-1, 9]),
+                            "default_mesh": np.array(default_mesh[ii]),
                             "dir": str(jj),
+                            "sys_idx": ii,
                         }
 
-        for mn, dt, jj in self.p.generate(self.sub_sess, feed()):
-            if dt.size != 0:
-                dt = np.min(dt)
-            else:
-                dt = self.rcut
+        for mn, dt, has_nbor, jj, ii in self.p.generate(self.sub_sess, feed()):
+            jj = jj.decode() if isinstance(jj, bytes) else jj
+            if not np.all(has_nbor):
                 log.warning(
                     "Atoms with no neighbors found in %s. Please make sure it's what you expected."
                     % jj
                 )
-            if dt < self.min_nbor_dist:
-                if math.isclose(dt, 0.0, rel_tol=1e-6):
-                    # it's unexpected that the distance between two atoms is zero
-                    # zero distance will cause nan (#874)
-                    raise RuntimeError(
-                        "Some atoms are overlapping in %s. Please check your"
-                        " training data to remove duplicated atoms." % jj
-                    )
-                self.min_nbor_dist = dt
-            var = np.max(mn, axis=0)
-            self.max_nbor_size = np.maximum(var, self.max_nbor_size)
+            dt = np.min(dt)
+            if math.isclose(dt, 0.0, rel_tol=1e-6):
+                # it's unexpected that the distance between two atoms is zero
+                # zero distance will cause nan (#874)
+                raise RuntimeError(
+                    "Some atoms are overlapping in %s. Please check your"
+                    " training data to remove duplicated atoms." % jj
+                )
+            sys_min_nbor_dist[ii] = min(sys_min_nbor_dist[ii], float(dt))
+            sys_max_nbor_size[ii] = np.maximum(
+                np.max(mn, axis=0), sys_max_nbor_size[ii]
+            )
+        return [
+            (dt, np.array(mn, dtype=int))
+            for dt, mn in zip(sys_min_nbor_dist, sys_max_nbor_size)
+        ]
 
-        log.info("training data with min nbor dist: " + str(self.min_nbor_dist))
-        log.info("training data with max nbor size: " + str(self.max_nbor_size))
-        return self.min_nbor_dist, self.max_nbor_size
+    def _cache_key(self) -> str:
+        return json.dumps(
+            {"rcut": self.rcut, "ntypes": self.ntypes, "one_type": self.one_type},
+            sort_keys=True,
+        )
+
+    def _fingerprint(self, sys_data: DeepmdData) -> str:
+        """Fingerprint of the atom types and the set files of a system."""
+        return hashlib.sha256(
+            json.dumps(
+                {
+                    "sets": sys_data.index.sets,
+                    "atom_type": np.asarray(sys_data.atom_type).tolist(),
+                    "type_map": sys_data.type_map,
+                },
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+
+    def _cache_path(self, sys_data: DeepmdData) -> Optional[str]:
+        # only a system in a directory with the modification time of the
+        # files is cached on the disk
+        if not isinstance(sys_data.index.sys_path, DPOSPath):
+            return None
+        for ss in sys_data.index.sets.values():
+            if ss["stamps"] is None:
+                return None
+        path = get_data_cache_path(sys_data.index.sys_path, self.cache_name)
+        return None if path is None else str(path)
+
+    def _read_cache_file(self, path: str) -> Dict[str, dict]:
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get("version") != self.cache_version:
+            return {}
+        return cached.get("stats", {})
+
+    def _load_cache(self, sys_data: DeepmdData) -> Optional[Tuple[float, np.ndarray]]:
+        fingerprint = self._fingerprint(sys_data)
+        mem_key = (str(sys_data.index.sys_path), self._cache_key(), fingerprint)
+        if mem_key in _stat_cache:
+            return _stat_cache[mem_key]
+        path = self._cache_path(sys_data)
+        if path is None:
+            return None
+        cached = self._read_cache_file(path).get(self._cache_key())
+        if cached is None or cached["fingerprint"] != fingerprint:
+            return None
+        stat = (cached["min_nbor_dist"], np.array(cached["max_nbor_size"], dtype=int))
+        _stat_cache[mem_key] = stat
+        return stat
+
+    def _save_cache(self, sys_data: DeepmdData, stat: Tuple[float, np.ndarray]):
+        fingerprint = self._fingerprint(sys_data)
+        mem_key = (str(sys_data.index.sys_path), self._cache_key(), fingerprint)
+        _stat_cache[mem_key] = stat
+        path = self._cache_path(sys_data)
+        if path is None:
+            return
+        stats = self._read_cache_file(path)
+        stats[self._cache_key()] = {
+            "fingerprint": fingerprint,
+            "min_nbor_dist": stat[0],
+            "max_nbor_size": stat[1].tolist(),
+        }
+        # write to a temporary file and rename it, so that concurrent
+        # processes never read a partially written cache
+        tmp_path = f"{path}.{os.getpid()}"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump({"version": self.cache_version, "stats": stats}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.debug(f"cannot write the neighbor statistics of {path}: {e}")
+
+
+_worker_neighbor_stat = None
+
+
+def _init_worker(ntypes: int, rcut: float, one_type: bool, chunk_size: int) -> None:
+    global _worker_neighbor_stat
+    _worker_neighbor_stat = NeighborStat(
+        ntypes, rcut, one_type=one_type, chunk_size=chunk_size
+    )
+
+
+def _get_sys_stat_worker(
+    sys_path: str,
+    set_prefix: str,
+    type_map: Optional[List[str]],
+    natoms_vec: np.ndarray,
+    default_mesh: np.ndarray,
+) -> Tuple[float, np.ndarray]:
+    sys_data = DeepmdData(
+        sys_path, set_prefix=set_prefix, shuffle_test=False, type_map=type_map
+    )
+    return _worker_neighbor_stat._compute_stat(
+        [sys_data], [natoms_vec], [default_mesh]
+    )[0]
@@ -12,6 +12,7 @@ from pathlib import (
 from typing import (
     List,
     Optional,
+    Tuple,
 )
 
 import h5py
@@ -42,15 +43,33 @@ class DPPath(ABC):
         return super().__new__(cls)
 
     @abstractmethod
-    def load_numpy(self) -> np.ndarray:
+    def load_numpy(self, mmap: bool = False) -> np.ndarray:
         """Load NumPy array.
 
+        Parameters
+        ----------
+        mmap : bool, default=False
+            return a read-only memory-mapped view instead of reading
+            the whole array into memory, if supported
+
         Returns
         -------
         np.ndarray
             loaded NumPy array
         """
 
+    @abstractmethod
+    def load_numpy_header(self) -> Tuple[Tuple[int, ...], np.dtype]:
+        """Load the shape and the dtype of a NumPy array without reading its data.
+
+        Returns
+        -------
+        tuple of int
+            shape of the array
+        np.dtype
+            dtype of the array
+        """
+
     @abstractmethod
     def load_txt(self, **kwargs) -> np.ndarray:
         """Load NumPy array from text.
@@ -138,15 +157,39 @@ class DPOSPath(DPPath):
         else:
             self.path = Path(path)
 
-    def load_numpy(self) -> np.ndarray:
+    def load_numpy(self, mmap: bool = False) -> np.ndarray:
         """Load NumPy array.
 
+        Parameters
+        ----------
+        mmap : bool, default=False
+            return a read-only memory-mapped view instead of reading
+            the whole array into memory
+
         Returns
         -------
         np.ndarray
             loaded NumPy array
         """
-        return np.load(str(self.path))
+        return np.load(str(self.path), mmap_mode="r" if mmap else None)
+
+    def load_numpy_header(self) -> Tuple[Tuple[int, ...], np.dtype]:
+        """Load the shape and the dtype of a NumPy array without reading its data.
+
+        Returns
+        -------
+        tuple of int
+            shape of the array
+        np.dtype
+            dtype of the array
+        """
+        with open(self.path, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        return shape, dtype
 
     def load_txt(self, **kwargs) -> np.ndarray:
         """Load NumPy array from text.
@@ -252,16 +295,37 @@ class DPH5Path(DPPath):
         # However the file will be never closed?
         return h5py.File(path, "r")
 
-    def load_numpy(self) -> np.ndarray:
+    def load_numpy(self, mmap: bool = False) -> np.ndarray:
         """Load NumPy array.
 
+        Parameters
+        ----------
+        mmap : bool, default=False
+            return the HDF5 dataset itself, whose data are only read
+            when it is indexed
+
         Returns
         -------
-        np.ndarray
+        np.ndarray or h5py.Dataset
             loaded NumPy array
         """
+        if mmap:
+            return self.root[self.name]
         return self.root[self.name][:]
 
+    def load_numpy_header(self) -> Tuple[Tuple[int, ...], np.dtype]:
+        """Load the shape and the dtype of a NumPy array without reading its data.
+
+        Returns
+        -------
+        tuple of int
+            shape of the array
+        np.dtype
+            dtype of the array
+        """
+        dataset = self.root[self.name]
+        return dataset.shape, dataset.dtype
+
     def load_txt(self, dtype: Optional[np.dtype] = None, **kwargs) -> np.ndarray:
         """Load NumPy array from text.
 
@@ -0,0 +1,241 @@
+"""Timing of the phases of the training steps."""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import (
+    deque,
+)
+from contextlib import (
+    nullcontext,
+)
+from typing import (
+    Deque,
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    """Context of a timed phase."""
+
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: "PhaseTimer", name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.timer.record(self.name, self.start, time.perf_counter())
+
+
+class PhaseTimer:
+    """Record the wall time of the phases of the training steps.
+
+    The durations of each phase are kept in a rolling window, whose percentiles
+    tell the typical and the tail time of the phase. Each timed interval can also
+    be exported to a trace file:
+
+    - `*.jsonl`: one JSON object per line, with the keys `name`, `step`, `thread`,
+      `start` and `duration`, the times in seconds;
+    - otherwise, the Chrome trace event format, which can be opened by
+      `chrome://tracing` or https://ui.perfetto.dev/. The file is a JSON array
+      written incrementally, which is closed when the timer is closed.
+
+    The phases may be timed in several threads, e.g. the data prefetching threads,
+    which are shown as different threads in the trace.
+
+    Parameters
+    ----------
+    enabled : bool, default=True
+        If False, nothing is recorded, and timing a phase costs little.
+    window : int, default=1000
+        The number of recent durations of each phase used for the percentiles.
+    trace_file : str, optional
+        The file to export the timed intervals.
+
+    Examples
+    --------
+    >>> timer = PhaseTimer(trace_file="phases.json")
+    >>> with timer.phase("get_batch"):
+    ...     batch = data.get_batch()
+    >>> timer.log_stat(cur_batch)
+    >>> timer.close()
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        window: int = 1000,
+        trace_file: Optional[str] = None,
+    ):
+        self.enabled = enabled
+        self.window = window
+        self.trace_file = trace_file if enabled else None
+        self.step = 0
+        self._durations: Dict[str, Deque[float]] = {}
+        self._events: List[tuple] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._fp = None
+        self._has_events = False
+        if self.trace_file is not None:
+            self._json_lines = self.trace_file.endswith(".jsonl")
+            self._fp = open(self.trace_file, "w")
+            if not self._json_lines:
+                # the closing bracket is optional in the trace event format,
+                # so the events can be appended until the timer is closed
+                self._fp.write("[\n")
+
+    def phase(self, name: str):
+        """Time a phase in a `with` statement.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase
+
+        Returns
+        -------
+        context manager
+            The context of the phase
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name: str, start: float, end: float):
+        """Record a timed interval of a phase.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase
+        start : float
+            The start time from `time.perf_counter`
+        end : float
+            The end time from `time.perf_counter`
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self.window)
+            durations.append(end - start)
+            if self._fp is not None:
+                self._events.append(
+                    (name, self.step, threading.get_ident(), start, end - start)
+                )
+
+    def get_stat(self) -> Dict[str, Dict[str, float]]:
+        """Get the statistics of the durations of each phase in the rolling window.
+
+        Returns
+        -------
+        Dict[str, Dict[str, float]]
+            For each phase, `count`: the number of durations; `mean`, `p50`, `p90`,
+            `p99` and `max`: the mean, the percentiles and the maximum of the
+            durations, in seconds.
+        """
+        with self._lock:
+            durations = {kk: np.array(vv) for kk, vv in self._durations.items()}
+        stat = {}
+        for name, dd in durations.items():
+            p50, p90, p99 = np.percentile(dd, [50, 90, 99])
+            stat[name] = {
+                "count": dd.size,
+                "mean": np.mean(dd),
+                "p50": p50,
+                "p90": p90,
+                "p99": p99,
+                "max": np.max(dd),
+            }
+        return stat
+
+    def log_stat(self, cur_batch: int):
+        """Log the statistics of each phase, and write the trace.
+
+        Parameters
+        ----------
+        cur_batch : int
+            The current training step
+        """
+        if not self.enabled:
+            return
+        for name, ss in self.get_stat().items():
+            log.info(
+                "batch %7d phase %-16s mean %8.2f ms, p50 %8.2f ms, p90 %8.2f ms, p99 %8.2f ms, max %8.2f ms (%d samples)"
+                % (
+                    cur_batch,
+                    name,
+                    ss["mean"] * 1e3,
+                    ss["p50"] * 1e3,
+                    ss["p90"] * 1e3,
+                    ss["p99"] * 1e3,
+                    ss["max"] * 1e3,
+                    ss["count"],
+                )
+            )
+        self.flush()
+
+    def flush(self):
+        """Write the recorded intervals to the trace file."""
+        if self._fp is None:
+            return
+        with self._lock:
+            events, self._events = self._events, []
+        pid = os.getpid()
+        lines = []
+        for name, step, tid, start, duration in events:
+            if self._json_lines:
+                event = {
+                    "name": name,
+                    "step": step,
+                    "thread": tid,
+                    "start": start - self._t0,
+                    "duration": duration,
+                }
+            else:
+                event = {
+                    "name": name,
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": tid,
+                    "ts": (start - self._t0) * 1e6,
+                    "dur": duration * 1e6,
+                    "args": {"step": step},
+                }
+            lines.append(json.dumps(event))
+        if not lines:
+            return
+        if self._json_lines:
+            self._fp.write("\n".join(lines) + "\n")
+        else:
+            # the events are separated by commas in the array
+            self._fp.write((",\n" if self._has_events else "") + ",\n".join(lines))
+        self._has_events = True
+        self._fp.flush()
+
+    def close(self):
+        """Write the remaining intervals and close the trace file."""
+        if self._fp is None:
+            return
+        self.flush()
+        if not self._json_lines:
+            self._fp.write("\n]\n")
+        self._fp.close()
+        self._fp = None
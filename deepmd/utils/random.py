@@ -7,7 +7,7 @@ import numpy as np
 _RANDOM_GENERATOR = np.random.RandomState()
 
 
-def choice(a: np.ndarray, p: Optional[np.ndarray] = None):
+def choice(a: np.ndarray, p: Optional[np.ndarray] = None, size=None):
     """Generates a random sample from a given 1-D array.
 
     Parameters
@@ -16,13 +16,15 @@ def choice(a: np.ndarray, p: Optional[np.ndarray] = None):
         A random sample is generated from its elements.
     p : np.ndarray
         The probabilities associated with each entry in a.
+    size
+        Output shape. If None, a single value is returned.
 
     Returns
     -------
     np.ndarray
         arrays with results and their shapes
     """
-    return _RANDOM_GENERATOR.choice(a, p=p)
+    return _RANDOM_GENERATOR.choice(a, p=p, size=size)
 
 
 def random(size=None):
@@ -41,6 +43,17 @@ def random(size=None):
     return _RANDOM_GENERATOR.random_sample(size)
 
 
+def get_state() -> tuple:
+    """Get the state of the generator, e.g. to draw ahead with a copy of it.
+
+    Returns
+    -------
+    tuple
+        The state, see :meth:`numpy.random.RandomState.get_state`.
+    """
+    return _RANDOM_GENERATOR.get_state()
+
+
 def seed(val: Optional[int] = None):
     """Seed the generator.
 
@@ -63,4 +76,4 @@ def shuffle(x: np.ndarray):
     _RANDOM_GENERATOR.shuffle(x)
 
 
-__all__ = ["choice", "random", "seed", "shuffle"]
+__all__ = ["choice", "get_state", "random", "seed", "shuffle"]
@@ -0,0 +1,145 @@
+"""Throughput metrics of the training."""
+
+import json
+import time
+from typing import (
+    Dict,
+    Optional,
+)
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.utils.batch_size import (
+    get_peak_memory,
+)
+
+
+class ThroughputMetrics:
+    """Write the throughput of the training as lines of JSON.
+
+    Each line gives the throughput since the previous line:
+
+    - `step`: the training step;
+    - `time`: the Unix time;
+    - `rank`: the rank of the process in parallel training;
+    - `elapsed`: the wall time since the previous line, in seconds;
+    - `steps_per_second`, `frames_per_second` and `atoms_per_second`: the number
+      of the training steps, and the frames and the atoms in their batches, per second;
+    - `data_wait_fraction`: the fraction of the wall time spent in loading or
+      waiting for the training batches;
+    - `host_memory_peak`: the peak resident memory of the process, in bytes;
+    - `device_memory_peak`: the peak memory of the GPU, in bytes, if available;
+    - `fitting`: in multi-task mode, `steps`, `frames_per_second` and
+      `atoms_per_second` of each fitting net.
+
+    Parameters
+    ----------
+    metrics_file : str
+        The file to write
+    rank : int, default=0
+        The rank of the process
+    device : str, optional
+        The GPU of the process, e.g. `gpu:0`, whose memory is reported
+    multi_task : bool, default=False
+        Whether the metrics of each fitting net are reported
+    append : bool, default=False
+        Whether the lines are appended to an existing file, e.g. when the
+        training is restarted
+    """
+
+    def __init__(
+        self,
+        metrics_file: str,
+        rank: int = 0,
+        device: Optional[str] = None,
+        multi_task: bool = False,
+        append: bool = False,
+    ):
+        self.rank = rank
+        self.device = device
+        self.multi_task = multi_task
+        self._fp = open(metrics_file, "a" if append else "w")
+        self._tic = time.perf_counter()
+        self._data_wait_time = 0.0
+        self._counts = {}
+
+    def add_batch(self, batch: Dict, fitting_key: Optional[str] = None):
+        """Count a trained batch.
+
+        Parameters
+        ----------
+        batch : dict
+            The training batch, with `natoms_vec` and `coord`
+        fitting_key : str, optional
+            The fitting net trained by the batch in multi-task mode
+        """
+        nframes = batch["coord"].shape[0]
+        natoms = int(batch["natoms_vec"][0])
+        counts = self._counts.setdefault(fitting_key, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += nframes
+        counts[2] += nframes * natoms
+
+    def add_data_wait_time(self, wait_time: float):
+        """Add the time spent in loading or waiting for the training batches.
+
+        Parameters
+        ----------
+        wait_time : float
+            The time in seconds
+        """
+        self._data_wait_time += wait_time
+
+    def write(self, cur_batch: int):
+        """Write the throughput since the previous call.
+
+        Parameters
+        ----------
+        cur_batch : int
+            The current training step
+        """
+        toc = time.perf_counter()
+        elapsed = max(toc - self._tic, 1e-9)
+        nsteps = sum(cc[0] for cc in self._counts.values())
+        nframes = sum(cc[1] for cc in self._counts.values())
+        natoms = sum(cc[2] for cc in self._counts.values())
+        metrics = {
+            "step": cur_batch,
+            "time": time.time(),
+            "rank": self.rank,
+            "elapsed": elapsed,
+            "steps_per_second": nsteps / elapsed,
+            "frames_per_second": nframes / elapsed,
+            "atoms_per_second": natoms / elapsed,
+            "data_wait_fraction": self._data_wait_time / elapsed,
+            "host_memory_peak": get_peak_memory(),
+            "device_memory_peak": self._get_device_memory_peak(),
+        }
+        if self.multi_task:
+            metrics["fitting"] = {
+                fitting_key: {
+                    "steps": cc[0],
+                    "frames_per_second": cc[1] / elapsed,
+                    "atoms_per_second": cc[2] / elapsed,
+                }
+                for fitting_key, cc in self._counts.items()
+            }
+        self._fp.write(json.dumps(metrics) + "\n")
+        self._fp.flush()
+        self._tic = toc
+        self._data_wait_time = 0.0
+        self._counts = {}
+
+    def _get_device_memory_peak(self) -> Optional[int]:
+        if self.device is None or not self.device.startswith("gpu"):
+            return None
+        try:
+            return tf.config.experimental.get_memory_info(self.device.upper())["peak"]
+        except (AttributeError, ValueError, RuntimeError):
+            # not supported by the TensorFlow version
+            return None
+
+    def close(self):
+        """Close the metrics file."""
+        self._fp.close()
@@ -318,6 +318,8 @@ class TestParserOutput(unittest.TestCase):
             "--rand-seed": dict(type=(int, type(None)), value=12321),
             "--detail-file": dict(type=(str, type(None)), value="TARGET.FILE"),
             "--atomic": dict(type=bool),
+            "--chunk-size": dict(type=(int, type(None)), value=16),
+            "--jobs": dict(type=int, value=4),
         }
 
         self.run_test(command="test", mapping=ARGS)
@@ -354,6 +356,8 @@ class TestParserOutput(unittest.TestCase):
             "--set-prefix": dict(type=str, value="SET_PREFIX"),
             "--output": dict(type=str, value="OUTFILE"),
             "--frequency": dict(type=int, value=1),
+            "--chunk-size": dict(type=int, value=16),
+            "--resume": dict(type=bool),
         }
 
         self.run_test(command="model-devi", mapping=ARGS)
@@ -0,0 +1,48 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from common import (
+    j_loader,
+    run_dp,
+    tests_path,
+)
+
+
+class TestAsyncValidation(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        data_file = str(tests_path / os.path.join("model_compression", "data"))
+        jdata = j_loader(
+            str(tests_path / os.path.join("model_compression", "input.json"))
+        )
+        jdata["training"]["training_data"]["systems"] = data_file
+        jdata["training"]["validation_data"]["systems"] = data_file
+        jdata["training"]["numb_steps"] = 6
+        jdata["training"]["disp_freq"] = 2
+        jdata["training"]["save_freq"] = 3
+        jdata["training"]["async_valid"] = True
+        self.input = os.path.join(self.tmpdir, "input.json")
+        with open(self.input, "w") as fp:
+            json.dump(jdata, fp, indent=4)
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_lcurve(self):
+        ret = run_dp("dp train " + self.input)
+        np.testing.assert_equal(ret, 0, "DP train failed!")
+        with open("lcurve.out") as f:
+            header = f.readline()
+        self.assertTrue(header.startswith("#"))
+        self.assertIn("rmse_val", header)
+        lcurve = np.loadtxt("lcurve.out", ndmin=2)
+        # each line is written with the step it belongs to, in order
+        np.testing.assert_equal(lcurve[:, 0], [0, 2, 4, 6])
+        self.assertTrue(np.all(np.isfinite(lcurve)))
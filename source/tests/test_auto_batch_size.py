@@ -1,8 +1,12 @@
 import os
+import tempfile
 import unittest
 
 import numpy as np
 
+from deepmd.utils import (
+    batch_size,
+)
 from deepmd.utils.batch_size import (
     AutoBatchSize,
 )
@@ -89,3 +93,62 @@ class TestAutoBatchSize(unittest.TestCase):
         auto_batch_size = AutoBatchSize(256, 2.0)
         dd2 = auto_batch_size.execute_all(np.array, 10000, 2, dd1)
         np.testing.assert_equal(dd1, dd2)
+
+    @unittest.mock.patch("tensorflow.compat.v1.test.is_gpu_available")
+    def test_profile(self, mock_is_gpu_available):
+        mock_is_gpu_available.return_value = True
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profile = os.path.join(tmpdir, "profile.json")
+            auto_batch_size = AutoBatchSize(256, 2.0)
+            auto_batch_size.load_profile("model", profile)
+            # 128, 256, error at 512, 256
+            for _ in range(4):
+                auto_batch_size.execute(self.oom, 1, 2)
+            # a new run starts from the learned batch size
+            auto_batch_size = AutoBatchSize(256, 2.0)
+            auto_batch_size.load_profile("model", profile)
+            self.assertEqual(auto_batch_size.current_batch_size, 512)
+            self.assertEqual(auto_batch_size.minimal_not_working_batch_size, 1024)
+            nb, result = auto_batch_size.execute(self.oom, 1, 2)
+            self.assertEqual(nb, 256)
+            # other models do not share the profile
+            auto_batch_size = AutoBatchSize(256, 2.0)
+            auto_batch_size.load_profile("other_model", profile)
+            self.assertEqual(auto_batch_size.current_batch_size, 256)
+
+    @unittest.mock.patch("tensorflow.compat.v1.test.is_gpu_available")
+    def test_execute_memory_aware_cpu(self, mock_is_gpu_available):
+        mock_is_gpu_available.return_value = False
+        memory = {"peak": 1000}
+
+        def run(batch_size, start_index):
+            # 100 bytes per atom
+            memory["peak"] = 1000 + batch_size * 2 * 100
+            return batch_size, np.zeros((batch_size, 2))
+
+        with unittest.mock.patch.object(
+            batch_size, "get_peak_memory", lambda: memory["peak"]
+        ), unittest.mock.patch.object(
+            batch_size, "_get_available_memory", lambda: 1000000
+        ):
+            auto_batch_size = AutoBatchSize(256, 2.0, memory_aware=True)
+            for _ in range(8):
+                nb, result = auto_batch_size.execute(run, 1, 2)
+            # 8192 + 0.5 * 1000000 / 100 atoms
+            self.assertEqual(auto_batch_size.memory_limit_batch_size, 13192)
+            self.assertEqual(nb, 4096)
+
+    @unittest.mock.patch("tensorflow.compat.v1.test.is_gpu_available")
+    def test_execute_cpu_not_memory_aware(self, mock_is_gpu_available):
+        mock_is_gpu_available.return_value = False
+        with unittest.mock.patch.dict(os.environ):
+            os.environ.pop("DP_INFER_BATCH_SIZE_MEMORY_AWARE", None)
+            os.environ.pop("DP_INFER_BATCH_SIZE_PROFILE", None)
+            auto_batch_size = AutoBatchSize(256, 2.0)
+            for _ in range(4):
+                nb, result = auto_batch_size.execute(self.oom, 1, 2)
+            # the batch size on CPUs is not increased by default
+            self.assertEqual(nb, 128)
+            self.assertFalse(auto_batch_size.memory_aware)
+            # the profile is not used by default
+            self.assertEqual(batch_size.get_profile_path(), "")
@@ -0,0 +1,69 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.train.trainer import (
+    CheckpointWriter,
+)
+
+
+class TestCheckpointWriter(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def _train_and_save(self, asynchronous):
+        graph = tf.Graph()
+        with graph.as_default():
+            var = tf.Variable(np.zeros(3), name="weight")
+            update = tf.assign_add(var, np.ones(3))
+            sess = tf.Session(graph=graph)
+            sess.run(tf.global_variables_initializer())
+            saver = tf.train.Saver(save_relative_paths=True, max_to_keep=2)
+            writer = CheckpointWriter(
+                sess, saver, "model.ckpt", max_to_keep=2, asynchronous=asynchronous
+            )
+            for step in range(1, 5):
+                sess.run(update)
+                writer.save(step)
+                # the variables are changed while the checkpoint is being written
+                sess.run(update)
+            writer.close()
+            sess.close()
+
+    def _check_checkpoints(self):
+        # only the last two checkpoints are kept
+        self.assertEqual(len(glob.glob("model.ckpt-*.index")), 2)
+        self.assertEqual(len(glob.glob("model.ckpt-*.meta")), 2)
+        self.assertEqual(
+            os.path.basename(tf.train.latest_checkpoint(".")), "model.ckpt-4"
+        )
+        # restore from the symlinks, as dp freeze does
+        graph = tf.Graph()
+        with graph.as_default():
+            saver = tf.train.import_meta_graph("model.ckpt.meta")
+            with tf.Session(graph=graph) as sess:
+                saver.restore(sess, "model.ckpt")
+                value = sess.run(graph.get_tensor_by_name("weight:0"))
+        # the value when the last checkpoint was saved
+        np.testing.assert_allclose(value, np.full(3, 7.0))
+
+    def test_async(self):
+        self._train_and_save(asynchronous=True)
+        self._check_checkpoints()
+
+    def test_sync(self):
+        self._train_and_save(asynchronous=False)
+        self._check_checkpoints()
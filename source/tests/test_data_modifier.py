@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 import numpy as np
 from common import (
@@ -24,6 +25,9 @@ from deepmd.train.run_options import (
 from deepmd.train.trainer import (
     DPTrainer,
 )
+from deepmd.utils.data import (
+    DeepmdData,
+)
 from deepmd.utils.data_system import (
     DeepmdDataSystem,
 )
@@ -163,3 +167,30 @@ class TestDataModifier(tf.test.TestCase):
         np.testing.assert_almost_equal(
             t_esti.ravel(), vv.ravel(), places, err_msg="virial component failed"
         )
+
+    def test_correction_cache(self):
+        model_name = str(tests_path / os.path.join(modifier_datapath, "dipole.pb"))
+        sys_path = str(tests_path / os.path.join(modifier_datapath, "sys_10"))
+
+        def get_test(dcm, memmap=False):
+            data = DeepmdData(sys_path, shuffle_test=False, modifier=dcm, memmap=memmap)
+            data.add("energy", 1, atomic=False, must=False, high_prec=True)
+            data.add("force", 3, atomic=True, must=False, high_prec=False)
+            return data.get_test()
+
+        ref = get_test(DipoleChargeModifier(model_name, [-8], [6, 1], 1, 0.25))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dcm = DipoleChargeModifier(
+                model_name, [-8], [6, 1], 1, 0.25, correction_cache=cache_dir
+            )
+            test = get_test(dcm)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            # the cached corrections are used without evaluating the model
+            dcm.eval = None
+            cached = get_test(dcm)
+            mapped = get_test(dcm, memmap=True)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            for kk in ("energy", "force"):
+                np.testing.assert_allclose(test[kk], ref[kk])
+                np.testing.assert_allclose(cached[kk], ref[kk])
+                np.testing.assert_allclose(mapped[kk], ref[kk])
@@ -0,0 +1,85 @@
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from deepmd.utils.data import (
+    DeepmdData,
+)
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+)
+
+
+class TestDataShard(unittest.TestCase):
+    def setUp(self):
+        self.natoms = 2
+        self.set_nframes = {"sys_shard_0": [4, 5, 6], "sys_shard_1": [2]}
+        for sys_name, set_nframes in self.set_nframes.items():
+            os.makedirs(sys_name, exist_ok=True)
+            np.savetxt(
+                os.path.join(sys_name, "type.raw"), np.zeros(self.natoms), fmt="%d"
+            )
+            offset = 0
+            for jj, nframes in enumerate(set_nframes):
+                set_name = os.path.join(sys_name, "set.%03d" % jj)
+                os.makedirs(set_name, exist_ok=True)
+                # the coordinates are filled with the index of the frame in the system
+                coord = np.repeat(
+                    np.arange(offset, offset + nframes, dtype=float),
+                    self.natoms * 3,
+                ).reshape([nframes, -1])
+                np.save(os.path.join(set_name, "coord.npy"), coord)
+                np.save(
+                    os.path.join(set_name, "box.npy"),
+                    np.tile(np.eye(3).reshape([1, 9]) * 10, [nframes, 1]),
+                )
+                offset += nframes
+
+    def tearDown(self):
+        for sys_name in self.set_nframes:
+            shutil.rmtree(sys_name)
+
+    def _get_frames(self, data):
+        frames = set()
+        for _ in range(50):
+            batch = data.get_batch(2)
+            frames.update(batch["coord"][:, 0].astype(int).tolist())
+        return frames
+
+    def test_frames(self):
+        nproc = 4
+        all_frames = []
+        for rank in range(nproc):
+            data = DeepmdData("sys_shard_0", trn_all_set=True, shard=(rank, nproc))
+            data.add("coord", 3, atomic=True, must=True)
+            all_frames.append(self._get_frames(data))
+        # contiguous blocks of nearly equal sizes
+        self.assertEqual(all_frames[0], {0, 1, 2})
+        self.assertEqual(all_frames[1], {3, 4, 5, 6})
+        self.assertEqual(all_frames[2], {7, 8, 9, 10})
+        self.assertEqual(all_frames[3], {11, 12, 13, 14})
+        # the sets out of the block are not used
+        data = DeepmdData("sys_shard_0", trn_all_set=True, shard=(0, nproc))
+        self.assertEqual(data.get_numb_set(), 1)
+
+    def test_memmap(self):
+        data = DeepmdData("sys_shard_0", trn_all_set=True, memmap=True, shard=(1, 4))
+        data.add("coord", 3, atomic=True, must=True)
+        self.assertEqual(self._get_frames(data), {3, 4, 5, 6})
+
+    def test_small_system(self):
+        # fewer frames than shards
+        data = DeepmdData("sys_shard_1", trn_all_set=True, shard=(3, 4))
+        data.add("coord", 3, atomic=True, must=True)
+        self.assertEqual(self._get_frames(data), {0, 1})
+
+    def test_sys_probs(self):
+        systems = list(self.set_nframes)
+        ds = DeepmdDataSystem(systems, 1, 1, 2.0, trn_all_set=True)
+        for rank in range(4):
+            ds_shard = DeepmdDataSystem(
+                systems, 1, 1, 2.0, trn_all_set=True, shard=(rank, 4)
+            )
+            np.testing.assert_allclose(ds_shard.sys_probs, ds.sys_probs)
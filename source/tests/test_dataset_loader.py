@@ -0,0 +1,65 @@
+import os
+import shutil
+import unittest
+
+import numpy as np
+
+from deepmd.env import (
+    tf,
+)
+from deepmd.train.trainer import (
+    DatasetLoader,
+)
+from deepmd.utils.data_system import (
+    DeepmdDataSystem,
+)
+
+
+class TestDatasetLoaderPrefetch(unittest.TestCase):
+    def setUp(self):
+        self.nsys = 3
+        self.nframes = [3, 6, 5]
+        self.natoms = [3, 4, 6]
+        self.sys_name = []
+        for ii in range(self.nsys):
+            sys_name = "sys_prefetch_%d" % ii
+            self.sys_name.append(sys_name)
+            set_name = os.path.join(sys_name, "set.000")
+            os.makedirs(set_name, exist_ok=True)
+            np.savetxt(
+                os.path.join(sys_name, "type.raw"),
+                np.arange(self.natoms[ii]) % 2,
+                fmt="%d",
+            )
+            # the coordinates are filled with the index of the system
+            np.save(
+                os.path.join(set_name, "coord.npy"),
+                np.full([self.nframes[ii], self.natoms[ii] * 3], float(ii)),
+            )
+            np.save(
+                os.path.join(set_name, "box.npy"),
+                np.tile(np.eye(3).reshape([1, 9]) * 10, [self.nframes[ii], 1]),
+            )
+        self.data = DeepmdDataSystem(self.sys_name, 2, 1, 2.0)
+
+    def tearDown(self):
+        for sys_name in self.sys_name:
+            shutil.rmtree(sys_name)
+
+    def test_prefetch(self):
+        loader = DatasetLoader(self.data, prefetch_depth=4, prefetch_workers=2)
+        data_op = loader.build()
+        with tf.Session() as sess:
+            for _ in range(10):
+                batch = loader.get_data_dict(sess.run(data_op))
+                natoms = batch["natoms_vec"][0]
+                sys_idx = self.natoms.index(natoms)
+                self.assertEqual(batch["coord"].shape[1], natoms * 3)
+                np.testing.assert_equal(batch["coord"], float(sys_idx))
+        loader.close()
+        stat = loader.get_prefetch_stat()
+        self.assertEqual(stat["nbatches"], 10)
+        self.assertLessEqual(stat["nstarved"], 10)
+        self.assertLessEqual(stat["qsize"], 4)
+        loader.reset_prefetch_stat()
+        self.assertEqual(loader.get_prefetch_stat()["nbatches"], 0)
@@ -645,6 +645,23 @@ class TestDeepDipoleNewPBC(unittest.TestCase):
             vv.reshape([-1]), expected_gv.reshape([-1]), decimal=default_places
         )
 
+    def test_3frame_full_atm_auto_batch_size(self):
+        natoms = len(self.atype)
+        nframes = 3
+        coords3 = np.concatenate([self.coords] * nframes)
+        box3 = np.concatenate([self.box] * nframes)
+        # one frame in each batch
+        dp = DeepDipole("deepdipole_new.pb", auto_batch_size=natoms)
+        expected = list(self.dp.eval_full(coords3, box3, self.atype, atomic=True)) + [
+            self.dp.eval(coords3, box3, self.atype)
+        ]
+        results = list(dp.eval_full(coords3, box3, self.atype, atomic=True)) + [
+            dp.eval(coords3, box3, self.atype)
+        ]
+        for rr, ee in zip(results, expected):
+            self.assertEqual(rr.shape, ee.shape)
+            np.testing.assert_almost_equal(rr, ee, decimal=default_places)
+
 
 @unittest.skipIf(
     parse_version(tf.__version__) < parse_version("1.15"),
@@ -1,7 +1,11 @@
 import copy
 import os
 import shutil
+import tempfile
 import unittest
+from unittest import (
+    mock,
+)
 
 import numpy as np
 from common import (
@@ -11,9 +15,13 @@ from common import (
 from deepmd.env import (
     GLOBAL_NP_FLOAT_PRECISION,
 )
+from deepmd.utils import random as dp_random
 from deepmd.utils.data import (
     DeepmdData,
 )
+from deepmd.utils.data_index import (
+    DataSystemIndex,
+)
 
 if GLOBAL_NP_FLOAT_PRECISION == np.float32:
     places = 6
@@ -288,6 +296,102 @@ class TestData(unittest.TestCase):
         nb = dd.get_numb_batch(2, 0)
         self.assertEqual(nb, 2)
 
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch.dict(
+            os.environ, {"DP_DATA_CACHE_DIR": cache_dir}
+        ):
+            dd = DeepmdData(self.data_name)
+            self.assertEqual(
+                dd.index.cache_path.name,
+                DataSystemIndex.index_name,
+            )
+            self.assertTrue(dd.index.cache_path.is_file())
+            self.assertTrue(str(dd.index.cache_path).startswith(cache_dir))
+            self.assertEqual(dd.index.get_nframes(dd.test_dir), 2)
+            self.assertEqual(dd.index.get_natoms(dd.test_dir), self.natoms)
+            arrays = dd.index.get_arrays(dd.train_dirs[1])
+            self.assertEqual(
+                set(arrays.keys()), {"coord", "box", "test_atomic", "test_frame"}
+            )
+            self.assertEqual(arrays["test_atomic"]["shape"], [self.nframes, 14])
+            # the cached index is invalidated by changed files
+            np.save(
+                os.path.join(self.data_name, "set.tar", "coord.npy"),
+                np.random.random([3, 3 * self.natoms]),
+            )
+            dd = DeepmdData(self.data_name)
+            self.assertEqual(dd.index.get_nframes(dd.test_dir), 3)
+        # nothing is written into the data system
+        self.assertFalse(
+            any(ff.startswith(".") for ff in os.listdir(self.data_name)),
+        )
+
+    def test_index_no_cache(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("DP_DATA_CACHE_DIR", None)
+            dd = DeepmdData(self.data_name)
+        self.assertIsNone(dd.index.cache_path)
+        self.assertEqual(dd.index.get_nframes(dd.test_dir), 2)
+
+    def test_memmap_get_batch(self):
+        dd = DeepmdData(self.data_name, memmap=True).add(
+            "test_atomic", 7, atomic=True, must=False
+        )
+        dd.reduce("redu", "test_atomic")
+        data = dd.get_batch(5)
+        self.assertIsInstance(data["coord"], np.ndarray)
+        self.assertEqual(data["coord"].dtype, GLOBAL_NP_FLOAT_PRECISION)
+        self._comp_np_mat2(
+            np.sort(data["coord"], axis=0), np.sort(self.coord_bar, axis=0)
+        )
+        data = dd.get_batch(5)
+        self._comp_np_mat2(np.sort(data["coord"], axis=0), np.sort(self.coord, axis=0))
+        self._comp_np_mat2(
+            np.sort(data["test_atomic"], axis=0), np.sort(self.test_atomic, axis=0)
+        )
+        self._comp_np_mat2(
+            np.sort(data["redu"], axis=0), np.sort(self.redu_atomic, axis=0)
+        )
+
+    def test_memmap_same_as_eager(self):
+        batches = []
+        for memmap in (False, True):
+            dp_random.seed(1)
+            dd = DeepmdData(self.data_name, memmap=memmap).add(
+                "test_atomic", 7, atomic=True, must=False, repeat=2
+            )
+            batches.append([dd.get_batch(3) for _ in range(6)] + [dd.get_test()])
+        for bb_eager, bb_mmap in zip(*batches):
+            self.assertEqual(bb_eager.keys(), bb_mmap.keys())
+            for kk in bb_eager:
+                np.testing.assert_array_equal(bb_eager[kk], bb_mmap[kk])
+
+    def test_iter_test(self):
+        dd = DeepmdData(self.data_name, shuffle_test=False).add(
+            "test_frame", 5, atomic=False, must=False
+        )
+        test = dd.get_test(ntests=4)
+        chunks = list(
+            DeepmdData(self.data_name, shuffle_test=False, memmap=True)
+            .add("test_frame", 5, atomic=False, must=False)
+            .iter_test(1, ntests=4)
+        )
+        self.assertEqual([cc["coord"].shape[0] for cc in chunks], [1, 1])
+        for kk in ("coord", "box", "type", "test_frame"):
+            np.testing.assert_array_equal(
+                np.concatenate([cc[kk] for cc in chunks]), test[kk]
+            )
+
+    def test_iter_frames(self):
+        dd = DeepmdData(self.data_name, memmap=True)
+        chunks = list(dd.iter_frames(3, start=4))
+        # set.bar, set.foo and set.tar are iterated in order, 4 frames skipped
+        self.assertEqual([cc["coord"].shape[0] for cc in chunks], [1, 3, 2, 2])
+        coord = np.concatenate([cc["coord"] for cc in chunks])
+        self._comp_np_mat2(
+            coord, np.concatenate([self.coord_bar[4:], self.coord, self.coord_tar])
+        )
+
     def _comp_np_mat2(self, first, second):
         np.testing.assert_almost_equal(first, second, places)
 
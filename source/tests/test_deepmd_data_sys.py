@@ -422,3 +422,32 @@ class TestDataSystem(unittest.TestCase):
                 data[kk][0, 3 * self.test_ndof : 6 * self.test_ndof],
                 np.zeros(3 * self.test_ndof),
             )
+
+    def test_get_mixed_batch_same_as_per_frame(self):
+        """Test mixed batches are the same as those merged from the frames got one by one."""
+        batches = []
+        for per_frame in (True, False):
+            # the sets are shuffled when the data are added
+            random.seed(7)
+            ds = DeepmdDataSystem(self.sys_name, "mixed:8", 2, 2.0)
+            ds.add("test", self.test_ndof, atomic=True, must=True)
+            ds.add("null", self.test_ndof, atomic=True, must=False)
+            ds._make_default_mesh()
+            batches.append([])
+            # the sets are reloaded many times
+            for _ in range(20):
+                if per_frame:
+                    batch_data = []
+                    for _ in range(8):
+                        ii = random.choice(np.arange(ds.nsystems), p=ds.sys_probs)
+                        bb_data = ds.data_systems[ii].get_batch(1)
+                        bb_data["natoms_vec"] = ds.natoms_vec[ii]
+                        bb_data["default_mesh"] = ds.default_mesh[ii]
+                        batch_data.append(bb_data)
+                    batches[-1].append(ds._merge_batch_data(batch_data))
+                else:
+                    batches[-1].append(ds.get_batch())
+        for bb0, bb1 in zip(*batches):
+            self.assertEqual(bb0.keys(), bb1.keys())
+            for kk in bb0:
+                np.testing.assert_array_equal(bb0[kk], bb1[kk])
@@ -1,6 +1,9 @@
 import os
 import shutil
 import unittest
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
 
 import numpy as np
 from common import (
@@ -14,6 +17,7 @@ from deepmd.env import (
 )
 from deepmd.infer import (
     DeepPot,
+    DeepPotPool,
 )
 from deepmd.utils.convert import (
     convert_dp10_to_dp11,
@@ -300,6 +304,91 @@ class TestDeepPotAPBC(unittest.TestCase):
         expected_sv = np.sum(expected_v.reshape([nframes, -1, 9]), axis=1)
         np.testing.assert_almost_equal(vv.ravel(), expected_sv.ravel(), default_places)
 
+    def test_eval_many(self):
+        coords = self.coords.reshape([-1, 3])
+        box2 = np.concatenate((self.box, self.box))
+        structures = [
+            (self.coords, self.box, self.atype),
+            (coords[:3].reshape([1, -1]), self.box, self.atype[:3]),
+            (np.concatenate((self.coords, self.coords)), box2, self.atype),
+            (self.coords, None, self.atype),
+        ]
+        results = self.dp.eval_many(*zip(*structures), atomic=True)
+        self.assertEqual(len(results), len(structures))
+        for (cc, bb, tt), rr in zip(structures, results):
+            expected = self.dp.eval(cc, bb, tt, atomic=True)
+            for r1, e1 in zip(rr, expected):
+                self.assertEqual(r1.shape, e1.shape)
+                np.testing.assert_almost_equal(r1, e1, default_places)
+
+    def test_2frame_atm_out(self):
+        coords2 = np.concatenate((self.coords, self.coords))
+        box2 = np.concatenate((self.box, self.box))
+        nframes = 2
+        natoms = len(self.atype)
+        out = (
+            np.empty((nframes, 1)),
+            np.empty((nframes, natoms, 3)),
+            np.empty((nframes, 9)),
+            np.empty((nframes, natoms, 1)),
+            np.empty((nframes, natoms, 9)),
+        )
+        # the second call reuses the cached inputs of the same system
+        for _ in range(2):
+            ret = self.dp.eval(coords2, box2, self.atype, atomic=True, out=out)
+            for rr, oo in zip(ret, out):
+                self.assertIs(rr, oo)
+            ee, ff, vv, ae, av = out
+            expected_f = np.concatenate((self.expected_f, self.expected_f), axis=0)
+            expected_e = np.concatenate((self.expected_e, self.expected_e), axis=0)
+            expected_v = np.concatenate((self.expected_v, self.expected_v), axis=0)
+            np.testing.assert_almost_equal(
+                ff.ravel(), expected_f.ravel(), default_places
+            )
+            np.testing.assert_almost_equal(
+                ae.ravel(), expected_e.ravel(), default_places
+            )
+            np.testing.assert_almost_equal(
+                av.ravel(), expected_v.ravel(), default_places
+            )
+            expected_se = np.sum(expected_e.reshape([nframes, -1]), axis=1)
+            np.testing.assert_almost_equal(
+                ee.ravel(), expected_se.ravel(), default_places
+            )
+            expected_sv = np.sum(expected_v.reshape([nframes, -1, 9]), axis=1)
+            np.testing.assert_almost_equal(
+                vv.ravel(), expected_sv.ravel(), default_places
+            )
+
+
+class TestDeepPotPoolPBC(TestDeepPotAPBC):
+    @classmethod
+    def setUpClass(cls):
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")), "deeppot.pb"
+        )
+        cls.dp = DeepPotPool("deeppot.pb", nlanes=2)
+
+    def test_concurrent(self):
+        self.dp.reset_latency_stat()
+        nframes = 8
+        coords = [self.coords + 0.01 * ii for ii in range(nframes)]
+        with ThreadPoolExecutor(4) as executor:
+            results = list(
+                executor.map(lambda cc: self.dp.eval(cc, self.box, self.atype), coords)
+            )
+        ref_e, ref_f, ref_v = self.dp.eval(
+            np.stack(coords), np.tile(self.box, [nframes, 1]), self.atype
+        )
+        for ii, (ee, ff, vv) in enumerate(results):
+            np.testing.assert_almost_equal(ee, ref_e[ii : ii + 1], default_places)
+            np.testing.assert_almost_equal(ff, ref_f[ii : ii + 1], default_places)
+            np.testing.assert_almost_equal(vv, ref_v[ii : ii + 1], default_places)
+        stat = self.dp.get_latency_stat()
+        self.assertEqual(stat["ncalls"], nframes + 1)
+        self.assertEqual(stat["nframes"], 2 * nframes)
+        self.assertGreater(self.dp.last_latency, 0.0)
+
 
 class TestDeepPotANoPBC(unittest.TestCase):
     @classmethod
@@ -695,6 +784,42 @@ class TestDeepPotALargeBoxNoPBC(unittest.TestCase):
         expected_se = np.sum(self.expected_e.reshape([nframes, -1]), axis=1)
         np.testing.assert_almost_equal(ee.ravel(), expected_se.ravel(), default_places)
 
+    def test_ase_steps(self):
+        from ase import (
+            Atoms,
+        )
+
+        from deepmd.calculator import (
+            DP,
+        )
+
+        calc = DP("deeppot.pb")
+        water = Atoms(
+            "OHHOHH",
+            positions=self.coords.reshape((-1, 3)),
+            cell=self.box.reshape((3, 3)),
+            pbc=True,
+            calculator=calc,
+        )
+        atype = [calc.type_dict[ss] for ss in water.get_chemical_symbols()]
+        for ii in range(3):
+            # only the positions are changed between the steps
+            water.positions = self.coords.reshape((-1, 3)) + 0.01 * ii
+            ee = water.get_potential_energy()
+            ff = water.get_forces()
+            ss = water.get_stress()
+            expected_e, expected_f, expected_v = self.dp.eval(
+                water.positions.reshape([1, -1]), self.box, atype
+            )
+            np.testing.assert_almost_equal(ee, expected_e[0, 0], default_places)
+            np.testing.assert_almost_equal(ff, expected_f[0], default_places)
+            expected_v = expected_v.reshape([3, 3])
+            expected_s = -0.5 * (expected_v + expected_v.T) / water.get_volume()
+            np.testing.assert_almost_equal(
+                ss, expected_s.flat[[0, 4, 8, 5, 2, 1]], default_places
+            )
+        self.assertEqual(calc.timing["ncalls"], 3)
+
 
 class TestModelConvert(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,103 @@
+import os
+import threading
+import unittest
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
+
+import numpy as np
+from common import (
+    tests_path,
+)
+
+from deepmd.env import (
+    GLOBAL_NP_FLOAT_PRECISION,
+)
+from deepmd.infer import (
+    DeepPot,
+    DeepPotClient,
+)
+from deepmd.infer.deep_pot_server import (
+    make_server,
+)
+from deepmd.utils.convert import (
+    convert_pbtxt_to_pb,
+)
+
+if GLOBAL_NP_FLOAT_PRECISION == np.float32:
+    default_places = 4
+else:
+    default_places = 10
+
+
+class TestDeepPotServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")), "deeppot.pb"
+        )
+        cls.dp = DeepPot("deeppot.pb")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove("deeppot.pb")
+        cls.dp = None
+
+    def setUp(self):
+        self.coords = np.array(
+            [
+                [12.83, 2.56, 2.18],
+                [12.09, 2.87, 2.74],
+                [00.25, 3.32, 1.68],
+                [3.36, 3.00, 1.81],
+                [3.51, 2.51, 2.60],
+                [4.27, 3.22, 1.56],
+            ]
+        ).reshape([1, -1])
+        self.atype = [0, 1, 1, 0, 1, 1]
+        self.box = np.array([13.0, 0.0, 0.0, 0.0, 13.0, 0.0, 0.0, 0.0, 13.0])
+
+    def _test_client(self, server, address):
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = DeepPotClient(address)
+            self.assertEqual(client.get_type_map(), self.dp.get_type_map())
+            self.assertAlmostEqual(client.get_rcut(), self.dp.get_rcut())
+            nframes = 16
+            coords = [self.coords + 0.01 * ii for ii in range(nframes)]
+            with ThreadPoolExecutor(8) as executor:
+                results = list(
+                    executor.map(
+                        lambda cc: client.eval(cc, self.box, self.atype, atomic=True),
+                        coords,
+                    )
+                )
+            expected = self.dp.eval(
+                np.concatenate(coords),
+                np.tile(self.box, [nframes, 1]),
+                self.atype,
+                atomic=True,
+            )
+            for ii, result in enumerate(results):
+                self.assertEqual(len(result), 5)
+                for rr, ee in zip(result, expected):
+                    np.testing.assert_almost_equal(rr, ee[ii : ii + 1], default_places)
+            # non-periodic requests are not batched with periodic ones
+            ee, ff, vv = client.eval(self.coords, None, self.atype)
+            e0, f0, v0 = self.dp.eval(self.coords, None, self.atype)
+            np.testing.assert_almost_equal(ff, f0, default_places)
+            self.assertEqual(server.batcher.nrequests, nframes + 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.batcher.close()
+
+    def test_http(self):
+        server = make_server(self.dp, port=0, max_delay=0.05)
+        self._test_client(server, "http://127.0.0.1:%d" % server.server_address[1])
+
+    def test_unix_socket(self):
+        server = make_server(self.dp, socket_path="deeppot.sock", max_delay=0.05)
+        self._test_client(server, "unix://deeppot.sock")
+        os.remove("deeppot.sock")
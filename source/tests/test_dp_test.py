@@ -0,0 +1,220 @@
+import glob
+import os
+import shutil
+import unittest
+
+import numpy as np
+from common import (
+    tests_path,
+)
+
+from deepmd.entrypoints.test import (
+    make_test_data,
+)
+from deepmd.entrypoints.test import test_ener as dp_test_ener
+from deepmd.entrypoints.test import test as dp_test
+from deepmd.infer import (
+    DeepPot,
+)
+from deepmd.utils.convert import (
+    convert_pbtxt_to_pb,
+)
+
+default_places = 6
+
+
+def gen_test_sys(sys_path, nframes, seed):
+    """Generate a water system labeled with random energies, forces and virials."""
+    rng = np.random.default_rng(seed)
+    coord = np.array(
+        [
+            12.83,
+            2.56,
+            2.18,
+            12.09,
+            2.87,
+            2.74,
+            00.25,
+            3.32,
+            1.68,
+            3.36,
+            3.00,
+            1.81,
+            3.51,
+            2.51,
+            2.60,
+            4.27,
+            3.22,
+            1.56,
+        ]
+    )
+    natoms = coord.size // 3
+    set_path = os.path.join(sys_path, "set.000")
+    os.makedirs(set_path, exist_ok=True)
+    np.savetxt(os.path.join(sys_path, "type.raw"), [0, 1, 1, 0, 1, 1], fmt="%d")
+    with open(os.path.join(sys_path, "type_map.raw"), "w") as f:
+        f.write("O\nH\n")
+    np.save(
+        os.path.join(set_path, "coord.npy"),
+        coord + 0.1 * rng.random([nframes, natoms * 3]),
+    )
+    np.save(
+        os.path.join(set_path, "box.npy"),
+        np.tile(np.eye(3).reshape([1, 9]) * 13.0, [nframes, 1]),
+    )
+    np.save(os.path.join(set_path, "energy.npy"), rng.random([nframes]) - 93.0)
+    np.save(os.path.join(set_path, "force.npy"), rng.random([nframes, natoms * 3]))
+    np.save(os.path.join(set_path, "virial.npy"), rng.random([nframes, 9]))
+
+
+class TestDPTestChunk(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")),
+            "deeppot_dp_test.pb",
+        )
+        cls.dp = DeepPot("deeppot_dp_test.pb")
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove("deeppot_dp_test.pb")
+        cls.dp = None
+
+    def setUp(self):
+        self.system = "dp_test_chunk_sys"
+        self.nframes = 5
+        gen_test_sys(self.system, self.nframes, seed=0)
+        self.detail_files = ["dp_test_detail_ref", "dp_test_detail_chunk"]
+
+    def tearDown(self):
+        shutil.rmtree(self.system)
+        for detail_file in self.detail_files:
+            for ff in glob.glob(detail_file + ".*"):
+                os.remove(ff)
+
+    def _test_ener(self, chunk_size, detail_file=None, numb_test=-1):
+        data = make_test_data(self.dp, self.system, "set", False, chunk_size)
+        return dp_test_ener(
+            self.dp,
+            data,
+            self.system,
+            numb_test,
+            detail_file,
+            False,
+            chunk_size=chunk_size,
+        )
+
+    def test_same_as_unchunked(self):
+        err_ref = self._test_ener(None, self.detail_files[0])
+        err_chunk = self._test_ener(2, self.detail_files[1])
+        for kk, (vv, size) in err_ref.items():
+            self.assertAlmostEqual(err_chunk[kk][0], vv, places=default_places)
+            self.assertEqual(err_chunk[kk][1], size)
+        for suffix in (
+            ".e.out",
+            ".e_peratom.out",
+            ".f.out",
+            ".v.out",
+            ".v_peratom.out",
+        ):
+            with open(self.detail_files[0] + suffix) as f:
+                lines_ref = f.readlines()
+            with open(self.detail_files[1] + suffix) as f:
+                lines_chunk = f.readlines()
+            # one header for the system
+            self.assertEqual(lines_chunk[0], lines_ref[0])
+            self.assertEqual(sum(ll.startswith("#") for ll in lines_chunk), 1)
+            np.testing.assert_almost_equal(
+                np.loadtxt(lines_chunk, ndmin=2),
+                np.loadtxt(lines_ref, ndmin=2),
+                default_places,
+            )
+
+    def test_force_per_type(self):
+        # only given with chunk_size
+        err_ref = self._test_ener(None)
+        self.assertNotIn("mae_f_O", err_ref)
+        err_chunk = self._test_ener(2, self.detail_files[1])
+        pf = np.loadtxt(self.detail_files[1] + ".f.out").reshape([self.nframes, -1, 6])
+        diff_f = pf[:, :, 3:] - pf[:, :, :3]
+        # the atoms are sorted by their types in the data
+        atype = np.sort([0, 1, 1, 0, 1, 1])
+        for ii, tname in enumerate(["O", "H"]):
+            diff_ft = diff_f[:, atype == ii]
+            self.assertAlmostEqual(
+                err_chunk[f"mae_f_{tname}"][0],
+                np.mean(np.abs(diff_ft)),
+                places=default_places,
+            )
+            self.assertAlmostEqual(
+                err_chunk[f"rmse_f_{tname}"][0],
+                np.sqrt(np.mean(diff_ft * diff_ft)),
+                places=default_places,
+            )
+            self.assertEqual(err_chunk[f"mae_f_{tname}"][1], diff_ft.size)
+
+    def test_empty(self):
+        for chunk_size in (None, 2):
+            err = self._test_ener(chunk_size, numb_test=0)
+            self.assertTrue(np.isnan(err["mae_e"][0]))
+            self.assertEqual(err["mae_e"][1], 0)
+
+
+class TestDPTestJobs(unittest.TestCase):
+    def setUp(self):
+        convert_pbtxt_to_pb(
+            str(tests_path / os.path.join("infer", "deeppot.pbtxt")),
+            "deeppot_dp_test_jobs.pb",
+        )
+        self.root = "dp_test_jobs_sys"
+        for ii in range(4):
+            gen_test_sys(os.path.join(self.root, f"sys_{ii}"), 2 + ii, seed=ii)
+        self.detail_files = ["dp_test_detail_jobs_1", "dp_test_detail_jobs_2"]
+
+    def tearDown(self):
+        os.remove("deeppot_dp_test_jobs.pb")
+        shutil.rmtree(self.root)
+        for detail_file in self.detail_files:
+            for ff in glob.glob(detail_file + ".*"):
+                os.remove(ff)
+
+    def _dp_test(self, jobs, detail_file):
+        with self.assertLogs("deepmd.entrypoints.test", level="INFO") as cm:
+            dp_test(
+                model="deeppot_dp_test_jobs.pb",
+                system=self.root,
+                datafile=None,
+                set_prefix="set",
+                numb_test=100,
+                rand_seed=None,
+                shuffle_test=False,
+                detail_file=detail_file,
+                atomic=False,
+                jobs=jobs,
+            )
+        return cm.output
+
+    def test_same_as_serial(self):
+        output_serial = self._dp_test(1, self.detail_files[0])
+        output_parallel = self._dp_test(2, self.detail_files[1])
+        self.assertEqual(output_parallel, output_serial)
+        systems = [
+            ll.split("# testing system : ")[-1]
+            for ll in output_serial
+            if "# testing system : " in ll
+        ]
+        self.assertEqual(len(systems), 4)
+        for suffix in (".e.out", ".f.out", ".v.out"):
+            with open(self.detail_files[0] + suffix) as f:
+                detail_serial = f.read()
+            with open(self.detail_files[1] + suffix) as f:
+                detail_parallel = f.read()
+            self.assertEqual(detail_parallel, detail_serial)
+            # a header for each system, in the order of the systems
+            headers = [
+                ll[2:].split(":")[0]
+                for ll in detail_parallel.splitlines()
+                if ll.startswith("# ")
+            ]
+            self.assertEqual(headers, systems)
@@ -7,6 +7,7 @@ from deepmd.env import (
 )
 from deepmd.infer.ewald_recp import (
     EwaldRecp,
+    EwaldRecpPME,
     op_module,
 )
 
@@ -87,6 +88,41 @@ class TestEwaldRecp(tf.test.TestCase):
         np.testing.assert_almost_equal(f, f1, places, err_msg="force component failed")
         np.testing.assert_almost_equal(v, v, places, err_msg="virial component failed")
 
+    def test_pme(self):
+        er = EwaldRecp(self.ewald_h, self.ewald_beta)
+        e, f, v = er.eval(self.dcoord, self.dcharge, self.dbox)
+        for order, oversampling, places in ((8, 2.0, 4), (10, 3.0, 6)):
+            if GLOBAL_NP_FLOAT_PRECISION == np.float32:
+                places = global_default_places
+            pme = EwaldRecpPME(
+                self.ewald_h, self.ewald_beta, order=order, oversampling=oversampling
+            )
+            e1, f1, v1 = pme.eval(self.dcoord, self.dcharge, self.dbox)
+            np.testing.assert_almost_equal(e1, e, places, err_msg="energy failed")
+            np.testing.assert_almost_equal(f1, f, places, err_msg="force failed")
+            np.testing.assert_almost_equal(v1, v, places, err_msg="virial failed")
+
+    def test_pme_force(self):
+        hh = 1e-4
+        places = 6
+        pme = EwaldRecpPME(self.ewald_h, self.ewald_beta)
+        _, force, _ = pme.eval(self.dcoord, self.dcharge, self.dbox)
+        for idx in range(self.natoms):
+            for dd in range(3):
+                dcoordp = np.copy(self.dcoord)
+                dcoordm = np.copy(self.dcoord)
+                dcoordp[:, idx * 3 + dd] = self.dcoord[:, idx * 3 + dd] + hh
+                dcoordm[:, idx * 3 + dd] = self.dcoord[:, idx * 3 + dd] - hh
+                energyp, _, _ = pme.eval(dcoordp, self.dcharge, self.dbox)
+                energym, _, _ = pme.eval(dcoordm, self.dcharge, self.dbox)
+                c_force = -(energyp - energym) / (2 * hh)
+                np.testing.assert_almost_equal(
+                    c_force,
+                    force[:, idx * 3 + dd],
+                    places,
+                    err_msg="force component [%d,%d] failed" % (idx, dd),
+                )
+
     def test_force(self):
         hh = 1e-4
         places = 6
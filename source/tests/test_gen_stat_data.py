@@ -1,3 +1,4 @@
+import os
 import shutil
 import unittest
 
@@ -10,6 +11,9 @@ from deepmd.descriptor import (
 from deepmd.fit import (
     EnerFitting,
 )
+from deepmd.model import (
+    EnerModel,
+)
 from deepmd.model.model_stat import (
     _make_all_stat_ref,
     make_stat_input,
@@ -39,6 +43,15 @@ def gen_sys(nframes, atom_types):
     return data
 
 
+def gen_pbc_sys(nframes, atom_types, box_size=10.0):
+    """Generate a periodic system whose box is larger than the cutoff radius."""
+    data = gen_sys(nframes, atom_types)
+    natoms = len(atom_types)
+    data["coords"] = np.random.random([nframes, natoms, 3]) * box_size
+    data["cells"] = np.tile(np.eye(3).reshape([1, 9]) * box_size, [nframes, 1])
+    return data
+
+
 class TestGenStatData(unittest.TestCase):
     def setUp(self):
         data0 = gen_sys(20, [0, 1, 0, 2, 1])
@@ -140,3 +153,46 @@ class TestEnerShift(unittest.TestCase):
         tot0 = np.dot(data.compute_energy_shift(rcond=1), natoms)
         tot1 = np.dot(ener_shift1, natoms)
         np.testing.assert_almost_equal(tot0, tot1)
+
+
+class TestDataStatCache(unittest.TestCase):
+    def setUp(self):
+        for ii, atom_types in enumerate([[0, 1, 0, 2, 1], [0, 1, 0, 0], [2, 1, 1]]):
+            sys = dpdata.LabeledSystem()
+            sys.data = gen_pbc_sys(20, atom_types)
+            sys.to_deepmd_npy("system_%d" % ii, set_size=10)
+        self.cache_dir = "data_stat_cache"
+
+    def tearDown(self):
+        for ii in range(3):
+            shutil.rmtree("system_%d" % ii)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _data_stat(self, systems, cache_dir):
+        dp_random.seed(0)
+        data = DeepmdDataSystem(systems, 5, 10, 6.0)
+        data.add("energy", 1, must=True)
+        descrpt = DescrptSeA(6.0, 5.8, [46, 92, 46], neuron=[25, 50], axis_neuron=16)
+        fitting = EnerFitting(descrpt, neuron=[24, 24])
+        model = EnerModel(
+            descrpt, fitting, data_stat_nbatch=2, data_stat_cache=cache_dir
+        )
+        model.data_stat(data)
+        return descrpt, fitting
+
+    def _comp_stat(self, stat0, stat1):
+        np.testing.assert_almost_equal(stat0[0].davg, stat1[0].davg)
+        np.testing.assert_almost_equal(stat0[0].dstd, stat1[0].dstd)
+        np.testing.assert_almost_equal(stat0[1].bias_atom_e, stat1[1].bias_atom_e)
+
+    def test_cache(self):
+        systems = ["system_0", "system_1"]
+        ref = self._data_stat(systems, None)
+        self._comp_stat(ref, self._data_stat(systems, self.cache_dir))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        # all systems are loaded from the cache
+        self._comp_stat(ref, self._data_stat(systems, self.cache_dir))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        # only the new system is computed
+        self._data_stat(systems + ["system_2"], self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
@@ -0,0 +1,57 @@
+"""Test that the commands without computation do not import TensorFlow."""
+
+import json
+import subprocess as sp
+import sys
+import unittest
+
+from common import (
+    tests_path,
+)
+
+from deepmd.common import (
+    ACTIVATION_FN_DICT,
+    PRECISION_DICT,
+    VALID_ACTIVATION,
+    VALID_PRECISION,
+)
+
+# the time of the first import is dominated by reading the files from
+# the disk, so the bound is loose to avoid spurious failures
+MAX_IMPORT_TIME = 2.0
+
+IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from deepmd.entrypoints.main import main_parser
+from deepmd.utils.argcheck import normalize
+
+parser = main_parser()
+parser.format_help()
+parser.parse_args(["train", "model_compression/input.json"])
+with open("model_compression/input.json") as f:
+    normalize(json.load(f))
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "elapsed": elapsed,
+    "tensorflow": any(mm.split(".")[0] == "tensorflow" for mm in sys.modules),
+}))
+"""
+
+
+class TestImportTime(unittest.TestCase):
+    def test_no_tensorflow(self):
+        # a fresh interpreter, since TensorFlow has been imported by this process
+        out = sp.check_output(
+            [sys.executable, "-c", IMPORT_SCRIPT], cwd=str(tests_path)
+        )
+        result = json.loads(out.decode().splitlines()[-1])
+        self.assertFalse(result["tensorflow"])
+        self.assertLess(result["elapsed"], MAX_IMPORT_TIME)
+
+    def test_valid_keys(self):
+        self.assertEqual(set(VALID_PRECISION), set(PRECISION_DICT))
+        self.assertEqual(set(VALID_ACTIVATION), set(ACTIVATION_FN_DICT))
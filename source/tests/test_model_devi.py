@@ -9,7 +9,9 @@ from deepmd.infer import (
     calc_model_devi,
 )
 from deepmd.infer.model_devi import (
+    DeepPotEnsemble,
     make_model_devi,
+    read_model_devi_progress,
 )
 
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
@@ -74,19 +76,66 @@ class TestMakeModelDevi(unittest.TestCase):
         np.testing.assert_almost_equal(model_devi[0][1:8], model_devi[1][1:8], 6)
         self.assertTrue(os.path.isfile(self.output))
 
+    def test_ensemble_eval(self):
+        ensemble = DeepPotEnsemble(self.graphs)
+        es, fs, vs = ensemble.eval(self.coord, self.box, self.atype)
+        ensemble.close()
+        self.assertEqual(es.shape, (2, self.coord.shape[0], 1))
+        for ii, dp in enumerate(self.graphs):
+            ee, ff, vv = dp.eval(self.coord, self.box, self.atype)
+            np.testing.assert_almost_equal(es[ii], ee, 10)
+            np.testing.assert_almost_equal(fs[ii], ff, 10)
+            np.testing.assert_almost_equal(vs[ii], vv, 10)
+
     def test_make_model_devi(self):
+        devis = make_model_devi(
+            models=self.graph_dirs,
+            system=self.data_dir,
+            set_prefix="set",
+            output=self.output,
+            frequency=self.freq,
+        )
+        x = np.loadtxt(self.output)
+        np.testing.assert_allclose(x, self.expect, 6)
+        self.assertEqual(len(devis), 1)
+        np.testing.assert_allclose(devis[0].reshape(x.shape), self.expect, 6)
+
+    def test_make_model_devi_chunk(self):
+        devis = make_model_devi(
+            models=self.graph_dirs,
+            system=self.data_dir,
+            set_prefix="set",
+            output=self.output,
+            frequency=self.freq,
+            chunk_size=1,
+        )
+        self.assertIsNone(devis)
+        x = np.loadtxt(self.output)
+        np.testing.assert_allclose(x, self.expect, 6)
+
+    def test_make_model_devi_resume(self):
+        # an interrupted run leaves the header and a partial line
+        with open(self.output, "w") as f:
+            f.write(f"# {self.data_dir}\n#       step\n           0       1.6")
         make_model_devi(
             models=self.graph_dirs,
             system=self.data_dir,
             set_prefix="set",
             output=self.output,
             frequency=self.freq,
+            resume=True,
         )
         x = np.loadtxt(self.output)
         np.testing.assert_allclose(x, self.expect, 6)
+        self.assertEqual(read_model_devi_progress(self.output), {self.data_dir: 1})
+        # the header is not written again
+        with open(self.output) as f:
+            self.assertEqual(sum(line.startswith("#") for line in f), 2)
 
     def tearDown(self):
         for pb in self.graph_dirs:
             os.remove(pb)
-        os.remove(self.output)
+        # not written by test_ensemble_eval
+        if os.path.exists(self.output):
+            os.remove(self.output)
         del_data()
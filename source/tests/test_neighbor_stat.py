@@ -1,5 +1,11 @@
+import glob
+import os
 import shutil
+import tempfile
 import unittest
+from unittest import (
+    mock,
+)
 
 import dpdata
 import numpy as np
@@ -16,8 +22,9 @@ def gen_sys(nframes):
     positions = np.vstack([X.ravel(), Y.ravel(), Z.ravel()]).T  # + 0.1
     data["coords"] = np.repeat(positions[np.newaxis, :, :], nframes, axis=0)
     data["forces"] = np.random.random([nframes, natoms, 3])
-    data["cells"] = np.array([3.0, 0.0, 0.0, 0.0, 3.0, 0.0, 0.0, 0.0, 3.0]).reshape(
-        1, 3, 3
+    data["cells"] = np.tile(
+        np.array([3.0, 0.0, 0.0, 0.0, 3.0, 0.0, 0.0, 0.0, 3.0]).reshape(1, 3, 3),
+        [nframes, 1, 1],
     )
     data["energies"] = np.random.random([nframes, 1])
     data["atom_names"] = ["TYPE"]
@@ -28,10 +35,10 @@ def gen_sys(nframes):
 
 class TestNeighborStat(unittest.TestCase):
     def setUp(self):
-        data0 = gen_sys(1)
+        data0 = gen_sys(3)
         sys0 = dpdata.LabeledSystem()
         sys0.data = data0
-        sys0.to_deepmd_npy("system_0", set_size=1)
+        sys0.to_deepmd_npy("system_0", set_size=2)
 
     def tearDown(self):
         shutil.rmtree("system_0")
@@ -55,3 +62,25 @@ class TestNeighborStat(unittest.TestCase):
                 )
                 self.assertAlmostEqual(min_nbor_dist, 1.0, 6)
                 self.assertEqual(max_nbor_size, [expected_neighbors])
+
+    def test_neighbor_stat_cache(self):
+        rcut = 2.0 + 1e-3
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch.dict(
+            os.environ, {"DP_DATA_CACHE_DIR": cache_dir}
+        ):
+            min_nbor_dist, max_nbor_size = neighbor_stat(
+                system="system_0", rcut=rcut, type_map=["TYPE"]
+            )
+            self.assertEqual(
+                len(glob.glob(os.path.join(cache_dir, "*", "neighbor_stat.json"))), 1
+            )
+            # the second call reads the cache
+            min_nbor_dist_1, max_nbor_size_1 = neighbor_stat(
+                system="system_0", rcut=rcut, type_map=["TYPE"]
+            )
+        # nothing is written into the data system
+        self.assertFalse(
+            any(ff.startswith(".") for ff in os.listdir("system_0")),
+        )
+        self.assertAlmostEqual(min_nbor_dist, min_nbor_dist_1)
+        np.testing.assert_equal(max_nbor_size, max_nbor_size_1)
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from deepmd.utils.phase_timer import (
+    PhaseTimer,
+)
+
+
+class TestPhaseTimer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _record(self, timer):
+        for step in range(5):
+            timer.step = step
+            with timer.phase("run_step"):
+                pass
+            timer.record("get_batch", 1.0, 1.0 + 0.01 * (step + 1))
+            timer.log_stat(step)
+        # a phase in another thread
+        thread = threading.Thread(target=timer.record, args=("background", 2.0, 3.0))
+        thread.start()
+        thread.join()
+        timer.close()
+
+    def test_stat(self):
+        timer = PhaseTimer(window=3)
+        self._record(timer)
+        stat = timer.get_stat()
+        self.assertEqual(set(stat), {"run_step", "get_batch", "background"})
+        # only the last 3 durations are kept
+        self.assertEqual(stat["get_batch"]["count"], 3)
+        self.assertAlmostEqual(stat["get_batch"]["p50"], 0.04)
+        self.assertAlmostEqual(stat["get_batch"]["max"], 0.05)
+        self.assertAlmostEqual(stat["background"]["mean"], 1.0)
+
+    def test_chrome_trace(self):
+        trace_file = os.path.join(self.tmpdir.name, "phases.json")
+        self._record(PhaseTimer(trace_file=trace_file))
+        with open(trace_file) as f:
+            events = json.load(f)
+        self.assertEqual(len(events), 11)
+        get_batch = [ee for ee in events if ee["name"] == "get_batch"]
+        self.assertEqual([ee["args"]["step"] for ee in get_batch], list(range(5)))
+        self.assertAlmostEqual(get_batch[0]["dur"], 1e4)
+        self.assertTrue(all(ee["ph"] == "X" for ee in events))
+        self.assertEqual(len({ee["tid"] for ee in events}), 2)
+
+    def test_json_lines(self):
+        trace_file = os.path.join(self.tmpdir.name, "phases.jsonl")
+        self._record(PhaseTimer(trace_file=trace_file))
+        with open(trace_file) as f:
+            events = [json.loads(line) for line in f]
+        self.assertEqual(len(events), 11)
+        self.assertEqual(events[-1]["name"], "background")
+        self.assertAlmostEqual(events[-1]["duration"], 1.0)
+
+    def test_disabled(self):
+        trace_file = os.path.join(self.tmpdir.name, "phases.json")
+        timer = PhaseTimer(enabled=False, trace_file=trace_file)
+        self._record(timer)
+        self.assertEqual(timer.get_stat(), {})
+        self.assertFalse(os.path.exists(trace_file))
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from deepmd.utils.throughput import (
+    ThroughputMetrics,
+)
+
+
+def _make_batch(nframes, natoms):
+    return {
+        "coord": np.zeros([nframes, natoms * 3]),
+        "natoms_vec": np.array([natoms, natoms, natoms]),
+    }
+
+
+class TestThroughputMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self.tmpdir.name, "metrics.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _read(self):
+        with open(self.metrics_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_single_task(self):
+        metrics = ThroughputMetrics(self.metrics_file, rank=2)
+        for _ in range(3):
+            metrics.add_batch(_make_batch(2, 5))
+        metrics.write(3)
+        metrics.add_batch(_make_batch(4, 6))
+        metrics.write(4)
+        metrics.close()
+        lines = self._read()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual([ll["step"] for ll in lines], [3, 4])
+        self.assertEqual(lines[0]["rank"], 2)
+        # the rates since the previous line
+        np.testing.assert_allclose(
+            lines[0]["frames_per_second"] * lines[0]["elapsed"], 6
+        )
+        np.testing.assert_allclose(
+            lines[0]["atoms_per_second"] * lines[0]["elapsed"], 30
+        )
+        np.testing.assert_allclose(
+            lines[1]["steps_per_second"] * lines[1]["elapsed"], 1
+        )
+        np.testing.assert_allclose(
+            lines[1]["atoms_per_second"] * lines[1]["elapsed"], 24
+        )
+        self.assertIsNone(lines[0]["device_memory_peak"])
+        self.assertNotIn("fitting", lines[0])
+
+    def test_multi_task(self):
+        metrics = ThroughputMetrics(self.metrics_file, multi_task=True)
+        metrics.add_batch(_make_batch(1, 3), "water")
+        metrics.add_batch(_make_batch(2, 3), "water")
+        metrics.add_batch(_make_batch(1, 8), "metal")
+        metrics.write(3)
+        metrics.close()
+        fitting = self._read()[0]["fitting"]
+        self.assertEqual(fitting["water"]["steps"], 2)
+        self.assertEqual(fitting["metal"]["steps"], 1)
+        self.assertGreater(fitting["metal"]["atoms_per_second"], 0)
+
+    def test_data_wait_fraction(self):
+        metrics = ThroughputMetrics(self.metrics_file)
+        metrics.add_data_wait_time(0.0)
+        metrics.write(1)
+        metrics.close()
+        self.assertEqual(self._read()[0]["data_wait_fraction"], 0.0)
+
+    def test_append(self):
+        metrics = ThroughputMetrics(self.metrics_file)
+        metrics.write(1)
+        metrics.close()
+        # restarted
+        metrics = ThroughputMetrics(self.metrics_file, append=True)
+        metrics.write(2)
+        metrics.close()
+        self.assertEqual([ll["step"] for ll in self._read()], [1, 2])
+        # started again
+        metrics = ThroughputMetrics(self.metrics_file)
+        metrics.write(1)
+        metrics.close()
+        self.assertEqual([ll["step"] for ll in self._read()], [1])
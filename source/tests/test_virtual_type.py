@@ -118,6 +118,28 @@ class TestVirtualType(unittest.TestCase):
         np.testing.assert_almost_equal(ae1[:nloc], ae2[nghost:])
         np.testing.assert_almost_equal(av1[:nloc], av2[nghost:])
 
+    def test_eval_many_mixed_type(self):
+        coords = self.coords.reshape([-1, 3])
+        structures = [
+            (coords, self.atype),
+            (coords[:3], self.atype[:3]),
+            (coords[[1, 0, 2, 3]], [1, 0, 1, 0]),
+        ]
+        results = self.dp.eval_many(
+            [cc.reshape([1, -1]) for cc, _ in structures],
+            None,
+            [tt for _, tt in structures],
+            atomic=True,
+            mixed_type=True,
+        )
+        self.assertEqual(len(results), len(structures))
+        for (cc, tt), rr in zip(structures, results):
+            expected = self.dp.eval(cc.reshape([1, -1]), None, tt, atomic=True)
+            self.assertEqual(len(rr), len(expected))
+            for r1, e1 in zip(rr, expected):
+                self.assertEqual(r1.shape, e1.shape)
+                np.testing.assert_almost_equal(r1, e1)
+
 
 class TestTrainVirtualType(unittest.TestCase):
     def setUp(self) -> None: